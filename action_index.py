@@ -0,0 +1,178 @@
+# action_index.py
+
+import os
+import re
+import bisect
+import logging
+import threading
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Set, Union
+
+import serialization
+
+logger = logging.getLogger(__name__)
+
+# Ticket ids are nanoids over '1234567890abcdef' of length 10
+TICKET_ID_RE = re.compile(r"\b[0-9a-f]{10}\b")
+
+DateLike = Union[str, date, datetime]
+
+
+def _norm(value: Optional[str]) -> str:
+    return " ".join((value or "").split()).casefold()
+
+
+def _iso(value: DateLike) -> str:
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+class ActionItemIndex:
+    """
+    In-memory query API over the action item store.
+
+    Keeps a primary index by id plus secondary indexes by tenant,
+    assignee and status, and a list sorted by created_at for date range
+    queries. The indexes are built once from `output_dir` and then kept
+    current incrementally: add() for items written by this process,
+    refresh() for files written by others.
+    """
+    def __init__(self, output_dir: str = "action_items", load: bool = True):
+        self.output_dir = output_dir
+        self._lock = threading.RLock()
+        self._items: Dict[str, Dict[str, Any]] = {}
+        self._by_tenant: Dict[str, Set[str]] = defaultdict(set)
+        self._by_assignee: Dict[str, Set[str]] = defaultdict(set)
+        self._by_status: Dict[str, Set[str]] = defaultdict(set)
+        self._by_created: List[tuple] = []  # sorted (created_at, id)
+        # The keys each id is indexed under, so an item that was changed in
+        # place is still removed from the entries it was filed under
+        self._keys: Dict[str, tuple] = {}
+        self._mtimes: Dict[str, float] = {}
+        if load:
+            self.refresh()
+
+    def add(self, item: Dict[str, Any]) -> None:
+        """
+        Index a new or updated action item.
+        """
+        with self._lock:
+            item_id = item["id"]
+            if item_id in self._keys:
+                self._unindex(item_id)
+            tenant, assignee = _norm(item.get("tenant_name")), _norm(item.get("asignee"))
+            status, created = item.get("status") or "", item.get("created_at") or ""
+            self._items[item_id] = item
+            self._keys[item_id] = (tenant, assignee, status, created)
+            self._by_tenant[tenant].add(item_id)
+            self._by_assignee[assignee].add(item_id)
+            self._by_status[status].add(item_id)
+            bisect.insort(self._by_created, (created, item_id))
+
+    def refresh(self) -> int:
+        """
+        Index files that are new or changed since the last refresh.
+        Returns the number of items (re)indexed.
+        """
+        if not os.path.isdir(self.output_dir):
+            return 0
+        updated = 0
+        with os.scandir(self.output_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".json") or not entry.is_file():
+                    continue
+                mtime = entry.stat().st_mtime
+                if self._mtimes.get(entry.name) == mtime:
+                    continue
+                try:
+                    with open(entry.path, "rb") as f:
+                        item = serialization.loads(f.read())
+                except (OSError, serialization.JSONDecodeError) as e:
+                    logger.warning("Skipping unreadable action item %s: %s", entry.name, e)
+                    continue
+                self.add(item)
+                self._mtimes[entry.name] = mtime
+                updated += 1
+        return updated
+
+    def get(self, item_id: str) -> Optional[Dict[str, Any]]:
+        return self._items.get(item_id)
+
+    def by_tenant(self, tenant_name: str) -> List[Dict[str, Any]]:
+        return self._resolve(self._by_tenant.get(_norm(tenant_name), ()))
+
+    def by_assignee(self, assignee: str) -> List[Dict[str, Any]]:
+        return self._resolve(self._by_assignee.get(_norm(assignee), ()))
+
+    def by_status(self, status: str) -> List[Dict[str, Any]]:
+        return self._resolve(self._by_status.get(status, ()))
+
+    def in_range(self, start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> List[Dict[str, Any]]:
+        """
+        Items with start <= created_at < end, newest first.
+        """
+        with self._lock:
+            lo = bisect.bisect_left(self._by_created, (_iso(start),)) if start else 0
+            hi = bisect.bisect_left(self._by_created, (_iso(end),)) if end else len(self._by_created)
+            ids = [item_id for _, item_id in self._by_created[lo:hi]]
+        return [self._items[i] for i in reversed(ids)]
+
+    def page(
+        self,
+        offset: int = 0,
+        limit: int = 20,
+        tenant_name: Optional[str] = None,
+        assignee: Optional[str] = None,
+        status: Optional[str] = None,
+        start: Optional[DateLike] = None,
+        end: Optional[DateLike] = None
+    ) -> Dict[str, Any]:
+        """
+        Paginated listing, newest first, optionally filtered.
+
+        :return: {"items": [...], "total": int, "next_offset": int or None}
+        """
+        with self._lock:
+            candidates = None
+            for index, key in (
+                (self._by_tenant, _norm(tenant_name) if tenant_name is not None else None),
+                (self._by_assignee, _norm(assignee) if assignee is not None else None),
+                (self._by_status, status),
+            ):
+                if key is None:
+                    continue
+                ids = index.get(key, set())
+                candidates = set(ids) if candidates is None else candidates & ids
+            ranged = self.in_range(start, end)
+        matched = [item for item in ranged if candidates is None or item["id"] in candidates]
+        items = matched[offset:offset + limit]
+        next_offset = offset + limit if offset + limit < len(matched) else None
+        return {"items": items, "total": len(matched), "next_offset": next_offset}
+
+    def find_ticket_ids(self, text: str) -> List[str]:
+        """
+        Known ticket ids mentioned in `text`, in order of appearance.
+        """
+        seen = []
+        for match in TICKET_ID_RE.findall(text or ""):
+            if match in self._items and match not in seen:
+                seen.append(match)
+        return seen
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _resolve(self, ids) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = [self._items[i] for i in ids]
+        return sorted(items, key=lambda item: item.get("created_at") or "", reverse=True)
+
+    def _unindex(self, item_id: str) -> None:
+        tenant, assignee, status, created = self._keys.pop(item_id)
+        self._by_tenant[tenant].discard(item_id)
+        self._by_assignee[assignee].discard(item_id)
+        self._by_status[status].discard(item_id)
+        key = (created, item_id)
+        pos = bisect.bisect_left(self._by_created, key)
+        if pos < len(self._by_created) and self._by_created[pos] == key:
+            del self._by_created[pos]
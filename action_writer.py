@@ -0,0 +1,153 @@
+# action_writer.py
+
+import os
+import time
+import logging
+import serialization
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+WAL_DIRNAME = ".wal"
+
+
+def atomic_write_json(
+    path: str,
+    data: Dict[str, Any],
+    fsync: bool = False,
+    compact: bool = False
+) -> None:
+    """
+    Write `data` to a temp file and rename it over `path`, so readers
+    never see a half-written file.
+    """
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(serialization.dumps_bytes(data, compact))
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _fsync_dir(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class BatchedActionWriter:
+    """
+    Buffers action items and writes them in group commits.
+
+    A durable flush appends the whole batch to one segment file in
+    `<output_dir>/.wal/` and fsyncs it once, then materialises each item
+    as `<id>.json` with an atomic rename and no per-file fsync. The
+    segment is deleted (compacted away) after the directory is synced,
+    and any segments left by a crash are replayed on startup. A
+    non-durable flush skips the segment and only does atomic renames.
+    """
+    def __init__(
+        self,
+        output_dir: str,
+        batch_size: int = 50,
+        fsync: bool = True,
+        max_delay: float = 1.0,
+        compact: bool = False
+    ):
+        """
+        :param batch_size: Flush once this many items are buffered.
+        :param fsync: Default durability for a flush; can be overridden per flush().
+        :param max_delay: Flush on the next write once the oldest buffered item is this old, in seconds.
+        :param compact: Write <id>.json files without indentation.
+        """
+        self.output_dir = output_dir
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.max_delay = max_delay
+        self.compact = compact
+        self.wal_dir = os.path.join(output_dir, WAL_DIRNAME)
+        os.makedirs(self.wal_dir, exist_ok=True)
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._oldest: Optional[float] = None
+        self.recover()
+
+    def path_for(self, item_id: str) -> str:
+        return os.path.join(self.output_dir, f"{item_id}.json")
+
+    def write(self, item: Dict[str, Any]) -> str:
+        """
+        Buffer `item`, flushing when the batch is full or too old.
+        Returns the path the item will be (or has been) written to.
+        """
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        self._buffer.append(item)
+        if len(self._buffer) >= self.batch_size or time.monotonic() - self._oldest >= self.max_delay:
+            self.flush()
+        return self.path_for(item["id"])
+
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def flush(self, fsync: Optional[bool] = None) -> List[str]:
+        """
+        Commit all buffered items. Returns their paths.
+        """
+        if not self._buffer:
+            return []
+        durable = self.fsync if fsync is None else fsync
+        batch, self._buffer, self._oldest = self._buffer, [], None
+
+        segment = None
+        if durable:
+            segment = os.path.join(self.wal_dir, f"{time.time_ns()}.jsonl")
+            with open(segment, "wb") as f:
+                f.write(b"".join(serialization.dumps_bytes(item, compact=True) + b"\n" for item in batch))
+                f.flush()
+                os.fsync(f.fileno())
+            _fsync_dir(self.wal_dir)
+
+        paths = self._materialise(batch)
+
+        if segment is not None:
+            _fsync_dir(self.output_dir)
+            os.remove(segment)
+        logger.debug("Committed %d action items (fsync=%s)", len(batch), durable)
+        return paths
+
+    def recover(self) -> int:
+        """
+        Replay segments left behind by a crash. Returns items restored.
+        """
+        restored = 0
+        for name in sorted(os.listdir(self.wal_dir)):
+            segment = os.path.join(self.wal_dir, name)
+            if not name.endswith(".jsonl"):
+                continue
+            items = []
+            with open(segment, "rb") as f:
+                for line in f:
+                    try:
+                        items.append(serialization.loads(line))
+                    except serialization.JSONDecodeError:
+                        # Torn tail of a segment whose fsync never completed
+                        break
+            self._materialise(items)
+            _fsync_dir(self.output_dir)
+            os.remove(segment)
+            restored += len(items)
+        if restored:
+            logger.info("Recovered %d action items from write-ahead segments", restored)
+        return restored
+
+    def _materialise(self, items: List[Dict[str, Any]]) -> List[str]:
+        paths = []
+        for item in items:
+            path = self.path_for(item["id"])
+            atomic_write_json(path, item, compact=self.compact)
+            paths.append(path)
+        return paths
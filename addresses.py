@@ -0,0 +1,243 @@
+# addresses.py
+
+import os
+import re
+import json
+import math
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Unit designators, removed when normalising a street
+UNIT_RE = re.compile(
+    r"(\b(apt|apartment|unit|suite|ste|room|rm|floor|fl)\b\.?\s*#?|#)\s*[\w-]+",
+    re.IGNORECASE
+)
+# The same designators, capturing the unit itself (floors are not units)
+_UNIT_ID = re.compile(
+    r"(?:\b(?:apt|apartment|unit|suite|ste|room|rm)\b\.?\s*#?|#)\s*(\d+[a-z]?|[a-z]\d*)\b",
+    re.IGNORECASE
+)
+_WORDS = {
+    "avenue": "ave", "av": "ave",
+    "street": "st", "str": "st",
+    "road": "rd", "boulevard": "blvd", "drive": "dr",
+    "lane": "ln", "place": "pl", "court": "ct", "terrace": "ter",
+    "north": "n", "south": "s", "east": "e", "west": "w",
+}
+_HOUSE_NUMBER = re.compile(r"^\d+[a-z]?$")
+
+
+def normalize_words(text: Optional[str]) -> List[str]:
+    """
+    Lower-case words of `text` with punctuation dropped and street
+    suffixes and directions abbreviated.
+    """
+    words = re.sub(r"[^\w\s]", " ", (text or "").lower()).split()
+    return [_WORDS.get(w, w) for w in words]
+
+
+def normalize_street(address: Optional[str]) -> str:
+    """
+    The street part of `address` (house number and street name) in
+    normalised form; unit designators are dropped.
+    """
+    return " ".join(normalize_words(UNIT_RE.sub(" ", address or "")))
+
+
+def parse_unit(text: Optional[str]) -> Optional[str]:
+    """
+    The unit in `text` ("Apt 2d", "Unit #5", "#3B"), upper-cased, or None.
+    """
+    m = _UNIT_ID.search(text or "")
+    return m.group(1).upper() if m else None
+
+
+def _split_number(street: str) -> Tuple[Optional[str], str]:
+    number, _, name = street.partition(" ")
+    if _HOUSE_NUMBER.match(number) and name:
+        return number, name
+    return None, street
+
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass(frozen=True)
+class Property:
+    """One building in the registry."""
+    id: str
+    address: str
+    units: Tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class ResolvedAddress:
+    """A registry match: the property, the unit if any, and the match score."""
+    property: Property
+    unit: Optional[str]
+    score: float
+
+    @property
+    def address(self) -> str:
+        """Canonical display form, e.g. "100 Holland Ave, Apt 2D"."""
+        return f"{self.property.address}, Apt {self.unit}" if self.unit else self.property.address
+
+    @property
+    def key(self) -> str:
+        """Canonical lookup key, e.g. "holland-100#2D"."""
+        return f"{self.property.id}#{self.unit}" if self.unit else self.property.id
+
+
+def load_registry(path: Optional[str] = None) -> List[Property]:
+    """
+    Read properties from the JSON list at `path` (default: $PROPERTIES_FILE).
+
+    Each entry has id, address (house number and street) and optionally
+    the list of units. Without a file the registry is empty.
+    """
+    path = path or os.environ.get("PROPERTIES_FILE")
+    if not path:
+        return []
+    with open(path) as f:
+        entries = json.load(f)
+    return [
+        Property(
+            id=entry["id"],
+            address=entry["address"],
+            units=tuple(u.upper() for u in entry.get("units", ())),
+        )
+        for entry in entries
+    ]
+
+
+class AddressResolver:
+    """
+    Resolves free-text addresses to properties in the registry.
+
+    Streets are indexed by name in two structures built once: an inverted
+    trigram index for fuzzy lookup of short address strings (typos,
+    "Av" vs "Avenue", missing house numbers) and a token trie for finding
+    street names inside an email body. House numbers must agree when both
+    sides have one; a street name shared by several buildings needs one.
+    """
+    _END = "$"
+
+    def __init__(self, properties: List[Property], min_score: float = 0.6, cache_size: int = 4096):
+        """
+        :param min_score: Minimum trigram similarity (Dice coefficient) of
+                          the street names for a fuzzy match.
+        """
+        self.properties = list(properties)
+        self.min_score = min_score
+        # street name -> [(house number, property)]
+        self._streets: Dict[str, List[Tuple[Optional[str], Property]]] = defaultdict(list)
+        for prop in self.properties:
+            number, name = _split_number(normalize_street(prop.address))
+            self._streets[name].append((number, prop))
+
+        self._names = list(self._streets)
+        self._grams = [_trigrams(name) for name in self._names]
+        self._index: Dict[str, List[int]] = defaultdict(list)
+        for i, grams in enumerate(self._grams):
+            for gram in grams:
+                self._index[gram].append(i)
+
+        self._trie: Dict[str, dict] = {}
+        for name in self._names:
+            node = self._trie
+            for word in name.split():
+                node = node.setdefault(word, {})
+            node[self._END] = name
+
+        self._lookup = lru_cache(maxsize=cache_size)(self._resolve_street)
+
+    def __len__(self) -> int:
+        return len(self.properties)
+
+    def resolve(self, address: Optional[str], text: Optional[str] = None) -> Optional[ResolvedAddress]:
+        """
+        Match a free-text address such as "100 holland av apt 2d" or
+        "Greenwich ave". The unit comes from `address`, else from `text`.
+        """
+        street = normalize_street(address)
+        if not street:
+            return None
+        match = self._lookup(street)
+        if match is None:
+            metrics.incr("addresses.unresolved")
+            return None
+        prop, score = match
+        metrics.incr("addresses.resolved")
+        return ResolvedAddress(prop, self._unit(prop, parse_unit(address) or parse_unit(text)), score)
+
+    def find(self, text: Optional[str]) -> Optional[ResolvedAddress]:
+        """
+        Find the first registry street mentioned in `text` (an email body),
+        exact after normalisation, with the house number before it if any.
+        """
+        words = normalize_words(text)
+        for i in range(len(words)):
+            node, name, j = self._trie, None, i
+            while j < len(words) and words[j] in node:
+                node = node[words[j]]
+                j += 1
+                name = node.get(self._END, name)
+            if name is None:
+                continue
+            number = words[i - 1] if i and _HOUSE_NUMBER.match(words[i - 1]) else None
+            prop = self._pick(name, number)
+            if prop is not None:
+                metrics.incr("addresses.resolved")
+                return ResolvedAddress(prop, self._unit(prop, parse_unit(text)), 1.0)
+        return None
+
+    def _resolve_street(self, street: str) -> Optional[Tuple[Property, float]]:
+        number, name = _split_number(street)
+        if name in self._streets:
+            prop = self._pick(name, number)
+            return (prop, 1.0) if prop is not None else None
+
+        # A name scoring min_score shares at least `needed` trigrams with
+        # the query, so it must contain one of the query's rarest
+        # len(query) - needed + 1 trigrams (prefix filtering); only those
+        # candidates are scored
+        query = _trigrams(name)
+        needed = math.ceil(self.min_score * len(query) / (2 - self.min_score))
+        rarest = sorted(query, key=lambda gram: len(self._index.get(gram, ())))
+        candidates = {i for gram in rarest[:len(query) - needed + 1] for i in self._index.get(gram, ())}
+        ranked = sorted(
+            ((2 * len(query & self._grams[i]) / (len(query) + len(self._grams[i])), i) for i in candidates),
+            reverse=True
+        )
+        for score, i in ranked:
+            if score < self.min_score:
+                break
+            prop = self._pick(self._names[i], number)
+            if prop is not None:
+                return prop, round(score, 3)
+        return None
+
+    def _pick(self, name: str, number: Optional[str]) -> Optional[Property]:
+        buildings = self._streets[name]
+        if number is not None:
+            return next((prop for n, prop in buildings if n == number), None)
+        if len(buildings) == 1:
+            return buildings[0][1]
+        metrics.incr("addresses.ambiguous")
+        return None
+
+    @staticmethod
+    def _unit(prop: Property, unit: Optional[str]) -> Optional[str]:
+        if unit is not None and prop.units and unit not in prop.units:
+            logger.info("Unit %s is not listed for %s, dropping it", unit, prop.id)
+            return None
+        return unit
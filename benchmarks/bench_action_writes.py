@@ -0,0 +1,71 @@
+# benchmarks/bench_action_writes.py
+#
+# Items/sec of per-file action item writes vs batched group commits.
+# Run from the repo root:  python -m benchmarks.bench_action_writes [n_items]
+
+import os
+import sys
+import json
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from action_writer import BatchedActionWriter  # noqa: E402
+
+
+def make_item(i):
+    return {
+        "id": f"{i:010x}",
+        "created_at": "2025-07-16T10:48:49.170131+00:00Z",
+        "action_type": "maintenance_ticket",
+        "tenant_name": "Wilkin Dan",
+        "address": "2000 Holland Av Apt 1F",
+        "subject": None,
+        "summary": "The toilet is not flushing.",
+        "request_type": "maintenance",
+        "context": {
+            "rent_balance": "$3,419",
+            "lease_end_date": "2025-10-27",
+            "maintenance_history": [
+                {"id": "ccd24ea9ec", "issue": "Clogged sink", "status": "resolved", "date": "2025-04-09"}
+            ],
+        },
+        "status": "pending",
+        "asignee": "Allison Hill",
+    }
+
+
+def per_file(directory, items, fsync):
+    # The original WorkflowTrigger.save_action_item, optionally with an fsync per item
+    for item in items:
+        with open(os.path.join(directory, f"{item['id']}.json"), "w", encoding="utf-8") as f:
+            json.dump(item, f, indent=2)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def batched(directory, items, fsync, batch_size):
+    writer = BatchedActionWriter(directory, batch_size=batch_size, fsync=fsync, max_delay=3600)
+    for item in items:
+        writer.write(item)
+    writer.flush()
+
+
+def run(label, fn, items):
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        fn(directory, items)
+        elapsed = time.perf_counter() - start
+    print(f"{label:<32} {len(items) / elapsed:>10,.0f} items/sec")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    items = [make_item(i) for i in range(n)]
+    run("per-file, no fsync", lambda d, it: per_file(d, it, False), items)
+    run("per-file, fsync each", lambda d, it: per_file(d, it, True), items)
+    run("batched(50), no fsync", lambda d, it: batched(d, it, False, 50), items)
+    run("batched(50), fsync per batch", lambda d, it: batched(d, it, True, 50), items)
+    run("batched(500), fsync per batch", lambda d, it: batched(d, it, True, 500), items)
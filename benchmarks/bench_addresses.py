@@ -0,0 +1,65 @@
+# benchmarks/bench_addresses.py
+#
+# AddressResolver latency against a generated property registry: exact
+# and fuzzy (typo) lookups of short address strings, and finding the
+# address in an email body. Lookups are uncached.
+# Run from the repo root:  python -m benchmarks.bench_addresses [properties]
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from addresses import AddressResolver, Property  # noqa: E402
+
+NAMES = ["Holland", "Greenwich", "Main", "Oak", "Pine", "Maple", "Cedar", "Elm", "Park", "Lake",
+         "Washington", "Lincoln", "Jefferson", "Madison", "Franklin", "Highland", "Sunset", "River"]
+SUFFIXES = ["Avenue", "Street", "Road", "Boulevard", "Lane", "Drive"]
+
+
+def make_registry(n, seed=5):
+    rng = random.Random(seed)
+    props = []
+    for i in range(n):
+        street = f"{rng.choice(NAMES)} {rng.choice(NAMES)} {rng.choice(SUFFIXES)}"
+        props.append(Property(f"p{i}", f"{rng.randint(1, 3000)} {street}", ("1A", "2B", "3C")))
+    return props
+
+
+def typo(text, rng):
+    i = rng.randrange(len(text) // 2, len(text) - 1)
+    return text[:i] + text[i + 1:]
+
+
+def per_call_us(fn, inputs, expected, resolver):
+    resolver._lookup.cache_clear()
+    hits = 0
+    start = time.perf_counter()
+    for value, prop in zip(inputs, expected):
+        found = fn(value)
+        hits += found is not None and found.property == prop
+    return (time.perf_counter() - start) / len(inputs) * 1e6, hits / len(inputs)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rng = random.Random(9)
+    props = make_registry(n)
+    start = time.perf_counter()
+    resolver = AddressResolver(props)
+    print(f"{n} properties indexed in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    sample = [rng.choice(props) for _ in range(2000)]
+    cases = [
+        ("exact, abbreviated", resolver.resolve,
+         [p.address.replace("Avenue", "Av").replace("Street", "St") + " apt 2b" for p in sample]),
+        ("one typo", resolver.resolve, [typo(p.address, rng) + ", Unit 1A" for p in sample]),
+        ("found in body", resolver.find,
+         [f"Hi, this is the tenant at {p.address.lower()}, apt 3c. The sink is leaking again." for p in sample]),
+    ]
+    print(f"{'lookup':<20} {'us/call':>8} {'correct':>8}")
+    for name, fn, inputs in cases:
+        us, correct = per_call_us(fn, inputs, sample, resolver)
+        print(f"{name:<20} {us:>8.1f} {correct:>8.1%}")
@@ -0,0 +1,80 @@
+# benchmarks/bench_breaker.py
+#
+# Parse + reply throughput during a simulated OpenAI outage in which
+# every call hangs until its timeout, without and with the LLM circuit
+# breaker. With the breaker, emails after the first few are parsed by
+# the rule parser and their replies deferred, so throughput is bounded
+# by local work instead of by the timeouts.
+# Run from the repo root:  python -m benchmarks.bench_breaker [emails] [timeout_ms]
+
+import os
+import sys
+import time
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import parser  # noqa: E402
+from circuit_breaker import CircuitBreaker, CircuitOpen, llm_failure  # noqa: E402
+from context_loader import ContextLoader  # noqa: E402
+from metrics import metrics  # noqa: E402
+from parser import LLMEmailParser  # noqa: E402
+from reply_generator import ReplyGenerator  # noqa: E402
+from reply_templates import ReplyRouter  # noqa: E402
+
+BODIES = [
+    "The sink in Apt {i}B at 12 Oak St is leaking again, can someone come by?",
+    "I think I was charged twice for rent this month, can you check?",
+    "Can I get a parking permit for my guest next weekend?",
+]
+
+
+def make_emails(n):
+    return [
+        {"uid": str(i), "sender": f"Tenant {i} <t{i}@example.com>", "subject": "Request",
+         "body": BODIES[i % len(BODIES)].format(i=i)}
+        for i in range(n)
+    ]
+
+
+def hanging_create(timeout):
+    def create(**kwargs):
+        time.sleep(kwargs.get("timeout") or timeout)
+        raise parser.openai.APITimeoutError(request=None)
+    return create
+
+
+def run(emails, timeout, breaker):
+    metrics.reset()
+    llm_parser = LLMEmailParser(breaker=breaker)
+    replier = ReplyRouter(ReplyGenerator(timeout=timeout, breaker=breaker))
+    loader = ContextLoader(seed=1)
+    deferred = failed = 0
+    start = time.perf_counter()
+    for msg in emails:
+        parsed = llm_parser.parse(msg)
+        context = loader.load(parsed["tenant_name"], parsed["address"])
+        try:
+            replier.reply(parsed, context, msg["uid"])
+        except CircuitOpen:
+            deferred += 1
+        except parser.openai.APIError:
+            failed += 1
+    elapsed = time.perf_counter() - start
+    return len(emails) / elapsed, deferred, failed
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    timeout = (float(sys.argv[2]) if len(sys.argv) > 2 else 20) / 1000
+    parser.openai.api_key = "bench"
+    parser.openai.chat.completions.create = hanging_create(timeout)
+    emails = make_emails(n)
+    print(f"{n} emails, every LLM call times out after {timeout * 1000:.0f} ms")
+    for name, breaker in [
+        ("no breaker", None),
+        ("breaker", CircuitBreaker("openai", min_calls=10, open_seconds=3600, is_failure=llm_failure)),
+    ]:
+        rate, deferred, failed = run(emails, timeout, breaker)
+        print(f"{name:<11} {rate:>9.1f} emails/s  replies deferred {deferred}, failed {failed}")
@@ -0,0 +1,109 @@
+# benchmarks/bench_cascade.py
+#
+# Parse latency, cost and accuracy of the strong model alone vs the
+# cheap -> strong -> rules cascade. Both models are simulated (latency,
+# invalid JSON, hallucinated fields and timeouts at fixed rates); the
+# output is the per-tier report used to tune the tiers.
+# Run from the repo root:  python -m benchmarks.bench_cascade [n]
+
+import os
+import sys
+import json
+import time
+import random
+import types
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import parser  # noqa: E402
+from metrics import Histogram, metrics  # noqa: E402
+from parser import LLMEmailParser, ModelTier  # noqa: E402
+from prompts import parser_user_prompt  # noqa: E402
+
+BODIES = [
+    ("maintenance", "The sink in Apt {unit} at {number} Oak St is leaking, can someone fix it?"),
+    ("payment", "How much rent do I owe this month for Apt {unit}, {number} Oak St?"),
+    ("lease", "I would like to renew my lease for {number} Oak St Apt {unit}."),
+    ("general", "Thanks for the quick help last week!"),
+]
+
+# Simulated model behaviour: (median latency s, invalid JSON, hallucination, timeout) rates
+MODELS = {
+    "mini": (0.004, 0.06, 0.08, 0.01),
+    "big": (0.015, 0.01, 0.01, 0.005),
+}
+TIERS = [
+    ModelTier("cheap", "mini", timeout=0.02, min_confidence=0.7, prompt_cost=0.15, completion_cost=0.60),
+    ModelTier("strong", "big", timeout=0.08, prompt_cost=2.50, completion_cost=10.00),
+]
+
+
+def make_corpus(n, seed=11):
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(n):
+        label, template = rng.choice(BODIES)
+        number, unit = rng.randint(1, 400), f"{rng.randint(1, 9)}{rng.choice('ABC')}"
+        body = template.format(number=number, unit=unit)
+        msg = {"uid": str(i), "sender": f"Tenant{i} Smith <t{i}@example.com>", "subject": "Request", "body": body}
+        truth = {"tenant_name": f"Tenant{i} Smith", "address": f"{number} Oak St Apt {unit}" if "{number}" in template else None,
+                 "request_type": label, "summary": body[:40], "full_body": body}
+        corpus.append((msg, truth))
+    return corpus
+
+
+def fake_create(truths, rng):
+    def create(model, messages, timeout=None, **kwargs):
+        median, invalid, hallucinate, slow = MODELS[model]
+        latency = rng.lognormvariate(0, 0.3) * median * (20 if rng.random() < slow else 1)
+        if timeout is not None and latency > timeout:
+            time.sleep(timeout)
+            raise parser.openai.APITimeoutError(request=None)
+        time.sleep(latency)
+        answer = dict(truths[messages[1]["content"]])
+        roll = rng.random()
+        if roll < invalid:
+            content = '{"tenant_name": '
+        else:
+            if roll < invalid + hallucinate:
+                answer["tenant_name"] = "Jordan Lee"
+            content = json.dumps(answer)
+        usage = types.SimpleNamespace(prompt_tokens=1200, completion_tokens=120, prompt_tokens_details=None)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=content))],
+                                     usage=usage)
+    return create
+
+
+def run(tiers, corpus):
+    metrics.reset()
+    truths = {parser_user_prompt(msg): truth for msg, truth in corpus}
+    parser.openai.chat.completions.create = fake_create(truths, random.Random(3))
+    llm_parser = LLMEmailParser(tiers=tiers)
+    latency = Histogram()
+    correct = 0
+    for msg, truth in corpus:
+        start = time.perf_counter()
+        parsed = llm_parser.parse(msg)
+        latency.observe(time.perf_counter() - start)
+        correct += parsed["tenant_name"] == truth["tenant_name"] and parsed["request_type"] == truth["request_type"]
+    return llm_parser.cascade_report(), latency, correct / len(corpus)
+
+
+if __name__ == "__main__":
+    logging.getLogger("parser").setLevel(logging.ERROR)
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    corpus = make_corpus(n)
+    parser.openai.api_key = "bench"
+    for name, tiers in [("strong only", TIERS[1:]), ("cheap -> strong", TIERS)]:
+        report, latency, accuracy = run(tiers, corpus)
+        cost = sum(stats.get("cost_usd", 0) for stats in report.values())
+        print(f"{name}: p50 {latency.percentile(50) * 1000:.1f} ms, p99 {latency.percentile(99) * 1000:.1f} ms, "
+              f"${cost / n * 1000:.2f} per 1000 emails, {accuracy:.1%} correct")
+        for tier, stats in report.items():
+            if tier == "rules":
+                print(f"  {'rules':<7} accepted {stats['accepted']:.0f}")
+                continue
+            print(f"  {tier:<7} {stats['attempts']:.0f} attempts, hit rate {stats['hit_rate']:.1%}, "
+                  f"invalid {stats['invalid']:.0f}, low confidence {stats['low_confidence']:.0f}, "
+                  f"errors {stats['error']:.0f}, p99 {stats['latency']['p99'] * 1000:.1f} ms")
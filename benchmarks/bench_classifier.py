@@ -0,0 +1,127 @@
+# benchmarks/bench_classifier.py
+#
+# The local request_type classifier: training time, emails/sec for one
+# batched predict vs one call per email (and the rule parser's keyword
+# classifier for reference), agreement with the LLM's labels on held-out
+# emails, calibration (expected calibration error) and how many emails a
+# confidence threshold would let skip the LLM.
+#
+# Labels come from an action_items directory when given (the LLM's own
+# output); otherwise from a synthetic corpus standing in for them.
+# Run from the repo root:  python -m benchmarks.bench_classifier [n | action_items_dir]
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classifier import RequestTypeClassifier, _numpy, training_data  # noqa: E402
+from rule_parser import EmailParser  # noqa: E402
+
+PHRASES = {
+    "maintenance": [
+        "the kitchen sink is leaking", "my heater stopped working", "the toilet is clogged again",
+        "there is mold in the bathroom", "the front door lock is broken", "no hot water since monday",
+        "the dishwasher makes a loud noise", "a window will not close", "the ceiling fan sparks",
+    ],
+    "payment": [
+        "how much do I owe this month", "can I pay rent late this month", "I was charged a late fee",
+        "please send the invoice for march", "my balance looks wrong", "can I set up autopay",
+        "I sent the payment yesterday", "is there a fee for paying by card",
+    ],
+    "lease": [
+        "I would like to renew my lease", "when does my lease end", "can I add a roommate to the agreement",
+        "I plan to move out in june", "can we extend the term by six months", "is subletting allowed",
+        "I need a copy of my lease agreement",
+    ],
+    "general": [
+        "thanks for the quick help", "who do I contact about parking", "is the gym open on sunday",
+        "a package was left in the lobby", "when is the next building meeting", "can I get a second key fob",
+    ],
+}
+OPENERS = ["Hi,", "Hello there,", "Good morning,", "Dear manager,", ""]
+CLOSERS = ["Thanks.", "Best regards.", "Please let me know.", "Appreciate it!", ""]
+
+# Share of labels flipped to mimic the LLM's own inconsistency
+LABEL_NOISE = 0.05
+
+
+def synthetic_corpus(n, seed=3):
+    rng = random.Random(seed)
+    labels = list(PHRASES)
+    texts, targets = [], []
+    for i in range(n):
+        label = rng.choice(labels)
+        parts = [rng.choice(OPENERS), rng.choice(PHRASES[label]).capitalize() + "."]
+        if rng.random() < 0.3:
+            # Mixed emails mention a second topic in passing
+            parts.append("Also " + rng.choice(PHRASES[rng.choice(labels)]) + ".")
+        parts.append(rng.choice(CLOSERS))
+        texts.append(f"Unit {rng.randint(1, 40)}{rng.choice('ABCD')}\n" + " ".join(p for p in parts if p))
+        targets.append(rng.choice(labels) if rng.random() < LABEL_NOISE else label)
+    return texts, targets
+
+
+def expected_calibration_error(confidences, correct, bins=10):
+    total = 0.0
+    for b in range(bins):
+        lo, hi = b / bins, (b + 1) / bins
+        idx = [i for i, c in enumerate(confidences) if lo < c <= hi]
+        if idx:
+            acc = sum(correct[i] for i in idx) / len(idx)
+            conf = sum(confidences[i] for i in idx) / len(idx)
+            total += len(idx) / len(confidences) * abs(acc - conf)
+    return total
+
+
+if __name__ == "__main__":
+    arg = sys.argv[1] if len(sys.argv) > 1 else "2000"
+    if os.path.isdir(arg):
+        texts, labels = training_data(arg)
+        source = f"{arg} ({len(texts)} action items)"
+    else:
+        texts, labels = synthetic_corpus(int(arg))
+        source = f"synthetic corpus ({len(texts)} emails, {LABEL_NOISE:.0%} label noise)"
+    if len(texts) < 10:
+        sys.exit(f"Not enough labelled emails in {source}")
+
+    split = int(len(texts) * 0.8)
+    train_x, train_y, test_x, test_y = texts[:split], labels[:split], texts[split:], labels[split:]
+
+    start = time.perf_counter()
+    model = RequestTypeClassifier().fit(train_x, train_y)
+    train_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    predictions = model.predict(test_x)
+    batch_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for text in test_x:
+        model.predict([text])
+    single_s = time.perf_counter() - start
+
+    rules = EmailParser()
+    start = time.perf_counter()
+    rule_labels = [rules._classify_request(text) for text in test_x]
+    rules_s = time.perf_counter() - start
+
+    correct = [label == y for (label, _), y in zip(predictions, test_y)]
+    confidences = [p for _, p in predictions]
+    n = len(test_x)
+
+    print(f"labels: {source}; NumPy: {'yes' if _numpy() else 'no (pure Python scoring)'}")
+    print(f"trained on {split} in {train_s:.2f}s, temperature {model.temperature:.2f}")
+    print(f"{'scoring':<26} {'emails/s':>10}")
+    print(f"{'batched predict':<26} {n / batch_s:>10,.0f}")
+    print(f"{'one predict per email':<26} {n / single_s:>10,.0f}")
+    print(f"{'rule parser keywords':<26} {n / rules_s:>10,.0f}")
+    print(f"agreement with LLM labels: classifier {sum(correct) / n:.1%}, "
+          f"rule parser {sum(r == y for r, y in zip(rule_labels, test_y)) / n:.1%}")
+    print(f"expected calibration error: {expected_calibration_error(confidences, correct):.3f}")
+    for threshold in (0.8, 0.9, 0.95):
+        idx = [i for i, c in enumerate(confidences) if c >= threshold]
+        agree = sum(correct[i] for i in idx) / len(idx) if idx else float("nan")
+        print(f"skip LLM at p>={threshold:.2f}: {len(idx) / n:.1%} of emails, {agree:.1%} agree")
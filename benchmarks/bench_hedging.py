@@ -0,0 +1,74 @@
+# benchmarks/bench_hedging.py
+#
+# Tail latency of a simulated LLM call with occasional very slow
+# responses, without and with hedging (HedgedCaller at the p95 of recent
+# latencies, 5% budget), plus the extra load the hedges added.
+# Run from the repo root:  python -m benchmarks.bench_hedging [calls] [concurrency]
+
+import os
+import sys
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hedging import HedgedCaller, HedgePolicy  # noqa: E402
+from metrics import Histogram, metrics  # noqa: E402
+
+# Simulated completion time: lognormal around 20 ms, 3% of calls stall 20x
+MEDIAN = 0.02
+STALL_RATE = 0.03
+STALL_FACTOR = 20
+
+
+def make_call(seed):
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    started = [0]
+
+    def call():
+        with lock:
+            started[0] += 1
+            latency = rng.lognormvariate(0, 0.25) * MEDIAN
+            if rng.random() < STALL_RATE:
+                latency *= STALL_FACTOR
+        time.sleep(latency)
+        return latency
+    return call, started
+
+
+def run(calls, concurrency, hedger):
+    call, started = make_call(seed=1)
+    hist = Histogram()
+
+    def one(_):
+        start = time.perf_counter()
+        if hedger is None:
+            call()
+        else:
+            hedger.call("reply", call)
+        hist.observe(time.perf_counter() - start)
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(calls)))
+    return hist, started[0]
+
+
+if __name__ == "__main__":
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    print(f"{'':<12} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8} {'requests':>9}")
+    for name in ("unhedged", "hedged p95"):
+        metrics.reset()
+        hedger = None if name == "unhedged" else HedgedCaller(HedgePolicy(percentile=95, budget=0.05),
+                                                              max_workers=2 * concurrency)
+        hist, requests = run(calls, concurrency, hedger)
+        print(f"{name:<12} {hist.percentile(50) * 1000:>8.1f} {hist.percentile(90) * 1000:>8.1f} "
+              f"{hist.percentile(99) * 1000:>8.1f} {hist.percentile(100) * 1000:>8.1f} {requests:>9}")
+        if hedger is not None:
+            hedger.shutdown()
+            print(f"  hedged {metrics.counter('hedge.reply.hedged'):.0f} calls, backup won "
+                  f"{metrics.counter('hedge.reply.backup_won'):.0f}, budget exhausted "
+                  f"{metrics.counter('hedge.reply.budget_exhausted'):.0f}")
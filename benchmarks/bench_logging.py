@@ -0,0 +1,73 @@
+# benchmarks/bench_logging.py
+#
+# Per-call cost of logger.info() on the calling thread: a synchronous
+# StreamHandler (the old logger.py setup) vs the queue-based setup_logging()
+# in text, JSON and sampled modes, with 1 and 8 concurrent threads.
+# Run from the repo root:  python -m benchmarks.bench_logging [calls]
+
+import os
+import sys
+import time
+import logging
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logger import TEXT_FORMAT, setup_logging, shutdown_logging  # noqa: E402
+
+log = logging.getLogger("bench")
+
+
+def sync_setup(stream):
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    return lambda: root.removeHandler(handler)
+
+
+def queue_setup(**kwargs):
+    def setup(stream):
+        setup_logging(level="INFO", stream=stream, **kwargs)
+        return shutdown_logging
+    return setup
+
+
+def per_call_ns(setup, calls, threads):
+    with tempfile.TemporaryFile("w") as stream:
+        teardown = setup(stream)
+        per_thread = calls // threads
+        timings = []
+
+        def work():
+            start = time.perf_counter_ns()
+            for i in range(per_thread):
+                log.info("Attempt %d to send email to %s", 1, f"tenant{i}@example.com")
+            timings.append((time.perf_counter_ns() - start) / per_thread)
+
+        workers = [threading.Thread(target=work) for _ in range(threads)]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        teardown()
+    return sum(timings) / len(timings)
+
+
+CASES = [
+    ("sync StreamHandler", sync_setup),
+    ("queue, text", queue_setup(json_lines=False, sample=False)),
+    ("queue, json", queue_setup(json_lines=True, sample=False)),
+    ("queue, text, sampled", queue_setup(json_lines=False, sample=True)),
+]
+
+
+if __name__ == "__main__":
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 40_000
+    print(f"{'setup':<22} {'1 thread ns':>12} {'8 threads ns':>13}   (per call, caller side)")
+    for name, setup in CASES:
+        single = per_call_ns(setup, calls, 1)
+        multi = per_call_ns(setup, calls, 8)
+        print(f"{name:<22} {single:>12,.0f} {multi:>13,.0f}")
@@ -0,0 +1,77 @@
+# benchmarks/bench_mail_io.py
+#
+# End-to-end IMAP fetch and SMTP send throughput against the local fake
+# servers, with a configurable per-response latency.
+# Run from the repo root:  python -m benchmarks.bench_mail_io [n] [latency_ms]
+
+import os
+import sys
+import time
+import shutil
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_servers import (  # noqa: E402
+    FakeIMAPServer,
+    FakeSMTPServer,
+    generate_messages,
+    self_signed_contexts,
+)
+from inbox import InboxConnector  # noqa: E402
+from sender import EmailSender  # noqa: E402
+
+
+def bench_fetch(n, latency, tls):
+    server_ctx, client_ctx = self_signed_contexts() if tls else (None, None)
+    with FakeIMAPServer(messages=generate_messages(n), latency=latency, ssl_context=server_ctx) as server:
+        connector = InboxConnector(
+            host="localhost", port=server.port, username="office", password="pw",
+            use_ssl=tls, ssl_context=client_ctx
+        )
+        start = time.perf_counter()
+        connector.connect()
+        fetched = connector.fetch_unread(limit=n, mark_seen=True)
+        connector.logout()
+        elapsed = time.perf_counter() - start
+    assert len(fetched) == n
+    return n / elapsed
+
+
+def bench_send(n, latency, tls, batched):
+    server_ctx, client_ctx = self_signed_contexts() if tls else (None, None)
+    with FakeSMTPServer(latency=latency, ssl_context=server_ctx) as server:
+        sender = EmailSender(
+            "localhost", server.port, "office@example.com", "pw",
+            max_retries=1, use_ssl=tls, ssl_context=client_ctx, allow_plaintext=not tls
+        )
+        entries = [
+            {"to": [f"t{i}@example.com"], "subject": f"Re: {i}", "body": "Thanks, we are on it.",
+             "attempts": 0, "message_id": f"key{i}"}
+            for i in range(n)
+        ]
+        start = time.perf_counter()
+        if batched:
+            sender.deliver_batch(entries)
+        else:
+            for entry in entries:
+                sender.deliver(entry)
+        elapsed = time.perf_counter() - start
+        assert len(server.messages) == n
+    return n / elapsed
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 0.0) / 1000
+    modes = [False, True] if shutil.which("openssl") else [False]
+    print(f"{n:,} messages, {latency * 1000:.1f} ms per response")
+    print(f"{'':<28} {'plain msg/s':>12} {'tls msg/s':>10}")
+    rows = [
+        ("imap fetch_unread", lambda tls: bench_fetch(n, latency, tls)),
+        ("smtp one connection each", lambda tls: bench_send(n, latency, tls, batched=False)),
+        ("smtp deliver_batch", lambda tls: bench_send(n, latency, tls, batched=True)),
+    ]
+    for name, run in rows:
+        rates = [run(tls) for tls in modes]
+        cells = "".join(f"{rate:>12,.0f}" if i == 0 else f"{rate:>11,.0f}" for i, rate in enumerate(rates))
+        print(f"{name:<28} {cells}")
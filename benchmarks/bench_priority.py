@@ -0,0 +1,90 @@
+# benchmarks/bench_priority.py
+#
+# Time-to-reply per priority class under a burst of mixed mail: arrival
+# order (FIFO) vs the PriorityScheduler. Service time is simulated.
+# Run from the repo root:  python -m benchmarks.bench_priority [n] [workers]
+
+import os
+import sys
+import time
+import random
+import threading
+from collections import defaultdict, deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import Histogram, metrics  # noqa: E402
+from priority import PRIORITY_CLASSES, PriorityScheduler, PriorityScorer  # noqa: E402
+
+BODIES = [
+    ("Water everywhere", "Emergency! There is water flooding the kitchen from a burst pipe."),
+    ("Heater broken", "My heater stopped working last night, can someone repair it?"),
+    ("Lease question", "When does my lease end? I'd like to plan ahead."),
+    ("Rent", "How much do I owe for rent this month?"),
+    ("Hello", "Just wanted to say thanks for the quick help last week."),
+]
+WEIGHTS = [1, 4, 3, 6, 6]
+
+# Simulated seconds per message (parse + reply)
+SERVICE_TIME = 0.002
+
+
+def make_messages(n, seed=7):
+    rng = random.Random(seed)
+    messages = []
+    for i in range(n):
+        subject, body = rng.choices(BODIES, WEIGHTS)[0]
+        messages.append({"uid": str(i), "sender": f"Tenant {i} <t{i}@example.com>",
+                         "subject": subject, "date": None, "body": body})
+    return messages
+
+
+def handler(msg):
+    time.sleep(SERVICE_TIME)
+
+
+def run_fifo(messages, scorer, workers):
+    queue = deque(messages)
+    lock = threading.Lock()
+    hists = defaultdict(Histogram)
+    start = time.time()
+
+    def work():
+        while True:
+            with lock:
+                if not queue:
+                    return
+                msg = queue.popleft()
+            handler(msg)
+            hists[scorer.score(msg)[0]].observe(time.time() - start)
+
+    threads = [threading.Thread(target=work) for _ in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {cls: h.percentile(99) for cls, h in hists.items()}
+
+
+def run_priority(messages, scorer, workers):
+    metrics.reset()
+    scheduler = PriorityScheduler(scorer, concurrency={cls: workers for cls in PRIORITY_CLASSES})
+    start = time.time()
+    for msg in messages:
+        scheduler.submit(msg, received_at=start)
+    scheduler.run(handler, workers=workers)
+    return {cls: summary["p99"] for cls, summary in scheduler.report().items()}
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    messages = make_messages(n)
+    scorer = PriorityScorer()
+    fifo = run_fifo(messages, scorer, workers)
+    prio = run_priority(messages, scorer, workers)
+    print(f"p99 time-to-reply, {n:,} messages, {workers} workers")
+    print(f"{'class':<8} {'fifo s':>8} {'priority s':>11}")
+    for cls in PRIORITY_CLASSES:
+        if cls in fifo or cls in prio:
+            print(f"{cls:<8} {fifo.get(cls, 0):>8.3f} {prio.get(cls, 0):>11.3f}")
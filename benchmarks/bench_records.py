@@ -0,0 +1,61 @@
+# benchmarks/bench_records.py
+#
+# Rule-parser results: memory per 10k ParsedEmail objects (slotted vs the
+# same fields in a dict) and the cost of converting them back to dicts
+# (records.as_dict vs dataclasses.asdict).
+# Run from the repo root:  python -m benchmarks.bench_records [n]
+
+import os
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from records import as_dict  # noqa: E402
+from rule_parser import ParsedEmail  # noqa: E402
+
+
+def parsed(i):
+    return {
+        "uid": str(i),
+        "tenant_name": f"Tenant {i}",
+        "address": "100 Holland Av Apt 2D",
+        "request_type": "maintenance",
+        "subject": "Leaking sink",
+        "date": "Thu, 17 Jul 2025 12:39:48 +0000",
+        "summary": "My kitchen sink has been leaking since Monday.",
+        "full_body": f"Hi, my kitchen sink has been leaking since Monday ({i}).",
+    }
+
+
+def measure(build, data):
+    # Only the containers are measured: field values are built up front
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = [build(d) for d in data]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+    return after - before
+
+
+def timed(convert, objects):
+    start = time.perf_counter()
+    for obj in objects:
+        convert(obj)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    data = [parsed(i) for i in range(n)]
+    as_dicts = measure(dict, data)
+    as_records = measure(lambda d: ParsedEmail(**d), data)
+    print(f"memory per {n:,}: dict {as_dicts / 1024:,.0f} KiB, ParsedEmail {as_records / 1024:,.0f} KiB "
+          f"({1 - as_records / as_dicts:.0%} saved)")
+
+    objects = [ParsedEmail(**d) for d in data]
+    deep, shallow = timed(asdict, objects), timed(as_dict, objects)
+    print(f"to dict per {n:,}: asdict {deep * 1000:.1f} ms, as_dict {shallow * 1000:.1f} ms")
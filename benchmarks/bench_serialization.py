@@ -0,0 +1,52 @@
+# benchmarks/bench_serialization.py
+#
+# Per-email CPU spent on JSON and schema validation, before and after the
+# serialization layer. Run from the repo root:
+#   python -m benchmarks.bench_serialization [iterations]
+
+import os
+import sys
+import json
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jsonschema import validate  # noqa: E402
+
+import serialization  # noqa: E402
+from validator import EMAIL_SCHEMA, validate_email_data  # noqa: E402
+from benchmarks.bench_action_writes import make_item  # noqa: E402
+
+LLM_RESPONSE = json.dumps({
+    "tenant_name": "Wilkin Dan",
+    "address": "2000 Holland Av Apt 1F",
+    "request_type": "maintenance",
+    "summary": "I have the money order for the payment, but I'm not going to send it until you fix the toilet.",
+    "full_body": "Hi, I have the money order for the payment, but I'm not going to send it until you fix the toilet. " * 3,
+})
+ACTION_ITEM = make_item(1)
+
+
+def baseline():
+    parsed = json.loads(LLM_RESPONSE)
+    validate(instance=parsed, schema=EMAIL_SCHEMA)
+    json.dumps(ACTION_ITEM, indent=2)
+
+
+def optimised(compact=False):
+    parsed = serialization.loads(LLM_RESPONSE)
+    validate_email_data(parsed)
+    serialization.dumps_bytes(ACTION_ITEM, compact=compact)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    backend = "orjson" if serialization.orjson is not None else "stdlib json"
+    base = min(timeit.repeat(baseline, number=n, repeat=3)) / n * 1e6
+    fast = min(timeit.repeat(optimised, number=n, repeat=3)) / n * 1e6
+    compact = min(timeit.repeat(lambda: optimised(True), number=n, repeat=3)) / n * 1e6
+    print(f"backend: {backend}")
+    print(f"baseline (json + jsonschema.validate) {base:>9.1f} us/email")
+    print(f"serialization layer                   {fast:>9.1f} us/email")
+    print(f"serialization layer, compact          {compact:>9.1f} us/email")
+    print(f"saved per email                       {base - fast:>9.1f} us")
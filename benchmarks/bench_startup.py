@@ -0,0 +1,80 @@
+# benchmarks/bench_startup.py
+#
+# Startup cost of main.py: an `-X importtime` report of its imports, and
+# the wall time of a full run against an empty (local fake) inbox.
+# Run from the repo root:  python -m benchmarks.bench_startup [--max-ms N]
+# With --max-ms the script exits non-zero if the empty run is slower.
+
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fake_servers import FakeIMAPServer  # noqa: E402
+
+HEAVY = ("openai", "faker", "jsonschema", "nanoid", "tiktoken", "numpy")
+
+
+def import_report(module="main", top=15):
+    """
+    (total microseconds, [(cumulative us, module)] slowest first) for
+    importing `module` in a fresh interpreter.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        rows.append((int(cumulative), name.strip()))
+    total = next((us for us, name in rows if name == module), 0)
+    return total, sorted(rows, reverse=True)[:top], {name for _, name in rows}
+
+
+def empty_run(runs=5):
+    """
+    Best wall time (seconds) of `main.run()` against an empty inbox.
+    """
+    best = float("inf")
+    with FakeIMAPServer() as server, tempfile.TemporaryDirectory() as tmp:
+        accounts = os.path.join(tmp, "mailboxes.json")
+        with open(accounts, "w") as f:
+            json.dump([{"name": "empty", "host": server.host, "port": server.port,
+                        "use_ssl": False, "username": "u", "password": "p"}], f)
+        env = dict(os.environ, MAILBOXES_FILE=accounts, PYTHONPATH=ROOT)
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run(
+                [sys.executable, "-c", "import main, sys; sys.exit(main.run())"],
+                cwd=tmp, env=env, check=True, capture_output=True
+            )
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    max_ms = float(sys.argv[sys.argv.index("--max-ms") + 1]) if "--max-ms" in sys.argv else None
+
+    total, slowest, modules = import_report()
+    print(f"import main: {total / 1000:.1f} ms")
+    for cumulative, name in slowest:
+        print(f"  {cumulative / 1000:>7.1f} ms  {name}")
+    eager = [m for m in HEAVY if m in modules]
+    print(f"heavy modules imported eagerly: {', '.join(eager) or 'none'}")
+
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    interpreter = time.perf_counter() - start
+
+    elapsed = empty_run()
+    print(f"empty inbox run: {elapsed * 1000:.0f} ms (bare interpreter {interpreter * 1000:.0f} ms)")
+    if max_ms is not None and (elapsed * 1000 > max_ms or eager):
+        sys.exit(1)
@@ -0,0 +1,565 @@
+# benchmarks/fake_servers.py
+#
+# Local stand-in IMAP and SMTP servers for end-to-end throughput tests of
+# InboxConnector and EmailSender without a network. They speak just enough
+# of each protocol for imaplib and smtplib:
+#
+#   IMAP: CAPABILITY, NOOP, LOGIN, SELECT/EXAMINE, SEARCH, FETCH, STORE,
+#         UID SEARCH/FETCH/STORE, IDLE, CLOSE, LOGOUT
+#   SMTP: EHLO/HELO, STARTTLS, AUTH PLAIN, MAIL, RCPT, DATA, RSET, NOOP, QUIT
+#
+# Both servers take a `latency` (seconds slept before every response) and an
+# optional server-side SSL context; self_signed_contexts() makes a matching
+# pair with the openssl command line tool.
+
+import os
+import re
+import ssl
+import time
+import base64
+import random
+import select
+import shutil
+import tempfile
+import threading
+import subprocess
+import socketserver
+from email.message import EmailMessage
+from email.policy import SMTP
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+FIRST_NAMES = ["Ann", "Bob", "Carla", "Dev", "Erin", "Farid", "Grace", "Hiro", "Ines", "Jonas"]
+LAST_NAMES = ["Lopez", "Smith", "Okafor", "Chen", "Novak", "Haddad", "Kowalski", "Ito", "Reyes", "Berg"]
+STREETS = ["Holland Av", "Main St", "Elm St", "Lakeview Rd", "Park Pl"]
+REQUESTS = [
+    ("Leaking sink", "Hi, my kitchen sink has been leaking since Monday. Could someone take a look?"),
+    ("No heat", "The boiler seems to be dead, there is no heat in my apartment since last night."),
+    ("Rent question", "How much do I owe for rent this month? I want to pay before the due date."),
+    ("Lease renewal", "When does my lease end? I would like to renew for another year."),
+    ("Broken window lock", "The lock on my bedroom window is broken and will not close properly."),
+    ("Ticket update", "Any update on my maintenance request from last week? Still waiting."),
+]
+
+
+def generate_messages(n: int, seed: int = 0, to_addr: str = "office@example.com") -> List[bytes]:
+    """
+    `n` tenant emails as RFC 5322 bytes, reproducible for a given seed.
+    """
+    rng = random.Random(seed)
+    start = datetime(2025, 7, 1, 8, 0, tzinfo=timezone.utc)
+    messages = []
+    for i in range(n):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        subject, body = rng.choice(REQUESTS)
+        msg = EmailMessage()
+        msg["From"] = f"{first} {last} <{first.lower()}.{last.lower()}{i}@example.com>"
+        msg["To"] = to_addr
+        msg["Subject"] = subject
+        msg["Date"] = format_datetime(start + timedelta(minutes=i))
+        msg["Message-ID"] = f"<{seed}.{i}@example.com>"
+        msg.set_content(
+            f"{body}\n\nAddress: {rng.randint(1, 400)} {rng.choice(STREETS)} Apt {rng.randint(1, 20)}"
+            f"{rng.choice('ABCD')}\n\nThanks,\n{first} {last}\n"
+        )
+        messages.append(msg.as_bytes(policy=SMTP))
+    return messages
+
+
+_CONTEXTS: Optional[Tuple[ssl.SSLContext, ssl.SSLContext]] = None
+
+
+def self_signed_contexts() -> Tuple[ssl.SSLContext, ssl.SSLContext]:
+    """
+    (server, client) SSL contexts for a throwaway localhost certificate.
+    Raises RuntimeError if the openssl tool is not installed.
+    """
+    global _CONTEXTS
+    if _CONTEXTS is not None:
+        return _CONTEXTS
+    if shutil.which("openssl") is None:
+        raise RuntimeError("self_signed_contexts() needs the openssl command line tool")
+    with tempfile.TemporaryDirectory() as tmp:
+        cert, key = os.path.join(tmp, "cert.pem"), os.path.join(tmp, "key.pem")
+        subprocess.run(
+            ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+             "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1",
+             "-keyout", key, "-out", cert],
+            check=True, capture_output=True
+        )
+        server = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server.load_cert_chain(cert, key)
+        client = ssl.create_default_context(cafile=cert)
+    _CONTEXTS = (server, client)
+    return _CONTEXTS
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _BaseServer:
+    handler_class: type = None
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        ssl_context: Optional[ssl.SSLContext] = None,
+        users: Optional[Dict[str, str]] = None
+    ):
+        """
+        :param port: 0 picks a free port; see .port once started.
+        :param latency: Seconds slept before every response.
+        :param ssl_context: Server-side context for implicit TLS.
+        :param users: username -> password; None accepts any login.
+        """
+        self.latency = latency
+        self.ssl_context = ssl_context
+        self.users = users
+        self._server = _Server((host, port), self.handler_class, bind_and_activate=True)
+        self._server.app = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def host(self) -> str:
+        return self._server.server_address[0]
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def check_login(self, username: str, password: str) -> bool:
+        return self.users is None or self.users.get(username) == password
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _LineHandler(socketserver.BaseRequestHandler):
+    def setup(self):
+        self.app = self.server.app
+        if self.app.ssl_context is not None:
+            self.request = self.app.ssl_context.wrap_socket(self.request, server_side=True)
+        self.rfile = self.request.makefile("rb")
+
+    def finish(self):
+        try:
+            self.rfile.close()
+        except OSError:
+            pass
+
+    def send(self, *lines) -> None:
+        if self.app.latency:
+            time.sleep(self.app.latency)
+        data = b"".join(line if isinstance(line, bytes) else line.encode() + b"\r\n" for line in lines)
+        self.request.sendall(data)
+
+    def readline(self) -> bytes:
+        return self.rfile.readline(65536)
+
+
+# --- IMAP -----------------------------------------------------------------
+
+class FakeMailbox:
+    """Messages of one IMAP mailbox with their UIDs and flags."""
+
+    def __init__(self, messages: Optional[List[bytes]] = None):
+        self._cond = threading.Condition()
+        self._messages: List[list] = []  # [uid, data, flags]
+        self._next_uid = 1
+        self.load(messages or [])
+
+    def load(self, messages: List[bytes]) -> None:
+        with self._cond:
+            for data in messages:
+                self._messages.append([self._next_uid, data, set()])
+                self._next_uid += 1
+            self._cond.notify_all()
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    @property
+    def next_uid(self) -> int:
+        return self._next_uid
+
+    def seen_count(self) -> int:
+        with self._cond:
+            return sum(1 for m in self._messages if "\\Seen" in m[2])
+
+    def wait_for_more(self, count: int, timeout: float) -> int:
+        with self._cond:
+            self._cond.wait_for(lambda: len(self._messages) > count, timeout)
+            return len(self._messages)
+
+
+class _IMAPHandler(_LineHandler):
+    _TOKEN = re.compile(r'"((?:[^"\\]|\\.)*)"|(\((?:[^()]|\([^()]*\))*\))|(\S+)')
+
+    def handle(self):
+        self.user = None
+        self.mailbox: Optional[FakeMailbox] = None
+        self.send("* OK [CAPABILITY IMAP4rev1 IDLE UIDPLUS] fake IMAP ready")
+        while True:
+            line = self.readline()
+            if not line:
+                return
+            parts = line.decode("utf-8", "replace").rstrip("\r\n").split(" ", 2)
+            if len(parts) < 2:
+                self.send(f"{parts[0] or '*'} BAD missing command")
+                continue
+            tag, command = parts[0], parts[1].upper()
+            args = self._tokens(parts[2] if len(parts) > 2 else "")
+            uid = False
+            if command == "UID" and args:
+                uid, command, args = True, args[0].upper(), args[1:]
+            method = getattr(self, f"do_{command}", None)
+            if method is None:
+                self.send(f"{tag} BAD unknown command {command}")
+                continue
+            if command not in ("CAPABILITY", "NOOP", "LOGIN", "LOGOUT") and self.user is None:
+                self.send(f"{tag} NO not authenticated")
+                continue
+            try:
+                if method(tag, args, uid) is False:
+                    return
+            except (ValueError, IndexError) as e:
+                self.send(f"{tag} BAD {e or 'invalid arguments'}")
+
+    def _tokens(self, text: str) -> List[str]:
+        tokens = []
+        for quoted, group, atom in self._TOKEN.findall(text):
+            if group or atom:
+                tokens.append(group or atom)
+            else:
+                tokens.append(re.sub(r"\\(.)", r"\1", quoted))
+        return tokens
+
+    def do_CAPABILITY(self, tag, args, uid):
+        self.send("* CAPABILITY IMAP4rev1 IDLE UIDPLUS", f"{tag} OK CAPABILITY completed")
+
+    def do_NOOP(self, tag, args, uid):
+        self.send(f"{tag} OK NOOP completed")
+
+    def do_LOGIN(self, tag, args, uid):
+        if len(args) != 2 or not self.app.check_login(args[0], args[1]):
+            self.send(f"{tag} NO [AUTHENTICATIONFAILED] invalid credentials")
+            return
+        self.user = args[0]
+        self.send(f"{tag} OK LOGIN completed")
+
+    def do_SELECT(self, tag, args, uid):
+        name = "INBOX" if args[0].upper() == "INBOX" else args[0]
+        mailbox = self.app.mailboxes.get(name)
+        if mailbox is None:
+            self.send(f"{tag} NO mailbox does not exist")
+            return
+        self.mailbox = mailbox
+        unseen = next((i for i, m in enumerate(mailbox._messages, 1) if "\\Seen" not in m[2]), None)
+        lines = [
+            "* FLAGS (\\Answered \\Flagged \\Deleted \\Seen \\Draft)",
+            f"* {len(mailbox)} EXISTS",
+            "* 0 RECENT",
+            "* OK [UIDVALIDITY 1] UIDs valid",
+            f"* OK [UIDNEXT {mailbox.next_uid}] predicted next UID",
+        ]
+        if unseen:
+            lines.append(f"* OK [UNSEEN {unseen}] first unseen")
+        self.send(*lines, f"{tag} OK [READ-WRITE] SELECT completed")
+
+    do_EXAMINE = do_SELECT
+
+    def do_CLOSE(self, tag, args, uid):
+        self.mailbox = None
+        self.send(f"{tag} OK CLOSE completed")
+
+    def do_LOGOUT(self, tag, args, uid):
+        self.send("* BYE fake IMAP logging out", f"{tag} OK LOGOUT completed")
+        return False
+
+    def do_SEARCH(self, tag, args, uid):
+        if self.mailbox is None:
+            self.send(f"{tag} NO no mailbox selected")
+            return
+        if args and args[0].upper() == "CHARSET":
+            args = args[2:]
+        criteria = [a.upper() for a in args]
+        tests = {
+            "ALL": lambda m: True,
+            "UNSEEN": lambda m: "\\Seen" not in m[2],
+            "SEEN": lambda m: "\\Seen" in m[2],
+            "NEW": lambda m: "\\Seen" not in m[2],
+        }
+        if not criteria or any(c not in tests for c in criteria):
+            raise ValueError(f"unsupported search criteria {' '.join(args)}")
+        with self.mailbox._cond:
+            hits = [
+                str(m[0] if uid else seq)
+                for seq, m in enumerate(self.mailbox._messages, 1)
+                if all(tests[c](m) for c in criteria)
+            ]
+        self.send("* SEARCH" + "".join(" " + h for h in hits), f"{tag} OK SEARCH completed")
+
+    def do_FETCH(self, tag, args, uid):
+        if self.mailbox is None:
+            self.send(f"{tag} NO no mailbox selected")
+            return
+        items = args[1].strip("()").upper().split()
+        if uid and "UID" not in items:
+            items.insert(0, "UID")
+        out = []
+        for seq, message in self._select(args[0], uid):
+            if any(i in ("RFC822", "BODY[]") for i in items):
+                message[2].add("\\Seen")
+            parts = []
+            for item in items:
+                if item == "UID":
+                    parts.append(f"UID {message[0]}".encode())
+                elif item == "FLAGS":
+                    parts.append(f"FLAGS ({' '.join(sorted(message[2]))})".encode())
+                elif item == "RFC822.SIZE":
+                    parts.append(f"RFC822.SIZE {len(message[1])}".encode())
+                elif item in ("RFC822", "BODY[]", "BODY.PEEK[]"):
+                    name = "BODY[]" if item.startswith("BODY") else "RFC822"
+                    parts.append(f"{name} {{{len(message[1])}}}\r\n".encode() + message[1])
+                else:
+                    raise ValueError(f"unsupported fetch item {item}")
+            out.append(f"* {seq} FETCH (".encode() + b" ".join(parts) + b")\r\n")
+        self.send(*out, f"{tag} OK FETCH completed")
+
+    def do_STORE(self, tag, args, uid):
+        if self.mailbox is None:
+            self.send(f"{tag} NO no mailbox selected")
+            return
+        action = args[1].upper()
+        flags = set(" ".join(args[2:]).strip("()").split())
+        silent = action.endswith(".SILENT")
+        out = []
+        for seq, message in self._select(args[0], uid):
+            if action.startswith("+FLAGS"):
+                message[2] |= flags
+            elif action.startswith("-FLAGS"):
+                message[2] -= flags
+            elif action.startswith("FLAGS"):
+                message[2] = set(flags)
+            else:
+                raise ValueError(f"unsupported store action {action}")
+            if not silent:
+                uid_part = f"UID {message[0]} " if uid else ""
+                out.append(f"* {seq} FETCH ({uid_part}FLAGS ({' '.join(sorted(message[2]))}))")
+        self.send(*out, f"{tag} OK STORE completed")
+
+    def do_IDLE(self, tag, args, uid):
+        if self.mailbox is None:
+            self.send(f"{tag} NO no mailbox selected")
+            return
+        known = len(self.mailbox)
+        self.send("+ idling")
+        while True:
+            if self._client_ready(0.05):
+                line = self.readline()
+                if not line:
+                    return False
+                if line.strip().upper() == b"DONE":
+                    self.send(f"{tag} OK IDLE terminated")
+                    return
+                self.send(f"{tag} BAD expected DONE")
+                return
+            count = self.mailbox.wait_for_more(known, 0)
+            if count > known:
+                known = count
+                self.send(f"* {count} EXISTS")
+
+    def _client_ready(self, timeout: float) -> bool:
+        if isinstance(self.request, ssl.SSLSocket) and self.request.pending():
+            return True
+        return bool(select.select([self.request], [], [], timeout)[0])
+
+    def _select(self, spec: str, uid: bool):
+        """
+        Yield (sequence number, message) for an IMAP sequence set.
+        """
+        with self.mailbox._cond:
+            messages = list(enumerate(self.mailbox._messages, 1))
+        if not messages:
+            return
+        top = messages[-1][1][0] if uid else len(messages)
+        wanted = set()
+        for part in spec.split(","):
+            lo, _, hi = part.partition(":")
+            lo = top if lo == "*" else int(lo)
+            hi = lo if not hi else (top if hi == "*" else int(hi))
+            lo, hi = min(lo, hi), max(lo, hi)
+            if hi - lo > 1_000_000:
+                raise ValueError("sequence range too large")
+            wanted.update(range(lo, hi + 1))
+        for seq, message in messages:
+            if (message[0] if uid else seq) in wanted:
+                yield seq, message
+
+
+class FakeIMAPServer(_BaseServer):
+    """
+    IMAP server over in-memory mailboxes (INBOX by default).
+    """
+    handler_class = _IMAPHandler
+
+    def __init__(self, messages: Optional[List[bytes]] = None, mailboxes: Optional[Dict[str, FakeMailbox]] = None, **kwargs):
+        """
+        :param messages: Raw messages loaded into INBOX.
+        :param mailboxes: Name -> FakeMailbox, instead of `messages`.
+        """
+        super().__init__(**kwargs)
+        self.mailboxes = mailboxes if mailboxes is not None else {"INBOX": FakeMailbox(messages)}
+
+    @property
+    def inbox(self) -> FakeMailbox:
+        return self.mailboxes["INBOX"]
+
+
+# --- SMTP -----------------------------------------------------------------
+
+class _SMTPHandler(_LineHandler):
+    def handle(self):
+        self.tls = self.app.ssl_context is not None
+        self.authenticated = self.app.users is None
+        self._reset()
+        self.send("220 localhost fake SMTP ready")
+        while True:
+            line = self.readline()
+            if not line:
+                return
+            verb, _, arg = line.decode("utf-8", "replace").rstrip("\r\n").partition(" ")
+            method = getattr(self, f"do_{verb.upper()}", None)
+            if method is None:
+                self.send("502 command not implemented")
+            elif method(arg) is False:
+                return
+
+    def _reset(self):
+        self.mail_from = None
+        self.rcpt_to: List[str] = []
+
+    def do_EHLO(self, arg):
+        lines = ["250-localhost", "250-PIPELINING", "250-8BITMIME"]
+        if self.app.starttls_context is not None and not self.tls:
+            lines.append("250-STARTTLS")
+        lines.append("250 AUTH PLAIN")
+        self.send(*lines)
+
+    def do_HELO(self, arg):
+        self.send("250 localhost")
+
+    def do_STARTTLS(self, arg):
+        if self.app.starttls_context is None or self.tls:
+            self.send("454 TLS not available")
+            return
+        self.send("220 ready to start TLS")
+        self.request = self.app.starttls_context.wrap_socket(self.request, server_side=True)
+        self.rfile = self.request.makefile("rb")
+        self.tls = True
+        self._reset()
+
+    def do_AUTH(self, arg):
+        mechanism, _, initial = arg.partition(" ")
+        if mechanism.upper() != "PLAIN":
+            self.send("504 unrecognized authentication type")
+            return
+        if not initial:
+            self.send("334 ")
+            initial = self.readline().strip().decode()
+        try:
+            _, username, password = base64.b64decode(initial).decode().split("\0")
+        except ValueError:
+            self.send("501 malformed AUTH PLAIN response")
+            return
+        if not self.app.check_login(username, password):
+            self.send("535 authentication failed")
+            return
+        self.authenticated = True
+        self.send("235 authentication succeeded")
+
+    def do_MAIL(self, arg):
+        if not self.authenticated:
+            self.send("530 authentication required")
+            return
+        self._reset()
+        self.mail_from = _address(arg)
+        self.send("250 OK")
+
+    def do_RCPT(self, arg):
+        if self.mail_from is None:
+            self.send("503 need MAIL first")
+            return
+        self.rcpt_to.append(_address(arg))
+        self.send("250 OK")
+
+    def do_DATA(self, arg):
+        if not self.rcpt_to:
+            self.send("503 need RCPT first")
+            return
+        self.send("354 end data with <CR><LF>.<CR><LF>")
+        lines = []
+        while True:
+            line = self.readline()
+            if not line:
+                return False
+            if line in (b".\r\n", b".\n"):
+                break
+            lines.append(line[1:] if line.startswith(b"..") else line)
+        number = self.app.deliver(self.mail_from, self.rcpt_to, b"".join(lines))
+        self._reset()
+        self.send(f"250 OK queued as {number}")
+
+    def do_RSET(self, arg):
+        self._reset()
+        self.send("250 OK")
+
+    def do_NOOP(self, arg):
+        self.send("250 OK")
+
+    def do_QUIT(self, arg):
+        self.send("221 bye")
+        return False
+
+
+def _address(arg: str) -> str:
+    match = re.search(r"<([^>]*)>", arg)
+    return match.group(1) if match else arg.partition(":")[2].strip()
+
+
+class FakeSMTPServer(_BaseServer):
+    """
+    SMTP server that keeps every accepted message in `.messages`.
+
+    Pass `ssl_context` for implicit TLS (like port 465), or
+    `starttls_context` to offer STARTTLS on a plain connection.
+    """
+    handler_class = _SMTPHandler
+
+    def __init__(self, starttls_context: Optional[ssl.SSLContext] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.starttls_context = starttls_context
+        self.messages: List[Dict[str, object]] = []
+        self._lock = threading.Lock()
+
+    def deliver(self, mail_from: str, rcpt_to: List[str], data: bytes) -> int:
+        with self._lock:
+            self.messages.append({"from": mail_from, "to": list(rcpt_to), "data": data})
+            return len(self.messages)
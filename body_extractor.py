@@ -0,0 +1,185 @@
+# body_extractor.py
+
+import re
+import html
+import base64
+import binascii
+import quopri
+from dataclasses import dataclass
+from email.message import Message
+from typing import List, Optional
+from token_budget import count_tokens
+
+# Upper bound on the decoded bytes kept from any single MIME part.
+DEFAULT_MAX_PART_BYTES = 64 * 1024
+
+_SCRIPT_STYLE_RE = re.compile(r"<(script|style|head)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_BLOCK_TAG_RE = re.compile(r"<\s*(br|/p|/div|/li|/tr|/h[1-6]|/blockquote)\b[^>]*>", re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]+>")
+_HSPACE_RE = re.compile(r"[ \t\r\f\v\xa0]+")
+_BLANK_LINES_RE = re.compile(r"\n\s*\n+")
+
+# Lines that start a quoted previous message; everything from here down is dropped.
+_QUOTE_HEADER_RES = [
+    re.compile(r"^On .*wrote:\s*$"),
+    re.compile(r"^-{2,}\s*Original Message\s*-{2,}", re.IGNORECASE),
+    re.compile(r"^-{2,}\s*Forwarded message\s*-{2,}", re.IGNORECASE),
+    re.compile(r"^_{10,}\s*$"),
+    re.compile(r"^From:\s.+", re.IGNORECASE),
+]
+# "On <date> <name> <\nemail> wrote:" is often wrapped across two lines by clients.
+_WRAPPED_ON_WROTE_RE = re.compile(r"^On .*\n.*wrote:\s*$", re.MULTILINE)
+
+# Lines that start a signature block.
+_SIGNATURE_RES = [
+    re.compile(r"^--\s*$"),
+    re.compile(r"^Sent from my \w+", re.IGNORECASE),
+    re.compile(r"^Get Outlook for ", re.IGNORECASE),
+]
+
+
+@dataclass
+class ExtractedBody:
+    """
+    Result of pulling the tenant's own text out of a MIME message.
+    """
+    text: str
+    content_type: Optional[str]
+    raw_tokens: int
+    tokens: int
+    truncated: bool = False
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.raw_tokens - self.tokens
+
+
+def extract_body(msg: Message, max_part_bytes: int = DEFAULT_MAX_PART_BYTES) -> ExtractedBody:
+    """
+    Return the best text body of `msg`.
+
+    Preference order is text/plain, then text/html converted to text.
+    Attachments are skipped, each part is capped at `max_part_bytes`
+    decoded bytes, and quoted replies and signatures are stripped.
+    """
+    plain: List[str] = []
+    html_parts: List[str] = []
+    truncated = False
+
+    parts = msg.walk() if msg.is_multipart() else [msg]
+    for part in parts:
+        if part.is_multipart():
+            continue
+        if "attachment" in part.get("Content-Disposition", ""):
+            continue
+        content_type = part.get_content_type()
+        if content_type == "text/plain":
+            target = plain
+        elif content_type == "text/html":
+            if plain:
+                # Already have a plain part, no need to decode the HTML one
+                continue
+            target = html_parts
+        else:
+            continue
+
+        payload, part_truncated = _decode_capped(part, max_part_bytes)
+        truncated = truncated or part_truncated
+        charset = part.get_content_charset() or "utf-8"
+        try:
+            target.append(payload.decode(charset, errors="replace"))
+        except LookupError:
+            # Unknown charset label
+            target.append(payload.decode("utf-8", errors="replace"))
+
+    if plain:
+        raw = "".join(plain)
+        content_type = "text/plain"
+    elif html_parts:
+        raw = html_to_text("".join(html_parts))
+        content_type = "text/html"
+    else:
+        raw = ""
+        content_type = None
+
+    raw = raw.strip()
+    text = strip_quotes_and_signature(raw)
+    return ExtractedBody(
+        text=text,
+        content_type=content_type,
+        raw_tokens=count_tokens(raw),
+        tokens=count_tokens(text),
+        truncated=truncated,
+    )
+
+
+def html_to_text(markup: str) -> str:
+    """
+    Fast regex based HTML to text conversion.
+
+    Drops script/style/head blocks, turns block-level closing tags into
+    newlines, removes the remaining tags and unescapes entities.
+    """
+    text = _SCRIPT_STYLE_RE.sub("", markup)
+    text = _BLOCK_TAG_RE.sub("\n", text)
+    text = _TAG_RE.sub("", text)
+    text = html.unescape(text)
+    text = _HSPACE_RE.sub(" ", text)
+    text = "\n".join(line.strip() for line in text.splitlines())
+    return _BLANK_LINES_RE.sub("\n\n", text).strip()
+
+
+def strip_quotes_and_signature(text: str) -> str:
+    """
+    Remove quoted previous messages and the sender's signature.
+
+    Falls back to the original text if stripping would leave nothing,
+    so a body never becomes empty because of it.
+    """
+    m = _WRAPPED_ON_WROTE_RE.search(text)
+    if m:
+        text = text[:m.start()]
+
+    kept: List[str] = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if any(r.match(stripped) for r in _QUOTE_HEADER_RES):
+            break
+        if any(r.match(line) for r in _SIGNATURE_RES):
+            break
+        if stripped.startswith(">"):
+            continue
+        kept.append(line)
+
+    result = "\n".join(kept).strip()
+    return result or text.strip()
+
+
+def _decode_capped(part: Message, max_bytes: int) -> tuple[bytes, bool]:
+    """
+    Decode the transfer encoding of `part`, keeping at most `max_bytes`.
+
+    Large base64/quoted-printable payloads are cut before decoding so
+    oversized parts never get fully decoded in memory.
+    """
+    encoding = (part.get("Content-Transfer-Encoding") or "").strip().lower()
+    raw = part.get_payload(decode=False)
+    if not isinstance(raw, str) or encoding not in ("base64", "quoted-printable"):
+        payload = part.get_payload(decode=True) or b""
+        return payload[:max_bytes], len(payload) > max_bytes
+
+    if encoding == "base64":
+        # 4 encoded chars -> 3 bytes; cut on a 4-char boundary
+        compact = "".join(raw.split())
+        limit = ((max_bytes + 2) // 3) * 4
+        try:
+            payload = base64.b64decode(compact[:limit])
+        except (binascii.Error, ValueError):
+            payload = part.get_payload(decode=True) or b""
+        return payload[:max_bytes], len(compact) > limit or len(payload) > max_bytes
+
+    # quoted-printable expands at most 3x; cut on a line boundary
+    limit = max_bytes * 3
+    cut = raw if len(raw) <= limit else raw[:raw.rfind("\n", 0, limit) + 1 or limit]
+    payload = quopri.decodestring(cut.encode("ascii", errors="replace"))
+    return payload[:max_bytes], len(cut) < len(raw) or len(payload) > max_bytes
@@ -0,0 +1,185 @@
+# circuit_breaker.py
+
+import time
+import logging
+import smtplib
+import threading
+from collections import deque
+from typing import Any, Callable, Optional
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpen(Exception):
+    """A call was rejected without being made because its circuit is open."""
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} circuit open, retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Stops calling a dependency that keeps failing.
+
+    Closed: calls go through and their outcomes are kept in a window of
+    the last `window` calls. Once at least `min_calls` are in the window
+    and `failure_rate` of them failed, the circuit opens.
+    Open: calls are rejected at once (CircuitOpen) for `open_seconds`.
+    Half-open: then up to `probes` calls are let through; a success
+    closes the circuit again, a failure reopens it.
+
+    Only errors for which `is_failure` returns True count, so a rejected
+    recipient or a bad request does not open the circuit for everyone.
+    """
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        min_calls: int = 10,
+        window: int = 20,
+        open_seconds: float = 30.0,
+        probes: int = 1,
+        is_failure: Callable[[BaseException], bool] = lambda e: True,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.probes = probes
+        self.is_failure = is_failure
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._outcomes: deque = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def available(self) -> bool:
+        """
+        True unless calls would be rejected right now. Does not take a
+        half-open probe slot.
+        """
+        with self._lock:
+            state = self._current_state()
+            return state == CLOSED or (state == HALF_OPEN and self._probing < self.probes)
+
+    def allow(self) -> bool:
+        """
+        Whether to make a call now; every allowed call must be followed by
+        record(). Rejections count as breaker.<name>.rejected.
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._probing < self.probes:
+                self._probing += 1
+                return True
+        metrics.incr(f"breaker.{self.name}.rejected")
+        return False
+
+    def success(self) -> None:
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._transition(CLOSED)
+            else:
+                self._outcomes.append(True)
+
+    def failure(self) -> None:
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._transition(OPEN)
+                return
+            self._outcomes.append(False)
+            failed = self._outcomes.count(False)
+            if self._state == CLOSED and len(self._outcomes) >= self.min_calls \
+               and failed >= self.failure_rate * len(self._outcomes):
+                self._transition(OPEN)
+
+    def record(self, error: Optional[BaseException] = None) -> None:
+        """
+        Record the outcome of an allowed call: a success, or the error it
+        raised (which only counts against the circuit if is_failure says so).
+        """
+        if error is not None and self.is_failure(error):
+            self.failure()
+        else:
+            self.success()
+
+    def check(self) -> None:
+        """
+        allow(), raising CircuitOpen instead of returning False.
+        """
+        if not self.allow():
+            raise CircuitOpen(self.name, self.retry_after())
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        """
+        fn() guarded by the breaker; raises CircuitOpen while open.
+        """
+        self.check()
+        try:
+            result = fn()
+        except BaseException as e:
+            self.record(e)
+            raise
+        self.record()
+        return result
+
+    def retry_after(self) -> float:
+        with self._lock:
+            if self._state == CLOSED:
+                return 0.0
+            return max(self._opened_at + self.open_seconds - self._clock(), 0.0)
+
+    def _current_state(self) -> str:
+        # Open circuits turn half-open once open_seconds have passed
+        if self._state == OPEN and self._clock() >= self._opened_at + self.open_seconds:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def _transition(self, state: str) -> None:
+        previous, self._state = self._state, state
+        self._probing = 0
+        if state == OPEN:
+            self._opened_at = self._clock()
+            metrics.incr(f"breaker.{self.name}.opened")
+            logger.warning("%s circuit open for %.0fs (was %s)", self.name, self.open_seconds, previous)
+        elif state == CLOSED:
+            self._outcomes.clear()
+            logger.info("%s circuit closed", self.name)
+
+
+def guarded(breaker: Optional[CircuitBreaker], fn: Callable[[], Any]) -> Any:
+    """
+    fn() through `breaker` when one is configured, else directly.
+    """
+    if breaker is None:
+        return fn()
+    return breaker.call(fn)
+
+
+def llm_failure(e: BaseException) -> bool:
+    """
+    Provider trouble: timeouts, connection errors, rate limits and 5xx.
+    """
+    import openai
+    return isinstance(e, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError))
+
+
+def smtp_failure(e: BaseException) -> bool:
+    """
+    Relay trouble: anything but a rejected sender or recipient.
+    """
+    return not isinstance(e, (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused))
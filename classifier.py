@@ -0,0 +1,270 @@
+# classifier.py
+
+import os
+import re
+import sys
+import math
+import zlib
+import random
+import logging
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import serialization
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+# Candidate softmax temperatures tried by calibration
+_TEMPERATURES = [0.25 * 1.15 ** i for i in range(25)]
+
+
+@lru_cache(maxsize=1)
+def _numpy():
+    # Optional: batches are scored with one matrix product when NumPy is
+    # installed, and row by row otherwise
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def message_text(msg: Dict[str, Any]) -> str:
+    """
+    The text classified for a fetched message: subject plus body.
+    """
+    return f"{msg.get('subject') or ''}\n{msg.get('body') or ''}"
+
+
+def training_data(output_dir: str = "action_items") -> Tuple[List[str], List[str]]:
+    """
+    (texts, labels) from stored action items: message_text() of the
+    stored subject and body, labelled with the request_type the LLM
+    parser assigned. Items without a body (older items, incidents) are
+    skipped, and so are items labelled by the rule parser or by the
+    classifier itself, or written before the parse tier was stored.
+    """
+    texts, labels = [], []
+    skipped = unlabelled = 0
+    if not os.path.isdir(output_dir):
+        return texts, labels
+    for name in sorted(os.listdir(output_dir)):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(output_dir, name), "rb") as f:
+                item = serialization.loads(f.read())
+        except (OSError, serialization.JSONDecodeError) as e:
+            logger.warning("Skipping unreadable action item %s: %s", name, e)
+            continue
+        if not item.get("request_type"):
+            continue
+        if not item.get("body"):
+            skipped += 1
+            continue
+        if item.get("parsed_by") in (None, "rules", "classifier"):
+            unlabelled += 1
+            continue
+        texts.append(message_text(item))
+        labels.append(item["request_type"])
+    if skipped:
+        logger.info("Skipped %d action items without a stored body", skipped)
+    if unlabelled:
+        logger.info("Skipped %d action items not labelled by the LLM parser", unlabelled)
+    return texts, labels
+
+
+class RequestTypeClassifier:
+    """
+    Local request_type classifier: hashed word unigrams and bigrams fed to
+    a multinomial logistic regression, with temperature scaling so that
+    the probabilities can be used as confidences.
+
+    Cheap enough to score a whole fetched batch before any LLM call; the
+    parser uses confident predictions to skip the LLM (see
+    LLMEmailParser.preclassify()).
+    """
+    def __init__(self, n_features: int = 2 ** 14, labels: Sequence[str] = ()):
+        """
+        :param n_features: Size of the hashed feature space; a power of 2.
+        """
+        if n_features & (n_features - 1):
+            raise ValueError("n_features must be a power of 2")
+        self.n_features = n_features
+        self.labels: List[str] = list(labels)
+        self.weights: Dict[int, List[float]] = {}  # feature -> one weight per label
+        self.bias: List[float] = [0.0] * len(self.labels)
+        self.temperature = 1.0
+        self._dense = None  # (W, b) NumPy arrays, built on first batch
+
+    def features(self, text: str) -> Dict[int, float]:
+        """
+        Signed hashed counts of word unigrams and bigrams, log-scaled and
+        L2-normalised.
+        """
+        words = _TOKEN_RE.findall(text.lower())
+        counts: Counter = Counter()
+        mask = self.n_features - 1
+        for gram in words + [a + " " + b for a, b in zip(words, words[1:])]:
+            h = zlib.crc32(gram.encode("utf-8"))
+            counts[h & mask] += 1.0 if h & 0x80000000 else -1.0
+        row = {j: math.copysign(math.log1p(abs(c)), c) for j, c in counts.items() if c}
+        norm = math.sqrt(sum(v * v for v in row.values())) or 1.0
+        return {j: v / norm for j, v in row.items()}
+
+    def fit(
+        self,
+        texts: Sequence[str],
+        labels: Sequence[str],
+        epochs: int = 30,
+        learning_rate: float = 0.5,
+        l2: float = 1e-4,
+        holdout: float = 0.2,
+        seed: int = 0
+    ) -> "RequestTypeClassifier":
+        """
+        Train on (text, label) pairs by SGD. When there are enough
+        examples, `holdout` of them first calibrate the temperature on a
+        model trained without them; the final model uses all examples.
+        """
+        if len(texts) != len(labels) or not texts:
+            raise ValueError("fit() needs the same, non-zero number of texts and labels")
+        self.labels = sorted(set(labels))
+        if len(self.labels) < 2:
+            # A one-label model would give every text probability 1.0 and
+            # skip the LLM for all of them
+            raise ValueError(f"fit() needs at least two labels, got {self.labels}")
+        rows = [self.features(t) for t in texts]
+        targets = [self.labels.index(label) for label in labels]
+        order = list(range(len(rows)))
+        random.Random(seed).shuffle(order)
+
+        n_held = int(len(rows) * holdout) if len(rows) >= 20 else 0
+        if n_held:
+            held, train = order[:n_held], order[n_held:]
+            self._sgd([rows[i] for i in train], [targets[i] for i in train], epochs, learning_rate, l2, seed)
+            self.temperature = self._best_temperature([rows[i] for i in held], [targets[i] for i in held])
+        self._sgd(rows, targets, epochs, learning_rate, l2, seed)
+        return self
+
+    def _sgd(self, rows, targets, epochs, learning_rate, l2, seed) -> None:
+        n_labels = len(self.labels)
+        self.weights = {}
+        self.bias = [0.0] * n_labels
+        self._dense = None
+        rng = random.Random(seed)
+        order = list(range(len(rows)))
+        for epoch in range(epochs):
+            rng.shuffle(order)
+            lr = learning_rate / (1 + 0.1 * epoch)
+            for i in order:
+                row = rows[i]
+                probs = self._softmax(self._scores(row), 1.0)
+                probs[targets[i]] -= 1.0  # gradient of the log loss per label
+                for c in range(n_labels):
+                    self.bias[c] -= lr * probs[c]
+                for j, x in row.items():
+                    w = self.weights.setdefault(j, [0.0] * n_labels)
+                    for c in range(n_labels):
+                        w[c] -= lr * (probs[c] * x + l2 * w[c])
+
+    def _best_temperature(self, rows, targets) -> float:
+        scores = [self._scores(row) for row in rows]
+
+        def nll(t):
+            return -sum(math.log(max(self._softmax(s, t)[y], 1e-12)) for s, y in zip(scores, targets))
+
+        return min(_TEMPERATURES, key=nll)
+
+    def _scores(self, row: Dict[int, float]) -> List[float]:
+        scores = list(self.bias)
+        for j, x in row.items():
+            w = self.weights.get(j)
+            if w is not None:
+                for c, wc in enumerate(w):
+                    scores[c] += wc * x
+        return scores
+
+    @staticmethod
+    def _softmax(scores: List[float], temperature: float) -> List[float]:
+        top = max(scores)
+        exps = [math.exp((s - top) / temperature) for s in scores]
+        total = sum(exps)
+        return [e / total for e in exps]
+
+    def predict_proba(self, texts: Sequence[str]) -> List[Dict[str, float]]:
+        """
+        Calibrated probability of each label, for every text in the batch.
+        """
+        if not self.labels:
+            raise ValueError("Classifier is not trained")
+        rows = [self.features(t) for t in texts]
+        np = _numpy()
+        if np is None or not rows:
+            return [dict(zip(self.labels, self._softmax(self._scores(r), self.temperature))) for r in rows]
+
+        if self._dense is None:
+            W = np.zeros((self.n_features, len(self.labels)))
+            for j, w in self.weights.items():
+                W[j] = w
+            self._dense = (W, np.asarray(self.bias))
+        W, b = self._dense
+        X = np.zeros((len(rows), self.n_features))
+        for i, row in enumerate(rows):
+            X[i, list(row)] = list(row.values())
+        Z = (X @ W + b) / self.temperature
+        P = np.exp(Z - Z.max(axis=1, keepdims=True))
+        P /= P.sum(axis=1, keepdims=True)
+        return [dict(zip(self.labels, p.tolist())) for p in P]
+
+    def predict(self, texts: Sequence[str]) -> List[Tuple[str, float]]:
+        """
+        (label, probability) of the most likely label for every text.
+        """
+        return [max(p.items(), key=lambda kv: kv[1]) for p in self.predict_proba(texts)]
+
+    def classify_messages(self, msgs: Iterable[Dict[str, Any]]) -> List[Tuple[str, float]]:
+        return self.predict([message_text(m) for m in msgs])
+
+    def save(self, path: str) -> None:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = {
+            "n_features": self.n_features,
+            "labels": self.labels,
+            "bias": self.bias,
+            "temperature": self.temperature,
+            "weights": {str(j): w for j, w in self.weights.items()},
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(serialization.dumps(data, compact=True))
+
+    @classmethod
+    def load(cls, path: str) -> "RequestTypeClassifier":
+        with open(path, "rb") as f:
+            data = serialization.loads(f.read())
+        model = cls(n_features=data["n_features"], labels=data["labels"])
+        model.bias = data["bias"]
+        model.temperature = data["temperature"]
+        model.weights = {int(j): w for j, w in data["weights"].items()}
+        return model
+
+    @classmethod
+    def from_action_items(cls, output_dir: str = "action_items", **fit_kwargs) -> "RequestTypeClassifier":
+        """
+        Train on the labels the LLM parser already produced.
+        """
+        texts, labels = training_data(output_dir)
+        return cls().fit(texts, labels, **fit_kwargs)
+
+
+if __name__ == "__main__":
+    # python classifier.py [action_items dir] [model path]
+    source = sys.argv[1] if len(sys.argv) > 1 else "action_items"
+    target = sys.argv[2] if len(sys.argv) > 2 else "models/request_type.json"
+    model = RequestTypeClassifier.from_action_items(source)
+    model.save(target)
+    print(f"Trained on {source} ({', '.join(model.labels)}), T={model.temperature:.2f}, saved to {target}")
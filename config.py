@@ -0,0 +1,47 @@
+# config.py
+
+import os
+import sys
+import importlib.util
+from functools import lru_cache
+from types import ModuleType
+
+
+@lru_cache(maxsize=None)
+def load_env() -> None:
+    """
+    Load the .env file into os.environ, once per process.
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Return module `name`, deferring its actual import until the first
+    attribute access. Used for heavy dependencies (openai, faker) that a
+    run with an empty inbox never touches.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def configure_openai() -> None:
+    """
+    Set the OpenAI API key from the environment unless already set.
+    Called when the first model-backed component is built.
+    """
+    load_env()
+    openai = sys.modules.get("openai") or lazy_import("openai")
+    if not openai.api_key:
+        openai.api_key = os.environ.get("OPEN_AI_KEY")
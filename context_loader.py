@@ -1,7 +1,7 @@
 import random
-from faker import Faker
 from typing import Dict, Any
 from nanoid import generate
+import tracing
 
 
 class ContextLoader:
@@ -12,9 +12,9 @@ class ContextLoader:
         """
         :param seed: Optional seed for reproducible data.
         """
-        self.faker = Faker()
+        self.seed = seed
+        self._faker = None
         if seed is not None:
-            Faker.seed(seed)
             random.seed(seed)
 
         # A small pool of example maintenance issues
@@ -30,6 +30,17 @@ class ContextLoader:
         ]
         self._statuses = ["open", "in_progress", "resolved"]
 
+    @property
+    def faker(self):
+        # Faker is slow to import and build; only pay for it on first use
+        if self._faker is None:
+            from faker import Faker
+            self._faker = Faker()
+            if self.seed is not None:
+                Faker.seed(self.seed)
+        return self._faker
+
+    @tracing.traced("context.load")
     def load(self, tenant_name: str, address: str) -> Dict[str, Any]:
         """
         Return a dict of contextual info with randomized values.
@@ -0,0 +1,114 @@
+# deadlines.py
+
+import time
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, Optional
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineExceeded(TimeoutError):
+    """A stage gave up because the email's deadline passed."""
+    def __init__(self, stage: str):
+        super().__init__(f"Deadline exceeded in {stage}")
+        self.stage = stage
+
+
+class Deadline:
+    """
+    Time budget for one email, started when processing it begins (not
+    at fetch, so time spent queued behind other emails is not charged).
+
+    Stages derive their socket and HTTP timeouts from what is left
+    (timeout()), skip optional expensive work when too little is left
+    (has_time()) and report where the budget ran out (checkpoint()).
+    """
+    __slots__ = ("budget", "expires_at", "missed_stage", "_clock")
+
+    def __init__(self, budget: float, clock: Callable[[], float] = time.monotonic):
+        self.budget = budget
+        self._clock = clock
+        self.expires_at = clock() + budget
+        self.missed_stage: Optional[str] = None
+
+    def remaining(self) -> float:
+        return max(self.expires_at - self._clock(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self._clock() >= self.expires_at
+
+    def timeout(self, cap: Optional[float] = None) -> float:
+        """
+        Seconds a call may take: what is left, at most `cap`.
+        """
+        remaining = self.remaining()
+        return remaining if cap is None else min(remaining, cap)
+
+    def has_time(self, stage: str, needed: float) -> bool:
+        """
+        True if at least `needed` seconds are left; otherwise the stage
+        should degrade, which is counted as deadline.<stage>.degraded.
+        """
+        if self.remaining() >= needed:
+            return True
+        metrics.incr(f"deadline.{stage}.degraded")
+        return False
+
+    def checkpoint(self, stage: str) -> None:
+        """
+        Call after a stage: counts deadline.<stage>.missed for the stage in
+        which the budget ran out (once per email).
+        """
+        if self.missed_stage is None and self.expired:
+            self.missed_stage = stage
+            metrics.incr(f"deadline.{stage}.missed")
+            logger.warning("Email deadline of %.0fs ran out in %s", self.budget, stage)
+
+
+_current: ContextVar[Optional[Deadline]] = ContextVar("deadline", default=None)
+
+
+@contextmanager
+def scope(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    """
+    Make `deadline` the current one for the block (None for no deadline).
+    """
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def current() -> Optional[Deadline]:
+    return _current.get()
+
+
+def timeout_for(cap: Optional[float]) -> Optional[float]:
+    """
+    Timeout for an external call: `cap`, shortened to the current
+    deadline's remaining time if there is one.
+    """
+    deadline = _current.get()
+    return cap if deadline is None else deadline.timeout(cap)
+
+
+def has_time(stage: str, needed: float) -> bool:
+    deadline = _current.get()
+    return deadline is None or deadline.has_time(stage, needed)
+
+
+def expired() -> bool:
+    deadline = _current.get()
+    return deadline is not None and deadline.expired
+
+
+def checkpoint(stage: str) -> None:
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.checkpoint(stage)
@@ -0,0 +1,176 @@
+# hedging.py
+
+import time
+import logging
+import threading
+import contextvars
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class HedgePolicy:
+    """
+    Decides when to send a duplicate ("hedged") request.
+
+    The hedge delay for a key (e.g. "parse") is the `percentile` of its
+    recent completed call latencies, so only the slowest calls are
+    duplicated. `budget` caps hedges at that fraction of calls, so a
+    provider that is slow across the board does not get double the load.
+    """
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        budget: float = 0.05,
+        min_samples: int = 20,
+        window: int = 500,
+        min_delay: float = 0.05,
+        refresh_every: int = 20
+    ):
+        """
+        :param min_samples: Calls to observe before hedging a key at all.
+        :param window: Recent latencies kept per key.
+        :param min_delay: Never hedge sooner than this, in seconds.
+        :param refresh_every: Recompute the percentile after this many calls.
+        """
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.refresh_every = refresh_every
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, deque] = defaultdict(lambda: deque(maxlen=window))
+        self._delays: Dict[str, Optional[float]] = {}
+        self._since_refresh: Dict[str, int] = defaultdict(int)
+        self._calls: Dict[str, int] = defaultdict(int)
+        self._hedges: Dict[str, int] = defaultdict(int)
+
+    def observe(self, key: str, latency: float) -> None:
+        with self._lock:
+            samples = self._latencies[key]
+            samples.append(latency)
+            self._since_refresh[key] += 1
+            if len(samples) >= self.min_samples and (
+                key not in self._delays or self._since_refresh[key] >= self.refresh_every
+            ):
+                ordered = sorted(samples)
+                rank = min(int(len(ordered) * self.percentile / 100.0), len(ordered) - 1)
+                self._delays[key] = max(ordered[rank], self.min_delay)
+                self._since_refresh[key] = 0
+
+    def delay(self, key: str) -> Optional[float]:
+        """
+        Seconds to wait before hedging a call, or None if not learnt yet.
+        """
+        with self._lock:
+            self._calls[key] += 1
+            return self._delays.get(key)
+
+    def allow_hedge(self, key: str) -> bool:
+        """
+        Take one hedge from the budget, if any is left.
+        """
+        with self._lock:
+            if self._hedges[key] + 1 > self.budget * self._calls[key]:
+                return False
+            self._hedges[key] += 1
+            return True
+
+
+class HedgedCaller:
+    """
+    Runs a call and, if it is still outstanding after the policy's delay,
+    a duplicate; the first to succeed wins.
+
+    The loser is cancelled if it has not started. A running loser cannot
+    be interrupted (the OpenAI client is blocking), so its result is
+    passed to `discard` when it arrives, e.g. to close a response stream.
+    Latencies go to `hedge.<key>.primary` (each call as if unhedged) and
+    `hedge.<key>.latency` (what the caller saw).
+    """
+    def __init__(self, policy: Optional[HedgePolicy] = None, max_workers: int = 8):
+        self.policy = policy or HedgePolicy()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+
+    def call(self, key: str, fn: Callable[[], Any], discard: Optional[Callable[[Any], None]] = None) -> Any:
+        start = time.perf_counter()
+        metrics.incr(f"hedge.{key}.calls")
+        primary = self._submit(key, fn, start, primary=True)
+        delay = self.policy.delay(key)
+        if delay is None:
+            result = primary.result()
+            metrics.observe(f"hedge.{key}.latency", time.perf_counter() - start)
+            return result
+
+        done, _ = wait([primary], timeout=delay)
+        if done or not self.policy.allow_hedge(key):
+            if not done:
+                metrics.incr(f"hedge.{key}.budget_exhausted")
+            result = primary.result()
+            metrics.observe(f"hedge.{key}.latency", time.perf_counter() - start)
+            return result
+
+        metrics.incr(f"hedge.{key}.hedged")
+        logger.debug("Hedging %s call after %.2fs", key, delay)
+        backup = self._submit(key, fn, time.perf_counter(), primary=False)
+        pending = {primary, backup}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                for loser in pending:
+                    self._abandon(loser, discard)
+                if future is backup:
+                    metrics.incr(f"hedge.{key}.backup_won")
+                metrics.observe(f"hedge.{key}.latency", time.perf_counter() - start)
+                return future.result()
+        raise error
+
+    def _submit(self, key: str, fn: Callable[[], Any], start: float, primary: bool) -> Future:
+        def run():
+            result = fn()
+            latency = time.perf_counter() - start
+            self.policy.observe(key, latency)
+            if primary:
+                metrics.observe(f"hedge.{key}.primary", latency)
+            return result
+        # Run in the caller's context, so the pool thread sees its current
+        # span and any other context variables
+        return self._executor.submit(contextvars.copy_context().run, run)
+
+    @staticmethod
+    def _abandon(future: Future, discard: Optional[Callable[[Any], None]]) -> None:
+        if future.cancel() or discard is None:
+            return
+
+        def cleanup(f: Future) -> None:
+            if not f.cancelled() and f.exception() is None:
+                try:
+                    discard(f.result())
+                except Exception as e:
+                    logger.debug("Ignoring error discarding hedged result: %s", e)
+        future.add_done_callback(cleanup)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def hedged(
+    caller: Optional[HedgedCaller],
+    key: str,
+    fn: Callable[[], Any],
+    discard: Optional[Callable[[Any], None]] = None
+) -> Any:
+    """
+    fn() through `caller` when hedging is configured, else directly.
+    """
+    if caller is None:
+        return fn()
+    return caller.call(key, fn, discard)
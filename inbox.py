@@ -1,32 +1,113 @@
 # inbox.py
 
+import ssl
 import imaplib
 import email
 from email.header import decode_header
 import logging
+import tracing
+from body_extractor import extract_body, DEFAULT_MAX_PART_BYTES
 
 logger = logging.getLogger(__name__)
 
+
+def parse_message(uid: str, raw_email: bytes, max_body_bytes: int = DEFAULT_MAX_PART_BYTES) -> dict:
+    """
+    The pipeline's fields for one raw RFC822 message: uid, sender,
+    subject, date, message_id, body (trimmed, see body_extractor) and
+    tokens_saved.
+    """
+    msg = email.message_from_bytes(raw_email)
+
+    # Decode headers
+    subject, encoding = decode_header(msg.get("Subject"))[0]
+    if isinstance(subject, bytes):
+        subject = subject.decode(encoding or "utf-8", errors="replace")
+
+    from_ = msg.get("From")
+    date_ = msg.get("Date")
+
+    body = extract_body(msg, max_part_bytes=max_body_bytes)
+    if body.tokens_saved or body.truncated:
+        logger.info(
+            "Trimmed body of UID %s: ~%d tokens saved%s",
+            uid, body.tokens_saved, " (truncated)" if body.truncated else ""
+        )
+
+    return {
+        "uid": uid,
+        "sender": from_,
+        "subject": subject,
+        "date": date_,
+        "message_id": msg.get("Message-ID"),
+        "body": body.text,
+        "tokens_saved": body.tokens_saved,
+    }
+
+
 class InboxConnector:
-    def __init__(self, host: str, username: str, password: str, mailbox: str = "INBOX"):
+    def __init__(
+        self,
+        host: str,
+        username: str,
+        password: str,
+        mailbox: str = "INBOX",
+        max_body_bytes: int = DEFAULT_MAX_PART_BYTES,
+        port: int | None = None,
+        use_ssl: bool = True,
+        ssl_context: ssl.SSLContext | None = None,
+        timeout: float | None = 30.0,
+        recorder=None
+    ):
+        """
+        :param timeout: Socket timeout for the IMAP connection, in seconds.
+        :param recorder: Optional replay.Recorder; the raw RFC822 of every
+                         fetched message is added to its corpus.
+        """
         self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.ssl_context = ssl_context
         self.username = username
         self.password = password
         self.mailbox = mailbox
-        self.conn: imaplib.IMAP4_SSL | None = None
+        self.max_body_bytes = max_body_bytes
+        self.timeout = timeout
+        self.recorder = recorder
+        self.conn: imaplib.IMAP4 | None = None
+        # UIDs are only meaningful together with the mailbox's UIDVALIDITY
+        self.uidvalidity: str | None = None
 
     def connect(self):
-        """Establishes an SSL IMAP connection and logs in."""
+        """Establishes an IMAP connection (SSL unless use_ssl=False) and logs in."""
         logger.info("Connecting to IMAP server %s", self.host)
-        self.conn = imaplib.IMAP4_SSL(self.host)
+        args = (self.host,) if self.port is None else (self.host, self.port)
+        kwargs = {"timeout": self.timeout}
+        if not self.use_ssl:
+            self.conn = imaplib.IMAP4(*args, **kwargs)
+        elif self.ssl_context is not None:
+            self.conn = imaplib.IMAP4_SSL(*args, ssl_context=self.ssl_context, **kwargs)
+        else:
+            self.conn = imaplib.IMAP4_SSL(*args, **kwargs)
         self.conn.login(self.username, self.password)
         self.conn.select(self.mailbox)
+        validity = self.conn.response("UIDVALIDITY")[1][-1]
+        self.uidvalidity = validity.decode() if isinstance(validity, bytes) else validity
         logger.info("Logged in as %s and selected mailbox %s", self.username, self.mailbox)
 
-    def fetch_unread(self, limit: int = 10):
+    def fetch_unread(self, limit: int = 10, mark_seen: bool = True):
+        """
+        Fetch up to `limit` unseen messages. Messages are addressed by UID,
+        which unlike sequence numbers stays valid across sessions, and
+        carry the mailbox's "uidvalidity" for mark_seen().
+
+        :param mark_seen: Set \\Seen on each message as it is fetched. Pass
+                          False to flag them with mark_seen() only once their
+                          reply is safely stored.
+        """
         assert self.conn, "Must call connect() first"
         # Search for unseen messages
-        status, data = self.conn.search(None, 'UNSEEN')
+        status, data = self.conn.uid('SEARCH', None, 'UNSEEN')
         if status != 'OK':
             logger.error("Failed to search inbox: %s", status)
             return []
@@ -35,48 +116,56 @@ class InboxConnector:
         messages = []
 
         for uid in uids:
-            # Fetch the RFC822 message
-            status, msg_data = self.conn.fetch(uid, '(RFC822)')
-            if status != 'OK':
-                logger.warning("Failed to fetch message UID %s: %s", uid, status)
+            # Every message starts its own trace; the traceparent travels
+            # with it through the pipeline and the outbox
+            with tracing.span("imap.fetch", mailbox=self.mailbox, uid=uid.decode()) as span:
+                fields = self._fetch_one(uid, span)
+            if fields is None:
                 continue
+            messages.append(fields)
 
-            raw_email = msg_data[0][1]
-            msg = email.message_from_bytes(raw_email)
-
-            # Decode headers
-            subject, encoding = decode_header(msg.get("Subject"))[0]
-            if isinstance(subject, bytes):
-                subject = subject.decode(encoding or "utf-8", errors="replace")
-
-            from_ = msg.get("From")
-            date_ = msg.get("Date")
-
-            body = ""
-            if msg.is_multipart():
-                for part in msg.walk():
-                    content_type = part.get_content_type()
-                    content_disposition = part.get("Content-Disposition", "")
-                    if content_type == "text/plain" and "attachment" not in content_disposition:
-                        charset = part.get_content_charset() or "utf-8"
-                        body += part.get_payload(decode=True).decode(charset, errors="replace")
-            else:
-                charset = msg.get_content_charset() or "utf-8"
-                body = msg.get_payload(decode=True).decode(charset, errors="replace")
-
-            messages.append({
-                "uid": uid.decode(),
-                "sender": from_,
-                "subject": subject,
-                "date": date_,
-                "body": body.strip()
-            })
-
-            # Mark as read
-            self.conn.store(uid, '+FLAGS', '\\Seen')
+            if mark_seen:
+                self.mark_seen(uid)
 
         return messages
 
+    def _fetch_one(self, uid: bytes, span: tracing.Span):
+        # Fetch the full message; PEEK leaves \Seen to mark_seen()
+        status, msg_data = self.conn.uid('FETCH', uid, '(BODY.PEEK[])')
+        if status != 'OK':
+            logger.warning("Failed to fetch message UID %s: %s", uid, status)
+            return None
+
+        raw_email = msg_data[0][1]
+        fields = parse_message(uid.decode(), raw_email, self.max_body_bytes)
+        if self.recorder is not None:
+            self.recorder.message(fields, raw_email)
+        fields["uidvalidity"] = self.uidvalidity
+        fields["traceparent"] = span.traceparent
+        span.set(body_bytes=len(raw_email), tokens_saved=fields["tokens_saved"])
+        return fields
+
+    def mark_seen(self, uid, uidvalidity: str | None = None) -> bool:
+        """
+        Set the \\Seen flag on the message with this UID.
+
+        :param uidvalidity: The message's "uidvalidity". If the mailbox's
+                            has changed since the fetch, the UID may name
+                            another message, so nothing is flagged.
+        :return: Whether the flag was set.
+        """
+        assert self.conn, "Must call connect() first"
+        if uidvalidity is not None and uidvalidity != self.uidvalidity:
+            logger.warning(
+                "UIDVALIDITY of %s changed (%s -> %s); not flagging UID %s",
+                self.mailbox, uidvalidity, self.uidvalidity, uid
+            )
+            return False
+        if isinstance(uid, str):
+            uid = uid.encode()
+        self.conn.uid('STORE', uid, '+FLAGS', '\\Seen')
+        return True
+
     def logout(self):
         if self.conn:
             self.conn.close()
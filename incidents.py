@@ -0,0 +1,284 @@
+# incidents.py
+
+import re
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from string import Template
+from typing import Any, Dict, Optional, Tuple
+
+from addresses import UNIT_RE, normalize_street
+from deadlines import DeadlineExceeded
+from circuit_breaker import CircuitOpen
+from metrics import metrics
+from reply_templates import TemplateEngine
+
+logger = logging.getLogger(__name__)
+
+# Issues that usually affect a whole building rather than one unit
+ISSUE_CATEGORIES = (
+    ("heating", re.compile(
+        r"\b(boiler|furnace|no heat|heat(ing)? (is |has )?(out|off|gone|stopped|not working|down)|"
+        r"radiators? (is |are )?(cold|off))"
+    )),
+    ("hot_water", re.compile(r"\b(no hot water|hot water (is |has )?(out|off|gone|stopped|not working))")),
+    ("water", re.compile(r"\b(no (running )?water|water (is |has been )?(shut ?off|turned off|out)|water main)")),
+    ("power", re.compile(r"\b(no (power|electricity)|power (is |has )?(out|gone|off)|power outage|blackout)")),
+    ("gas", re.compile(r"\b(gas (leak|smell|is off|outage)|smells? (of|like) gas|no gas)")),
+    ("elevator", re.compile(r"\b(elevators?|lifts?) (is |are )?(out|broken|down|stuck|not working)")),
+)
+
+OPEN_STATUSES = ("pending", "open", "in_progress")
+
+
+def building_key(address: Optional[str], address_key: Optional[str] = None) -> str:
+    """
+    Normalize an address to its building: unit designators are dropped,
+    street suffixes abbreviated and punctuation removed.
+
+    :param address_key: The registry key (addresses.ResolvedAddress.key)
+                        when the address was resolved; its property id
+                        names the building however the address was written.
+    """
+    if address_key:
+        return address_key.split("#", 1)[0]
+    return normalize_street(address)
+
+
+def building_address(address: Optional[str]) -> str:
+    """
+    `address` without its unit, for text shared with other tenants.
+    """
+    text = " ".join(UNIT_RE.sub("", address or "").split())
+    return re.sub(r"\s*,(\s*,)*", ",", text).strip(" ,")
+
+
+def issue_category(text: Optional[str]) -> Optional[str]:
+    """
+    :return: The building-wide issue category mentioned in `text`, or None.
+    """
+    text = (text or "").lower()
+    return next((name for name, pattern in ISSUE_CATEGORIES if pattern.search(text)), None)
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class IncidentAggregator:
+    """
+    Merges maintenance requests for the same building-wide issue into one
+    incident action item.
+
+    Requests are keyed by (building, issue category). The first one opens
+    an incident; every further report inside `window_seconds` of the last
+    one is linked to it instead of getting its own ticket.
+    """
+    def __init__(self, window_seconds: float = 30 * 60, index=None):
+        """
+        :param window_seconds: How long an incident stays open for new
+                               reports after the most recent one.
+        :param index: Optional ActionItemIndex to pick up incidents that are
+                      still open from an earlier run.
+        """
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._open: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._last_seen: Dict[Tuple[str, str], float] = {}
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        if index is not None:
+            self._restore(index)
+
+    def key_for(self, parsed: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        if parsed.get("request_type") != "maintenance":
+            return None
+        building = building_key(parsed.get("address"), parsed.get("address_key"))
+        category = issue_category(
+            f"{parsed.get('subject') or ''}\n{parsed.get('summary') or ''}\n{parsed.get('full_body') or ''}"
+        )
+        if not building or category is None:
+            return None
+        return building, category
+
+    def attach(self, item: Dict[str, Any], parsed: Dict[str, Any], now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Route a freshly created action item through the aggregator.
+
+        :return: `item` unchanged if it is not a building-wide issue, the
+                 open incident it was linked to, or a new incident under
+                 `item`'s id. Incidents are shared by every reporter, so
+                 they only hold building-level fields; each report's
+                 tenant, unit and summary are kept in linked_requests.
+        """
+        key = self.key_for(parsed)
+        if key is None:
+            return item
+        now = time.time() if now is None else now
+        link = {
+            "request_id": item["id"],
+            "tenant_name": item.get("tenant_name"),
+            "address": item.get("address"),
+            "subject": item.get("subject"),
+            "summary": item.get("summary"),
+            "reported_at": item.get("created_at"),
+        }
+        with self._lock:
+            incident = self._open.get(key)
+            if incident is not None and now - self._last_seen[key] <= self.window_seconds:
+                incident["linked_requests"].append(link)
+                incident["last_reported_at"] = _now_iso()
+                self._last_seen[key] = now
+                metrics.incr("incidents.linked")
+                logger.info(
+                    "Linked request %s to incident %s (%d reports)",
+                    item["id"], incident["id"], len(incident["linked_requests"])
+                )
+                return incident
+
+            building, category = key
+            address = building_address(item.get("address"))
+            incident = {
+                "id": item["id"],
+                "created_at": item.get("created_at"),
+                "action_type": "incident",
+                "tenant_name": None,
+                "address": address,
+                "subject": None,
+                "summary": f"{category.replace('_', ' ')} issue affecting {address or building}",
+                "request_type": item.get("request_type", "maintenance"),
+                "context": {},
+                "status": item.get("status", "pending"),
+                "asignee": item.get("asignee"),
+                "incident_key": f"{building}|{category}",
+                "building": building,
+                "category": category,
+                "linked_requests": [link],
+                "last_reported_at": _now_iso(),
+            }
+            self._open[key] = incident
+            self._last_seen[key] = now
+            self._by_id[incident["id"]] = incident
+        metrics.incr("incidents.opened")
+        logger.info("Opened %s incident %s for %s", category, incident["id"], building)
+        return incident
+
+    def get(self, incident_id: str) -> Optional[Dict[str, Any]]:
+        return self._by_id.get(incident_id)
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """
+        Stop linking new reports to incidents whose window has passed.
+        Returns the number of incidents closed to new reports.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            stale = [k for k, seen in self._last_seen.items() if now - seen > self.window_seconds]
+            for key in stale:
+                self._by_id.pop(self._open.pop(key)["id"], None)
+                del self._last_seen[key]
+        return len(stale)
+
+    def _restore(self, index) -> None:
+        now = time.time()
+        for status in OPEN_STATUSES:
+            for item in index.by_status(status):
+                if item.get("action_type") != "incident" or not item.get("incident_key"):
+                    continue
+                try:
+                    seen = datetime.fromisoformat(item["last_reported_at"]).timestamp()
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if now - seen > self.window_seconds:
+                    continue
+                key = tuple(item["incident_key"].split("|", 1))
+                self._open[key] = item
+                self._last_seen[key] = seen
+                self._by_id[item["id"]] = item
+
+
+class IncidentReplier:
+    """
+    Writes one reply per incident and personalizes it for every tenant.
+
+    The reply is written once, with $tenant_name and $ticket_id left as
+    placeholders, either by the ReplyGenerator or from the local incident
+    template, then substituted per tenant. The model only sees
+    building-level facts, never one tenant's message, and a generated
+    reply that lost either placeholder is replaced by the template.
+    """
+    _LLM_INSTRUCTIONS = (
+        "Building-wide {category} issue at {address}, reported by several tenants. "
+        "Write a single reply that will be sent to every affected tenant. Greet the tenant as "
+        "$tenant_name, refer to the ticket as $ticket_id and do not mention any account details."
+    )
+    _PLACEHOLDERS = ("$tenant_name", "$ticket_id")
+
+    def __init__(self, aggregator: IncidentAggregator, generator=None, engine=None):
+        """
+        :param generator: Optional ReplyGenerator; without one the
+                          TemplateEngine incident template is used.
+        """
+        self.aggregator = aggregator
+        self.generator = generator
+        self.engine = engine or TemplateEngine()
+        self._replies: Dict[str, Template] = {}
+        self._lock = threading.Lock()
+
+    def reply(self, parsed: Dict[str, Any], ticket_id: str) -> Optional[str]:
+        """
+        :return: The personalized incident reply, or None if `ticket_id`
+                 is not an incident.
+        """
+        incident = self.aggregator.get(ticket_id)
+        if incident is None:
+            return None
+        with self._lock:
+            template = self._replies.get(ticket_id)
+            if template is None:
+                template = self._replies[ticket_id] = Template(self._write(incident))
+            else:
+                metrics.incr("incidents.replies_reused")
+        return template.safe_substitute(
+            tenant_name=parsed.get("tenant_name") or "there",
+            ticket_id=ticket_id,
+        )
+
+    def _write(self, incident: Dict[str, Any]) -> str:
+        category = incident["category"].replace("_", " ")
+        building = incident.get("address") or incident["building"]
+        if self.generator is None:
+            return self.engine.incident_template(category, building)
+        try:
+            reply = self._generate(incident, category)
+        except (DeadlineExceeded, CircuitOpen):
+            # The first report ran out of time or the LLM is down; the
+            # local template serves the whole incident
+            metrics.incr("incidents.replies_degraded")
+            return self.engine.incident_template(category, building)
+        missing = [p for p in self._PLACEHOLDERS if p not in reply]
+        if missing:
+            # Without them every tenant would get the same greeting or ticket
+            metrics.incr("incidents.replies_rejected")
+            logger.warning("Incident reply for %s lacks %s; using the template", incident["id"], missing)
+            return self.engine.incident_template(category, building)
+        return reply
+
+    def _generate(self, incident: Dict[str, Any], category: str) -> str:
+        building = incident.get("address") or incident["building"]
+        instructions = self._LLM_INSTRUCTIONS.format(category=category, address=building)
+        parsed = {
+            "tenant_name": "$tenant_name",
+            "address": building,
+            "request_type": "maintenance",
+            "summary": instructions,
+            "full_body": f"Tenants report a {category} issue at {building}.",
+        }
+        context = {
+            "rent_balance": "n/a",
+            "lease_end_date": "n/a",
+            "maintenance_history": [],
+        }
+        reply = self.generator.generate(parsed, context, "$ticket_id")
+        metrics.incr("incidents.replies_generated")
+        return reply
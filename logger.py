@@ -1,8 +1,162 @@
+import os
+import sys
+import queue
+import atexit
 import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+
+import serialization
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-handler = logging.StreamHandler()
-formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s")
-handler.setFormatter(formatter)
-logger.addHandler(handler)
\ No newline at end of file
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s %(message)s"
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: ts, level, logger, msg, plus exc, any
+    `extra=` fields and the sampler's `suppressed` count.
+    """
+    _STANDARD = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+    _SCALARS = (str, int, float, bool, type(None))
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        for key, value in record.__dict__.items():
+            if key not in self._STANDARD and not key.startswith("_"):
+                entry[key] = value if isinstance(value, self._SCALARS) else repr(value)
+        return serialization.dumps(entry, compact=True)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Rate-limits repetitive records.
+
+    Records are grouped by logger and message template (not the formatted
+    text, so "retrying %s" counts once for every address). Within each
+    `window` seconds the first `burst` records of a group pass, after that
+    only every `every`-th. WARNING and above always pass. The next record
+    that passes carries `suppressed`, the number dropped before it.
+    """
+    MAX_GROUPS = 10_000
+
+    def __init__(self, burst: int = 20, every: int = 100, window: float = 60.0):
+        super().__init__()
+        self.burst = burst
+        self.every = every
+        self.window = window
+        self._lock = threading.Lock()
+        self._groups: Dict[Tuple[str, str], list] = {}  # key -> [window start, seen, suppressed]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, str(record.msg))
+        now = record.created
+        with self._lock:
+            group = self._groups.get(key)
+            if group is None and len(self._groups) >= self.MAX_GROUPS:
+                # Messages formatted before logging never repeat; start over
+                self._groups.clear()
+            if group is None or now - group[0] >= self.window:
+                group = self._groups[key] = [now, 0, group[2] if group else 0]
+            group[1] += 1
+            if group[1] > self.burst and (group[1] - self.burst) % self.every:
+                group[2] += 1
+                return False
+            suppressed, group[2] = group[2], 0
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class _QueueHandler(QueueHandler):
+    """
+    QueueHandler that only merges args into the message on the calling
+    thread; formatting happens on the listener thread.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(
+    level: Optional[str] = None,
+    json_lines: Optional[bool] = None,
+    sample: Optional[bool] = None,
+    stream=None
+) -> QueueListener:
+    """
+    Route every module's logging through a queue to one background writer.
+
+    Configures the root logger, so the module loggers (logging.getLogger
+    (__name__)) need no handlers of their own. Callers only enqueue the
+    record; formatting and the (blocking) write to `stream` happen on the
+    QueueListener thread. Safe to call more than once; the last call wins.
+
+    :param level: Defaults to $LOG_LEVEL or INFO.
+    :param json_lines: JSON lines instead of text; defaults to $LOG_JSON=1.
+    :param sample: Rate-limit repetitive INFO/DEBUG records; defaults to
+                   $LOG_SAMPLE (on unless set to 0).
+    :param stream: Defaults to stderr.
+    """
+    global _listener, _queue_handler
+    shutdown_logging()
+
+    level = level or os.environ.get("LOG_LEVEL", "INFO")
+    if json_lines is None:
+        json_lines = os.environ.get("LOG_JSON", "0") == "1"
+    if sample is None:
+        sample = os.environ.get("LOG_SAMPLE", "1") != "0"
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    if json_lines:
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    _queue_handler = _QueueHandler(queue.SimpleQueue())
+    if sample:
+        _queue_handler.addFilter(SamplingFilter())
+
+    root = logging.getLogger()
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(_queue_handler.queue, output)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging() -> None:
+    """
+    Flush queued records and stop the background writer.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,278 @@
+# mailboxes.py
+
+import os
+import json
+import time
+import random
+import logging
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from inbox import InboxConnector
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class MailboxAccount:
+    """One IMAP account and mailbox, e.g. the inbox of one property."""
+    name: str
+    host: str
+    username: str
+    password: str
+    mailbox: str = "INBOX"
+    port: Optional[int] = None
+    use_ssl: bool = True
+
+
+def load_accounts(path: Optional[str] = None) -> List[MailboxAccount]:
+    """
+    Read accounts from the JSON list at `path` (default: $MAILBOXES_FILE).
+
+    Each entry has name, host, username, optional mailbox, port and
+    use_ssl, and either password or password_env naming the variable that
+    holds it. Without a file, the
+    single Gmail account from $USERNAME / $PASSWORD is returned.
+    """
+    path = path or os.environ.get("MAILBOXES_FILE")
+    if not path:
+        return [MailboxAccount(
+            name="gmail",
+            host="imap.gmail.com",
+            username=os.environ.get("USERNAME"),
+            password=os.environ.get("PASSWORD"),
+        )]
+    with open(path) as f:
+        entries = json.load(f)
+    accounts = []
+    for entry in entries:
+        password = entry.get("password")
+        if password is None and entry.get("password_env"):
+            password = os.environ.get(entry["password_env"])
+        accounts.append(MailboxAccount(
+            name=entry["name"],
+            host=entry["host"],
+            username=entry["username"],
+            password=password,
+            mailbox=entry.get("mailbox", "INBOX"),
+            port=entry.get("port"),
+            use_ssl=entry.get("use_ssl", True),
+        ))
+    return accounts
+
+
+class _AccountState:
+    __slots__ = ("account", "connector", "failures", "retry_at", "fetched", "errors",
+                 "first_poll", "last_success", "lag")
+
+    def __init__(self, account: MailboxAccount, connector: InboxConnector):
+        self.account = account
+        self.connector = connector
+        self.failures = 0
+        self.retry_at = 0.0
+        self.fetched = 0
+        self.errors = 0
+        self.first_poll: Optional[float] = None
+        self.last_success: Optional[float] = None
+        self.lag = 0.0
+
+
+class MailboxReader:
+    """
+    Fan-in reader over many IMAP accounts.
+
+    Each poll() fetches unread mail from every account that is not backing
+    off, at most `max_connections` at a time, and merges the results
+    round-robin so one busy inbox cannot push the others to the back of
+    the stream. Logged-in sessions are kept between polls, least recently
+    used first out once more than `max_connections` are open.
+
+    Fetched messages carry an "account" key; pass them back to mark_seen().
+    """
+    def __init__(
+        self,
+        accounts: List[MailboxAccount],
+        max_connections: int = 4,
+        limit_per_account: int = 10,
+        base_backoff: float = 5.0,
+        max_backoff: float = 300.0,
+        connector_factory: Callable[..., InboxConnector] = InboxConnector,
+        ssl_context=None,
+        timeout: Optional[float] = 30.0,
+        recorder=None
+    ):
+        """
+        :param max_connections: Upper bound on concurrent and idle IMAP sessions.
+        :param limit_per_account: Messages fetched per account and poll.
+        :param base_backoff: First delay after an account fails; doubles per
+                             consecutive failure up to `max_backoff`.
+        :param ssl_context: Optional SSL context for every account.
+        :param timeout: IMAP socket timeout, in seconds.
+        :param recorder: Optional replay.Recorder for the raw messages.
+        """
+        names = [a.name for a in accounts]
+        if len(set(names)) != len(names):
+            raise ValueError("Mailbox account names must be unique")
+        self.max_connections = max_connections
+        self.limit_per_account = limit_per_account
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._states: Dict[str, _AccountState] = {
+            a.name: _AccountState(a, connector_factory(
+                host=a.host, username=a.username, password=a.password, mailbox=a.mailbox,
+                port=a.port, use_ssl=a.use_ssl, ssl_context=ssl_context,
+                timeout=timeout, recorder=recorder
+            ))
+            for a in accounts
+        }
+        self._open: "OrderedDict[str, None]" = OrderedDict()  # connected, LRU first
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix="mailbox")
+        self._cursor = 0
+
+    def poll(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Fetch unread messages from all accounts that are due, merged fairly.
+        """
+        now = time.time() if now is None else now
+        due = [s for s in self._states.values() if s.retry_at <= now]
+        futures = [(s, self._pool.submit(self._fetch, s)) for s in due]
+        batches = []
+        for state, future in futures:
+            messages = future.result()
+            if messages:
+                batches.append(deque(messages))
+        self._release_idle()
+        return self._interleave(batches)
+
+    def mark_seen(self, msg: Dict[str, Any]) -> None:
+        state = self._states[msg["account"]]
+        if state.connector.conn is None:
+            self._connect(state)
+        state.connector.mark_seen(msg["uid"], msg.get("uidvalidity"))
+
+    def source_id(self, msg: Dict[str, Any]) -> str:
+        """
+        Stable id of a fetched message: its Message-ID, or account, mailbox,
+        UIDVALIDITY and UID.
+        """
+        state = self._states[msg["account"]]
+        if msg.get("message_id"):
+            return msg["message_id"]
+        uid = f"{msg['uidvalidity']}.{msg['uid']}" if msg.get("uidvalidity") else msg["uid"]
+        return f"{state.account.name}:{state.account.mailbox}:{uid}"
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-account counters: messages fetched, throughput (messages/s since
+        the first poll), lag (seconds from the oldest fetched message's Date
+        header to its fetch, last poll), errors and current backoff.
+        """
+        now = time.time()
+        out = {}
+        for name, s in self._states.items():
+            elapsed = now - s.first_poll if s.first_poll else 0.0
+            out[name] = {
+                "fetched": s.fetched,
+                "throughput": s.fetched / elapsed if elapsed > 0 else 0.0,
+                "lag": s.lag,
+                "errors": s.errors,
+                "backoff": max(0.0, s.retry_at - now),
+                "last_success": s.last_success,
+            }
+        return out
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+        with self._lock:
+            names = list(self._open)
+            self._open.clear()
+        for name in names:
+            self._disconnect(self._states[name])
+
+    def _fetch(self, state: _AccountState) -> List[Dict[str, Any]]:
+        name = state.account.name
+        started = time.time()
+        if state.first_poll is None:
+            state.first_poll = started
+        try:
+            if state.connector.conn is None:
+                self._connect(state)
+            else:
+                self._touch(name)
+            messages = state.connector.fetch_unread(limit=self.limit_per_account, mark_seen=False)
+        except Exception as e:
+            state.errors += 1
+            state.failures += 1
+            delay = min(self.max_backoff, self.base_backoff * 2 ** (state.failures - 1))
+            state.retry_at = started + delay * random.uniform(0.5, 1.0)
+            metrics.incr(f"mailbox.{name}.errors")
+            logger.warning("Polling mailbox %s failed (%s); backing off %.0fs", name, e, delay)
+            self._disconnect(state)
+            return []
+
+        state.failures = 0
+        state.retry_at = 0.0
+        state.last_success = time.time()
+        state.fetched += len(messages)
+        state.lag = max((_lag(m, state.last_success) for m in messages), default=0.0)
+        metrics.incr(f"mailbox.{name}.fetched", len(messages))
+        if messages:
+            metrics.observe(f"mailbox.{name}.lag", state.lag)
+        for msg in messages:
+            msg["account"] = name
+        return messages
+
+    def _connect(self, state: _AccountState) -> None:
+        state.connector.connect()
+        self._touch(state.account.name)
+
+    def _touch(self, name: str) -> None:
+        with self._lock:
+            self._open[name] = None
+            self._open.move_to_end(name)
+
+    def _release_idle(self) -> None:
+        """
+        Log out least recently used sessions beyond `max_connections`.
+        """
+        with self._lock:
+            excess = []
+            while len(self._open) > self.max_connections:
+                excess.append(self._open.popitem(last=False)[0])
+        for name in excess:
+            self._disconnect(self._states[name])
+
+    def _disconnect(self, state: _AccountState) -> None:
+        with self._lock:
+            self._open.pop(state.account.name, None)
+        try:
+            state.connector.logout()
+        except Exception as e:
+            logger.debug("Ignoring logout error for %s: %s", state.account.name, e)
+        state.connector.conn = None
+
+    def _interleave(self, batches: List[deque]) -> List[Dict[str, Any]]:
+        # Rotate the starting account between polls so no inbox is always first
+        if batches:
+            self._cursor %= len(batches)
+            batches = batches[self._cursor:] + batches[:self._cursor]
+            self._cursor += 1
+        merged = []
+        while batches:
+            for batch in batches:
+                merged.append(batch.popleft())
+            batches = [b for b in batches if b]
+        return merged
+
+
+def _lag(msg: Dict[str, Any], fetched_at: float) -> float:
+    try:
+        return max(0.0, fetched_at - parsedate_to_datetime(msg.get("date")).timestamp())
+    except (TypeError, ValueError):
+        return 0.0
@@ -1,54 +1,259 @@
 import os
-from context_loader import ContextLoader
-from inbox import InboxConnector
-from parser import LLMEmailParser
-from dotenv import load_dotenv
-from workflow import WorkflowTrigger
-from reply_generator import ReplyGenerator
-from sender import EmailSender
+import sys
+import logging
+import tracing
+import deadlines
+from config import load_env
+from logger import setup_logging
+from mailboxes import MailboxReader, load_accounts
+from outbox import Outbox
+from metrics import metrics
 
+logger = logging.getLogger(__name__)
 
+# Only cheap modules are imported up front. The pipeline (openai, faker,
+# jsonschema, ...) is imported inside run() once there is mail to process,
+# so a cron run against an empty inbox exits in milliseconds.
+# `python -m benchmarks.bench_startup` keeps track of the import cost.
 
 
-if __name__ == "__main__":
-    load_dotenv()
-    connector = InboxConnector(
-        host="imap.gmail.com",
-        username=os.environ.get("USERNAME"),
-        password=os.environ.get("PASSWORD"),
-    )
-    connector.connect()
-    new_msgs = connector.fetch_unread(limit=5)
-    
-    
-    parser     = LLMEmailParser(model="gpt-4o-mini")
-    ctx_loader = ContextLoader(seed=42)
-    replier    = ReplyGenerator(model="gpt-4o-mini")
-    workflow  = WorkflowTrigger(output_dir="action_items")
-    
-    email_sender = EmailSender(
+def make_sender(recorder=None):
+    from sender import EmailSender
+    from circuit_breaker import CircuitBreaker, smtp_failure
+    return EmailSender(
         smtp_host="smtp.gmail.com",
         smtp_port=465,
         username=os.environ.get("USERNAME"),
         password=os.environ.get("PASSWORD"),
         max_retries=3,
-        retry_delay=2.0    )
+        retry_delay=2.0,
+        timeout=30.0,
+        # Stop connecting to a relay that keeps failing; probe after a minute
+        breaker=CircuitBreaker("smtp", min_calls=5, open_seconds=60.0, is_failure=smtp_failure),
+        recorder=recorder    )
 
-    
-    for msg in new_msgs:
-        parsed_dict = parser.parse(msg) 
+
+def run() -> int:
+    load_env()
+    setup_logging()
+    # Per-email traces to $TRACE_FILE or an OTLP collector at $OTLP_ENDPOINT
+    tracing.configure()
+    # One account per property ($MAILBOXES_FILE), or the Gmail inbox. Each
+    # email gets $EMAIL_DEADLINE_SECONDS from leaving the priority queue to
+    # stored reply
+    budget = float(os.environ.get("EMAIL_DEADLINE_SECONDS", "120"))
+    recorder = None
+    if os.environ.get("REPLAY_RECORD"):
+        # Record messages, model calls and SMTP transactions for replay.py
+        from replay import Recorder
+        recorder = Recorder(os.environ["REPLAY_RECORD"])
+    reader = MailboxReader(
+        load_accounts(), max_connections=4, limit_per_account=5,
+        timeout=30.0, recorder=recorder
+    )
+    # Messages are only flagged \Seen once their reply is stored in the outbox
+    new_msgs = reader.poll()
+    outbox = Outbox(path="outbox/replies.db")
+
+    if not new_msgs and not outbox.stats().get("deferred"):
+        reader.close()
+        if outbox.stats().get("pending"):
+            # Nothing new, but replies from an earlier run are still queued;
+            # drain() sends one batch per call
+            email_sender = make_sender(recorder)
+            while outbox.drain(email_sender):
+                pass
+        outbox.close()
+        if recorder is not None:
+            recorder.close()
+        logger.info("No unread messages")
+        return 0
+
+    from context_loader import ContextLoader
+    from parser import LLMEmailParser, ModelTier
+    from workflow import WorkflowTrigger
+    from reply_generator import ReplyGenerator
+    from reply_templates import ReplyRouter
+    from action_index import ActionItemIndex
+    from incidents import IncidentAggregator, IncidentReplier
+    from priority import PriorityScheduler, PriorityScorer
+    from profiling import ProfileSwitch
+    from addresses import AddressResolver, load_registry
+    from hedging import HedgedCaller, HedgePolicy
+    from circuit_breaker import CircuitBreaker, CircuitOpen, llm_failure
+    from replay import email_key, email_scope
+
+    if recorder is not None:
+        recorder.wrap_openai()
+
+    classifier = None
+    model_path = os.environ.get("CLASSIFIER_MODEL", "models/request_type.json")
+    if os.path.exists(model_path):
+        # Trained from action_items with `python classifier.py`
+        from classifier import RequestTypeClassifier
+        classifier = RequestTypeClassifier.load(model_path)
+    hedger = None
+    if os.environ.get("LLM_HEDGE_PERCENTILE"):
+        # Duplicate model calls slower than this percentile of recent ones,
+        # for at most $LLM_HEDGE_BUDGET (default 5%) of calls
+        hedger = HedgedCaller(HedgePolicy(
+            percentile=float(os.environ["LLM_HEDGE_PERCENTILE"]),
+            budget=float(os.environ.get("LLM_HEDGE_BUDGET", "0.05")),
+        ))
+    # One breaker for the LLM provider: while it is open emails are parsed
+    # by the rule parser and replies that need the model are deferred
+    llm_breaker = CircuitBreaker("openai", open_seconds=30.0, is_failure=llm_failure)
+    # Canonical addresses from the property registry ($PROPERTIES_FILE)
+    properties = load_registry()
+    # Cheap model first with a tight timeout; escalate to the stronger one
+    # only for invalid or implausible output, then to the rule parser
+    tiers = [
+        ModelTier("cheap", "gpt-4o-mini", timeout=10.0, min_confidence=0.7,
+                  prompt_cost=0.15, completion_cost=0.60),
+        ModelTier("strong", "gpt-4o", timeout=30.0, prompt_cost=2.50, completion_cost=10.00),
+    ]
+    parser     = LLMEmailParser(
+        model="gpt-4o-mini",
+        tiers=tiers,
+        hedger=hedger,
+        breaker=llm_breaker,
+        classifier=classifier,
+        skip_threshold=float(os.environ["CLASSIFIER_SKIP_THRESHOLD"]) if "CLASSIFIER_SKIP_THRESHOLD" in os.environ else None,
+        resolver=AddressResolver(properties) if properties else None
+    )
+    ctx_loader = ContextLoader(seed=42)
+    index      = ActionItemIndex(output_dir="action_items")
+    incidents  = IncidentAggregator(window_seconds=30 * 60, index=index)
+    generator  = ReplyGenerator(model="gpt-4o-mini", hedger=hedger, timeout=60.0, breaker=llm_breaker)
+    replier    = ReplyRouter(generator, index=index, incidents=IncidentReplier(incidents, generator))
+    workflow  = WorkflowTrigger(output_dir="action_items", batch_size=20, index=index, incidents=incidents)
+    # Profiles a fraction of emails, set in profiles/rate without a restart
+    profiler   = ProfileSwitch(output_dir="profiles")
+
+    email_sender = make_sender(recorder)
+    # Deliver stored replies (including ones left over from earlier runs)
+    # in the background while new ones are generated
+    outbox.start(email_sender)
+
+
+    # Replies are only stored once their action items are committed, so a
+    # crash can never leave a sent ticket id without its action item.
+    pending = []
+
+    def commit_pending():
+        workflow.flush()
+        for source_id, msg, ticket_id, to, subject, reply, draft in pending:
+            outbox.enqueue(
+                source_id=source_id,
+                ticket_id=ticket_id,
+                to=to,
+                subject=subject,
+                body=reply,
+                traceparent=msg.get("traceparent"),
+                draft=draft,
+            )
+            reader.mark_seen(msg)
+        pending.clear()
+
+    def handle(msg):
+        # The budget starts when the scheduler hands the email over, not
+        # at fetch: a long queue must not use up the deadlines of its tail
+        deadline = deadlines.Deadline(budget) if budget else None
+        with tracing.span("email.handle", msg.get("traceparent"), account=msg.get("account", "")):
+            with profiler.maybe_profile(), deadlines.scope(deadline), email_scope(email_key(msg)):
+                process(msg)
+
+    def process(msg):
+        source_id = reader.source_id(msg)
+        if outbox.has_source(source_id):
+            # Reply already stored by an earlier run that died before \Seen
+            reader.mark_seen(msg)
+            return
+
+        # Stages degrade (rule parser, templated reply) as the deadline nears;
+        # checkpoints count the stage in which it ran out
+        parsed_dict = parser.parse(msg)
+        deadlines.checkpoint("parse")
         context = ctx_loader.load(parsed_dict["tenant_name"], parsed_dict["address"])
-        ticket_id = workflow.process(parsed_dict, context)  
-        reply   = replier.generate(parsed_dict, context, ticket_id)
-        
+        deadlines.checkpoint("context")
+        ticket_id = workflow.process(parsed_dict, context, msg)
+        deadlines.checkpoint("workflow")
+        try:
+            reply, draft = replier.reply(parsed_dict, context, ticket_id), None
+        except Exception as e:
+            if not (isinstance(e, CircuitOpen) or llm_failure(e)):
+                raise
+            # The LLM is down or failing and the action item is already
+            # buffered: store the reply as deferred and write it later,
+            # rather than fail the email and file a second ticket next run
+            logger.warning("Deferring reply for ticket %s: %s", ticket_id, e)
+            reply, draft = None, {"parsed": parsed_dict, "context": context}
+        deadlines.checkpoint("reply")
+        tracing.set_attributes(ticket_id=ticket_id, request_type=parsed_dict.get("request_type", ""))
+
         tenant_email = msg["sender"]
         subject = f"Re: {msg['subject']}"
 
-        email_sender.send_email(
-            to=[tenant_email],
-            subject=subject,
-            body=reply,
+        pending.append((source_id, msg, ticket_id, [tenant_email], subject, reply, draft))
+        if workflow.writer.pending() == 0:
+            # The writer just committed a full batch
+            commit_pending()
+
+    # Urgent requests jump ahead of routine ones. A single worker, since the
+    # IMAP sessions and the action item writer are not thread-safe.
+    skipped = parser.preclassify(new_msgs)
+    if skipped:
+        logger.info("Classifier labels %d/%d emails confidently, skipping their LLM parse", skipped, len(new_msgs))
+    scheduler = PriorityScheduler(PriorityScorer(index=index))
+    for msg in new_msgs:
+        scheduler.submit(msg)
+    scheduler.run(handle, workers=1)
+
+    commit_pending()
+    # Stop linking reports to incidents that went quiet during this run
+    closed = incidents.expire()
+    if closed:
+        logger.info("Closed %d incidents to new reports", closed)
+
+    # Write replies deferred during an LLM outage, in this run or earlier ones
+    written = 0
+    for entry in outbox.deferred():
+        if not llm_breaker.available():
+            break
+        try:
+            reply = replier.reply(entry["draft"]["parsed"], entry["draft"]["context"], entry["ticket_id"])
+        except Exception as e:
+            # Still down (CircuitOpen) or failing; try again next run
+            logger.warning("Deferred replies stay queued: %s", e)
+            break
+        outbox.fill(entry["key"], reply)
+        written += 1
+    if written or outbox.stats().get("deferred"):
+        logger.info("Wrote %d deferred replies, %d still deferred", written, outbox.stats().get("deferred", 0))
+
+    for tier, stats in parser.cascade_report().items():
+        if stats.get("attempts") or stats.get("accepted"):
+            logger.info("Parse tier %s: %s", tier, stats)
+
+    missed = {stage: metrics.counter(f"deadline.{stage}.missed")
+              for stage in ("parse", "context", "workflow", "reply")}
+    if any(missed.values()):
+        logger.warning("Email deadlines missed per stage: %s", missed)
+
+    for account, stats in reader.stats().items():
+        logger.info(
+            "Mailbox %s: %d fetched, %.2f msg/s, lag %.0fs, %d errors",
+            account, stats["fetched"], stats["throughput"], stats["lag"], stats["errors"]
         )
+    if hedger is not None:
+        hedger.shutdown()
+    reader.close()
+    outbox.stop(email_sender)
+    outbox.close()
+    if recorder is not None:
+        recorder.close()
+    return 0
+
 
-    
-    connector.logout()
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,116 @@
+# metrics.py
+
+import math
+import threading
+from collections import defaultdict, deque
+from typing import Any, Dict, Optional
+
+
+class Histogram:
+    """
+    Keeps the most recent `max_samples` observations for percentile queries.
+    """
+    def __init__(self, max_samples: int = 10_000):
+        self._samples = deque(maxlen=max_samples)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self._samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        :param p: Percentile in [0, 100].
+        :return: Nearest-rank percentile of the retained samples, or None if empty.
+        """
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        rank = max(math.ceil(p / 100.0 * len(ordered)) - 1, 0)
+        return ordered[min(rank, len(ordered) - 1)]
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+        }
+
+
+class Metrics:
+    """
+    Thread-safe in-process registry of counters and histograms.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._histograms: Dict[str, Histogram] = {}
+
+    def incr(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            hist = self._histograms.get(name)
+            if hist is None:
+                hist = self._histograms[name] = Histogram()
+            hist.observe(value)
+
+    def counter(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def histogram(self, name: str) -> Optional[Histogram]:
+        with self._lock:
+            return self._histograms.get(name)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "histograms": {k: h.summary() for k, h in self._histograms.items()},
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+# Process-wide registry shared by all pipeline stages
+metrics = Metrics()
+
+
+def record_llm_usage(stage: str, resp: Any, latency: Optional[float] = None) -> Dict[str, int]:
+    """
+    Record token usage of an OpenAI chat completion under `llm.<stage>.*`.
+
+    Cached prompt tokens come from `usage.prompt_tokens_details.cached_tokens`
+    and are billed at a discount, so they are tracked separately.
+    Responses without usage (e.g. test doubles) are ignored.
+    """
+    usage = getattr(resp, "usage", None)
+    if latency is not None:
+        metrics.observe(f"llm.{stage}.latency", latency)
+    if usage is None:
+        return {}
+
+    details = getattr(usage, "prompt_tokens_details", None)
+    recorded = {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+    }
+    metrics.incr(f"llm.{stage}.calls")
+    for key, value in recorded.items():
+        metrics.incr(f"llm.{stage}.{key}", value)
+    return recorded
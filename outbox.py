@@ -0,0 +1,325 @@
+# outbox.py
+
+import os
+import json
+import time
+import random
+import hashlib
+import sqlite3
+import threading
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    key             TEXT PRIMARY KEY,
+    source_id       TEXT NOT NULL UNIQUE,
+    ticket_id       TEXT,
+    recipients      TEXT NOT NULL,
+    cc              TEXT,
+    subject         TEXT NOT NULL,
+    body            TEXT NOT NULL,
+    from_addr       TEXT,
+    status          TEXT NOT NULL DEFAULT 'pending',
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    lease_until     REAL,
+    last_error      TEXT,
+    created_at      REAL NOT NULL,
+    delivered_at    REAL,
+    traceparent     TEXT,
+    draft           TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+"""
+
+
+class Outbox:
+    """
+    Transactional outbox for rendered replies, backed by SQLite.
+
+    Each reply is stored under an idempotency key derived from the
+    source message and its ticket id, and source messages are unique,
+    so reprocessing an email after a crash never creates a second reply.
+    A sender loop claims due rows in batches under a lease, sends them
+    and records delivery. Every email carries a Message-ID derived from
+    the key, so the rare resend after a crash between SMTP accept and
+    mark_delivered() is recognisable as a duplicate downstream.
+
+    A reply that cannot be written yet (the LLM is unavailable) is
+    stored as 'deferred' with the draft needed to write it, and is only
+    sent once fill() has supplied the body.
+    """
+    def __init__(
+        self,
+        path: str = "outbox/replies.db",
+        max_attempts: int = 5,
+        base_delay: float = 2.0,
+        lease_seconds: float = 300.0
+    ):
+        """
+        :param path: SQLite database file.
+        :param max_attempts: Attempts before a reply is marked failed.
+        :param base_delay: Backoff before the first retry, in seconds.
+        :param lease_seconds: How long a claimed row is reserved for a sender.
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.lease_seconds = lease_seconds
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.executescript(_SCHEMA)
+        columns = {row["name"] for row in self._db.execute("PRAGMA table_info(outbox)")}
+        if "traceparent" not in columns:
+            # Databases created before replies carried their trace
+            self._db.execute("ALTER TABLE outbox ADD COLUMN traceparent TEXT")
+        if "draft" not in columns:
+            self._db.execute("ALTER TABLE outbox ADD COLUMN draft TEXT")
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def idempotency_key(source_id: str, ticket_id: str) -> str:
+        return hashlib.sha256(f"{source_id}\0{ticket_id}".encode("utf-8")).hexdigest()
+
+    def has_source(self, source_id: str) -> bool:
+        """
+        True if a reply for this source message is already stored.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM outbox WHERE source_id = ?", (source_id,)
+            ).fetchone()
+        return row is not None
+
+    def enqueue(
+        self,
+        source_id: str,
+        ticket_id: str,
+        to: List[str],
+        subject: str,
+        body: Optional[str],
+        from_addr: Optional[str] = None,
+        cc: Optional[List[str]] = None,
+        traceparent: Optional[str] = None,
+        draft: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        Store a rendered reply. Returns its idempotency key; if the source
+        message already has a reply, the existing key is returned instead.
+
+        :param body: The reply, or None to defer it; `draft` then holds
+                     what is needed to write it later (see deferred()).
+        :param traceparent: Trace of the source email, so the eventual
+                            send shows up in the same trace.
+        """
+        key = self.idempotency_key(source_id, ticket_id)
+        now = time.time()
+        status = "pending" if body is not None else "deferred"
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO outbox (key, source_id, ticket_id, recipients, cc, subject, "
+                "body, from_addr, status, next_attempt_at, created_at, traceparent, draft) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, source_id, ticket_id, json.dumps(to), json.dumps(cc or []),
+                 subject, body or "", from_addr, status, now, now, traceparent,
+                 json.dumps(draft) if draft is not None else None)
+            )
+            row = self._db.execute(
+                "SELECT key FROM outbox WHERE source_id = ?", (source_id,)
+            ).fetchone()
+        if row["key"] != key:
+            logger.info("Reply for %s already in outbox, skipping duplicate", source_id)
+        return row["key"]
+
+    def claim(self, batch_size: int = 20, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Reserve up to `batch_size` due replies for sending. Rows whose
+        lease expired (sender died mid-batch) are claimable again.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(
+                    "SELECT * FROM outbox WHERE (status = 'pending' AND next_attempt_at <= ?) "
+                    "OR (status = 'sending' AND lease_until < ?) "
+                    "ORDER BY next_attempt_at LIMIT ?",
+                    (now, now, batch_size)
+                ).fetchall()
+                self._db.executemany(
+                    "UPDATE outbox SET status = 'sending', lease_until = ? WHERE key = ?",
+                    [(now + self.lease_seconds, row["key"]) for row in rows]
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return [self._entry(row) for row in rows]
+
+    def deferred(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Oldest deferred replies, each with its "draft".
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM outbox WHERE status = 'deferred' ORDER BY created_at LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [{**self._entry(row), "draft": json.loads(row["draft"])} for row in rows]
+
+    def fill(self, key: str, body: str) -> None:
+        """
+        Supply the body of a deferred reply, making it due for sending.
+        """
+        with self._lock:
+            self._db.execute(
+                "UPDATE outbox SET status = 'pending', body = ?, draft = NULL, next_attempt_at = ? "
+                "WHERE key = ? AND status = 'deferred'",
+                (body, time.time(), key)
+            )
+
+    def mark_delivered(self, key: str) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE outbox SET status = 'delivered', delivered_at = ?, lease_until = NULL "
+                "WHERE key = ?",
+                (time.time(), key)
+            )
+
+    def mark_failed(self, key: str, error: Optional[str]) -> None:
+        """
+        Record a failed attempt, rescheduling with jittered backoff or
+        marking the reply failed once max_attempts is reached.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT attempts FROM outbox WHERE key = ?", (key,)).fetchone()
+            attempts = row["attempts"] + 1
+            if attempts >= self.max_attempts:
+                status, next_at = "failed", time.time()
+                logger.error("Reply %s failed after %d attempts: %s", key[:12], attempts, error)
+            else:
+                status = "pending"
+                next_at = time.time() + self.base_delay * (2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+            self._db.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, "
+                "lease_until = NULL, last_error = ? WHERE key = ?",
+                (status, attempts, next_at, error, key)
+            )
+
+    def release(self, key: str) -> None:
+        """
+        Return a claimed reply to pending without counting an attempt,
+        keeping its place in the queue.
+        """
+        with self._lock:
+            self._db.execute(
+                "UPDATE outbox SET status = 'pending', lease_until = NULL "
+                "WHERE key = ? AND status = 'sending'",
+                (key,)
+            )
+
+    def requeue_failed(self) -> int:
+        """
+        Move failed replies back to pending for another round of attempts.
+        """
+        with self._lock:
+            cur = self._db.execute(
+                "UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = ? "
+                "WHERE status = 'failed'",
+                (time.time(),)
+            )
+        return cur.rowcount
+
+    def drain(self, sender, batch_size: int = 20) -> int:
+        """
+        Claim one batch, send it over a single SMTP connection and record
+        the outcome of each reply. Returns the number delivered.
+        """
+        breaker = getattr(sender, "breaker", None)
+        if breaker is not None and not breaker.available():
+            # Leave due replies queued (attempts unchanged) until the
+            # relay's circuit lets a probe through
+            return 0
+        batch = self.claim(batch_size)
+        if not batch:
+            return 0
+        delivered = 0
+        results = sender.deliver_batch(batch)
+        for entry, error in zip(batch, results):
+            if error is None:
+                self.mark_delivered(entry["key"])
+                delivered += 1
+            else:
+                self.mark_failed(entry["key"], error)
+        # The relay's circuit opened mid-batch: the rest were not attempted
+        for entry in batch[len(results):]:
+            self.release(entry["key"])
+        logger.info("Outbox batch: %d/%d delivered", delivered, len(batch))
+        return delivered
+
+    def start(self, sender, batch_size: int = 20, poll_interval: float = 0.5) -> None:
+        """
+        Drain continuously on a daemon thread so generation can run
+        ahead of delivery.
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.is_set():
+                if not self.drain(sender, batch_size):
+                    self._stop.wait(poll_interval)
+
+        self._thread = threading.Thread(target=loop, name="outbox-sender", daemon=True)
+        self._thread.start()
+
+    def stop(self, sender=None, timeout: Optional[float] = None) -> None:
+        """
+        Stop the background sender. If `sender` is given, first flush
+        everything that is currently due.
+        """
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout)
+            self._thread = None
+        if sender is not None:
+            while self.drain(sender):
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT status, COUNT(*) AS n FROM outbox GROUP BY status"
+            ).fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def _entry(self, row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "key": row["key"],
+            "source_id": row["source_id"],
+            "ticket_id": row["ticket_id"],
+            "to": json.loads(row["recipients"]),
+            "cc": json.loads(row["cc"]) or None,
+            "subject": row["subject"],
+            "body": row["body"],
+            "from_addr": row["from_addr"],
+            "attempts": row["attempts"],
+            "message_id": row["key"],
+            "traceparent": row["traceparent"],
+        }
@@ -1,78 +1,266 @@
 # parser_llm.py
 
+import re
 import json
-import openai
-import os
-from typing import Dict
+import time
+import serialization
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
 from rule_parser import EmailParser as RuleBasedParser
+from addresses import AddressResolver, ResolvedAddress
 from validator import validate_email_data
-from jsonschema import ValidationError
-from dotenv import load_dotenv
+from prompts import PARSER_SYSTEM_PROMPT, PARSER_PROMPT_VERSION, parser_user_prompt
+from metrics import metrics, record_llm_usage
+from hedging import HedgedCaller, hedged
+from circuit_breaker import CircuitBreaker, CircuitOpen, guarded
 import logging
-from dataclasses import asdict
+import tracing
+import deadlines
+from records import as_dict
+from config import configure_openai, lazy_import
+
+# Deferred until the first model call; see config.lazy_import()
+openai = lazy_import("openai")
+jsonschema = lazy_import("jsonschema")
 
 logger = logging.getLogger(__name__)
-load_dotenv()
 
-openai.api_key = os.environ.get("OPEN_AI_KEY")
+
+@dataclass(frozen=True)
+class ModelTier:
+    """
+    One step of the parse cascade. A tier's result is accepted if it is
+    valid JSON matching EMAIL_SCHEMA, arrives within `timeout` seconds and
+    scores at least `min_confidence` (see LLMEmailParser.confidence()).
+    Costs are USD per million tokens, for the cost metrics.
+    """
+    name: str
+    model: str
+    timeout: Optional[float] = None
+    min_confidence: float = 0.0
+    prompt_cost: float = 0.0
+    completion_cost: float = 0.0
+
+
 class LLMEmailParser:
-    def __init__(self, model: str = "gpt-4o-mini"):
+    def __init__(
+        self,
+        model: str = "gpt-4o-mini",
+        classifier: Optional[Any] = None,
+        skip_threshold: Optional[float] = None,
+        resolver: Optional[AddressResolver] = None,
+        tiers: Optional[List[ModelTier]] = None,
+        hedger: Optional[HedgedCaller] = None,
+        min_call_seconds: float = 2.0,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        """
+        :param tiers: Models to try in order, e.g. a fast cheap model with
+                      a tight timeout and then a stronger one; the rule
+                      parser is the last resort. Defaults to `model` alone.
+        :param hedger: Optional hedging.HedgedCaller; slow model calls are
+                       then duplicated and the first response used.
+        :param min_call_seconds: With less than this left of the email's
+                                 deadline (see deadlines.py), skip the
+                                 remaining tiers and use the rule parser.
+        :param breaker: Optional circuit_breaker.CircuitBreaker for the LLM
+                        provider; while it is open every email goes
+                        straight to the rule parser.
+        :param classifier: Optional classifier.RequestTypeClassifier used by
+                           preclassify() to label a fetched batch locally.
+        :param skip_threshold: Messages the classifier labels with at least
+                               this probability skip the LLM call and are
+                               parsed by the rule parser. None never skips.
+        :param resolver: Optional addresses.AddressResolver; addresses are
+                         then canonical registry addresses, found in the
+                         body or matched from the LLM's free text, and
+                         "address_key" is the registry key (see
+                         ResolvedAddress.key).
+        """
         self.model = model
-        self.system_prompt = (
-    "You are an assistant that reads a tenant's email and returns ONLY a JSON object "
-    "with these fields:\n"
-    "  • tenant_name (string)\n"
-    "  • address (string or null)\n"
-    "  • request_type (one of maintenance, payment, lease, general)\n"
-    "  • summary (first line of the tenant's ask)\n"
-    "  • full_body (full email text)\n\n"
-    "When deciding request_type (based **solely** on the **body**):\n"
-    "  1. If the tenant explicitly *withholds* payment until a repair/maintenance issue is fixed → \"maintenance\"\n"
-    "  2. Else if they ask about rent, balances, due dates, etc. → \"payment\"\n"
-    "  3. Else if they ask about lease terms → \"lease\"\n"
-    "  4. Else if they ask about repairs, maintenance, or facility issues → \"maintenance\"\n"
-    "  5. Otherwise → \"general\"\n"
-    "Respond with *only* valid JSON—nothing else."
-        )
-        
-        self.rule_parser = RuleBasedParser()
+        self.tiers = tiers or [ModelTier("default", model)]
+        self.hedger = hedger
+        self.min_call_seconds = min_call_seconds
+        self.breaker = breaker
+        self.system_prompt = PARSER_SYSTEM_PROMPT
+        self.prompt_version = PARSER_PROMPT_VERSION
+
+        self.rule_parser = RuleBasedParser(resolver=resolver)
+        self.resolver = resolver
+        self.classifier = classifier
+        self.skip_threshold = skip_threshold
+        self._predictions: Dict[str, tuple] = {}
+        configure_openai()
 
+    @staticmethod
+    def _key(msg: Dict[str, str]) -> str:
+        return msg.get("message_id") or f"{msg.get('account', '')}:{msg.get('uid')}"
 
-    def llm_parse(self, msg: Dict[str, str]) -> Dict[str, str]:
-        user_prompt = (
-            f"Email headers:\n"
-            f"From: {msg['sender']}\n"
-            f"Subject: {msg['subject']}\n\n"
-            f"Body:\n{msg['body']}\n\n"
-            "Return only the JSON."
+    def preclassify(self, msgs: Iterable[Dict[str, str]]) -> int:
+        """
+        Label a whole fetched batch with the local classifier in one pass.
+        parse() then uses each prediction to skip the LLM or, when it does
+        call the LLM, to count agreement. Returns the number that will skip.
+        """
+        if self.classifier is None:
+            return 0
+        msgs = list(msgs)
+        for msg, prediction in zip(msgs, self.classifier.classify_messages(msgs)):
+            self._predictions[self._key(msg)] = prediction
+        if self.skip_threshold is None:
+            return 0
+        return sum(
+            1 for msg in msgs if self._predictions[self._key(msg)][1] >= self.skip_threshold
         )
 
-        resp = openai.chat.completions.create(
-            model=self.model,
+
+    def llm_parse(self, msg: Dict[str, str], tier: Optional[ModelTier] = None) -> Dict[str, str]:
+        tier = tier or self.tiers[0]
+        user_prompt = parser_user_prompt(msg)
+        # The tier's timeout, shortened to what is left of the email's deadline
+        timeout = deadlines.timeout_for(tier.timeout)
+        options = {} if timeout is None else {"timeout": timeout}
+
+        start = time.perf_counter()
+        resp = guarded(self.breaker, lambda: hedged(self.hedger, f"parse.{tier.name}", lambda: openai.chat.completions.create(
+            model=tier.model,
             messages=[
                 {"role": "system", "content": self.system_prompt},
                 {"role": "user",   "content": user_prompt},
             ],
-            temperature=0
-        )
-        return json.loads(resp.choices[0].message.content)
+            temperature=0,
+            **options
+        )))
+        usage = record_llm_usage(f"parse.{tier.name}", resp, time.perf_counter() - start)
+        if usage:
+            metrics.incr(
+                f"llm.parse.{tier.name}.cost_usd",
+                (usage["prompt_tokens"] * tier.prompt_cost + usage["completion_tokens"] * tier.completion_cost) / 1e6
+            )
+            logger.info(
+                "Parse call (%s, %s): %d prompt tokens, %d cached",
+                self.prompt_version, tier.model, usage["prompt_tokens"], usage["cached_tokens"]
+            )
+        return serialization.loads(resp.choices[0].message.content)
     
+    @tracing.traced("parser.parse")
     def parse(self, msg: Dict[str, str]) -> Dict[str, str]:
+        prediction = self._predictions.pop(self._key(msg), None)
+        if prediction is not None and self.skip_threshold is not None \
+           and prediction[1] >= self.skip_threshold:
+            metrics.incr("classifier.llm_skipped")
+            tracing.set_attributes(classifier_label=prediction[0], classifier_prob=prediction[1])
+            parsed = as_dict(self.rule_parser.parse(msg))
+            parsed["request_type"] = prediction[0]
+            parsed["parsed_by"] = "classifier"
+            return parsed
+
+        for tier in self.tiers:
+            if not deadlines.has_time("parse", self.min_call_seconds):
+                break
+            if self.breaker is not None and not self.breaker.available():
+                metrics.incr("cascade.circuit_open")
+                break
+            parsed = self._parse_with(tier, msg)
+            if parsed is None:
+                continue
+            if prediction is not None:
+                metrics.incr("classifier.agree" if prediction[0] == parsed["request_type"] else "classifier.disagree")
+            return parsed
+
+        # Fallback: use rule-based parser 
+        metrics.incr("cascade.rules.accepted")
+        tracing.set_attributes(parse_tier="rules")
+        parsed = as_dict(self.rule_parser.parse(msg))
+        parsed["parsed_by"] = "rules"
+        return parsed
+
+    def _parse_with(self, tier: ModelTier, msg: Dict[str, str]) -> Optional[Dict[str, str]]:
+        """
+        One cascade step: the tier's parse, or None to escalate.
+        """
+        metrics.incr(f"cascade.{tier.name}.attempts")
         try:
-            parsed = self.llm_parse(msg)
+            parsed = self.llm_parse(msg, tier)
             validate_email_data(parsed)
-            parsed["request_type"] = self.normalize_request_type(parsed)
+            confidence = self.confidence(parsed, msg)
+            if confidence >= tier.min_confidence:
+                parsed["request_type"] = self.normalize_request_type(parsed)
+                found = self.resolve_address(parsed["address"], msg)
+                if found is not None:
+                    parsed["address"] = found.address
+                parsed["address_key"] = found.key if found is not None else None
+                parsed["parsed_by"] = tier.name
+                metrics.incr(f"cascade.{tier.name}.accepted")
+                tracing.set_attributes(parse_tier=tier.name, parse_confidence=confidence)
+                return parsed
+            reason, detail = "low_confidence", f"confidence {confidence:.2f}"
 
-            return parsed
+        except (json.JSONDecodeError, jsonschema.ValidationError, KeyError) as e:
+            reason, detail = "invalid", e
+        except (openai.APIError, CircuitOpen) as e:
+            # Includes timeouts and connection errors
+            reason, detail = "error", e
 
-        except (json.JSONDecodeError, ValidationError, KeyError) as e:
-            logger.warning(
-                "LLM parsing failed (falling back to rule-based): %s", e
-            )
+        metrics.incr(f"cascade.{tier.name}.{reason}")
+        logger.warning(
+            "LLM parsing with %s failed (escalating): %s", tier.model, detail
+        )
+        return None
 
-        # Fallback: use rule-based parser 
-        return asdict(self.rule_parser.parse(msg))
+    def confidence(self, parsed: Dict[str, str], msg: Dict[str, str]) -> float:
+        """
+        Plausibility of a schema-valid parse between 0 and 1, from cross
+        checks against the email: the tenant name and any numbers in the
+        address actually occur in the email. request_type is not checked,
+        since _parse_with() replaces it with normalize_request_type()
+        whatever the model said.
+        """
+        score = 1.0
+        source = f"{msg.get('sender') or ''} {msg.get('body') or ''}".casefold()
+        if not any(word in source for word in parsed["tenant_name"].casefold().split()):
+            score *= 0.5
+        if any(number not in source for number in re.findall(r"\d+", parsed["address"] or "")):
+            score *= 0.5
+        return score
+
+    def cascade_report(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Per tier: attempts, accepted, hit rate, failures by reason, latency,
+        tokens and cost, for tuning the tiers. "rules" counts emails that
+        fell through every model.
+        """
+        report = {}
+        for tier in self.tiers:
+            stage = f"llm.parse.{tier.name}"
+            attempts = metrics.counter(f"cascade.{tier.name}.attempts")
+            accepted = metrics.counter(f"cascade.{tier.name}.accepted")
+            latency = metrics.histogram(f"{stage}.latency")
+            report[tier.name] = {
+                "model": tier.model,
+                "attempts": attempts,
+                "accepted": accepted,
+                "hit_rate": accepted / attempts if attempts else None,
+                "invalid": metrics.counter(f"cascade.{tier.name}.invalid"),
+                "low_confidence": metrics.counter(f"cascade.{tier.name}.low_confidence"),
+                "error": metrics.counter(f"cascade.{tier.name}.error"),
+                "latency": latency.summary() if latency else None,
+                "prompt_tokens": metrics.counter(f"{stage}.prompt_tokens"),
+                "completion_tokens": metrics.counter(f"{stage}.completion_tokens"),
+                "cost_usd": metrics.counter(f"{stage}.cost_usd"),
+            }
+        report["rules"] = {"accepted": metrics.counter("cascade.rules.accepted")}
+        return report
     
+    def resolve_address(self, address: Optional[str], msg: Dict[str, str]) -> Optional[ResolvedAddress]:
+        """
+        The registry address mentioned in the body or matching `address`;
+        None without a resolver or a match.
+        """
+        if self.resolver is None:
+            return None
+        return self.resolver.find(msg.get("body")) or self.resolver.resolve(address, msg.get("body"))
+
     def normalize_request_type(self, parsed: Dict[str, str]) -> str:
         body = parsed["full_body"].lower()
 
@@ -0,0 +1,218 @@
+# priority.py
+
+import re
+import heapq
+import time
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from metrics import metrics
+from rule_parser import EmailParser
+
+logger = logging.getLogger(__name__)
+
+# Highest priority first
+PRIORITY_CLASSES = ("urgent", "high", "normal", "low")
+
+# Time-to-reply targets per class, in seconds
+DEFAULT_SLAS = {
+    "urgent": 15 * 60,
+    "high": 60 * 60,
+    "normal": 4 * 60 * 60,
+    "low": 24 * 60 * 60,
+}
+
+DEFAULT_CONCURRENCY = {"urgent": 4, "high": 2, "normal": 2, "low": 1}
+
+
+def _keyword_pattern(keywords) -> str:
+    stems = [re.escape(kw) for kw in sorted(keywords) if len(kw) > 2]
+    words = [re.escape(kw) for kw in sorted(keywords) if len(kw) <= 2]
+    if words:
+        stems.append(r"(?:" + "|".join(words) + r")\b")
+    return r"\b(" + "|".join(stems) + r")"
+
+
+class PriorityScorer:
+    """
+    Cheap keyword scorer that runs before any LLM stage.
+
+    Uses the rule parser's category keywords plus a list of emergency
+    phrases, and bumps tenants who already have open tickets.
+    """
+    _URGENT = re.compile(
+        r"\b(emergency|urgent|flood\w*|fire|smoke|gas|sparks?|burst|"
+        r"leak\w* (through|from) the ceiling|no (heat|water|power|electricity)|"
+        r"locked (myself )?out|carbon monoxide)\b"
+    )
+
+    def __init__(self, index=None):
+        """
+        :param index: Optional ActionItemIndex used to count the sender's open tickets.
+        """
+        self.index = index
+        self.rules = EmailParser()
+        # The rule parser's category keywords, matched at word starts;
+        # abbreviations like "ac" only as whole words, not in "account"
+        self._categories = [
+            (category, re.compile(_keyword_pattern(kws)))
+            for category, kws in self.rules.keywords.items()
+        ]
+
+    def score(self, msg: Dict[str, Any]) -> Tuple[str, int]:
+        """
+        :return: (priority class, numeric score) for a fetched message.
+        """
+        text = f"{msg.get('subject') or ''}\n{msg.get('body') or ''}".lower()
+        score = 0
+        if self._URGENT.search(text):
+            score += 100
+        category = next((c for c, pattern in self._categories if pattern.search(text)), "general")
+        score += {"maintenance": 30, "lease": 10, "payment": 5}.get(category, 0)
+
+        open_tickets = self._open_tickets(msg)
+        score += min(open_tickets, 3) * 10
+
+        if score >= 100:
+            return "urgent", score
+        if score >= 40:
+            return "high", score
+        if score >= 20:
+            return "normal", score
+        return "low", score
+
+    def _open_tickets(self, msg: Dict[str, Any]) -> int:
+        if self.index is None or not msg.get("sender"):
+            return 0
+        tenant = self.rules.parse_name(msg["sender"])
+        return sum(
+            1 for item in self.index.by_tenant(tenant)
+            if item.get("status") in ("pending", "open", "in_progress")
+        )
+
+
+class PriorityScheduler:
+    """
+    Priority queue in front of the expensive pipeline stages.
+
+    Messages are ordered by class, then SLA deadline. Workers never run
+    more than `concurrency[class]` messages of one class at once, so a
+    burst of low priority mail cannot take every worker. Time-to-reply
+    and SLA misses are recorded per class under `priority.<class>.*`.
+    """
+    def __init__(
+        self,
+        scorer: Optional[PriorityScorer] = None,
+        concurrency: Optional[Dict[str, int]] = None,
+        slas: Optional[Dict[str, float]] = None
+    ):
+        self.scorer = scorer or PriorityScorer()
+        self.concurrency = dict(DEFAULT_CONCURRENCY, **(concurrency or {}))
+        self.slas = dict(DEFAULT_SLAS, **(slas or {}))
+        self._heap: List[tuple] = []
+        self._seq = 0
+        self._running = {cls: 0 for cls in PRIORITY_CLASSES}
+        self._cond = threading.Condition()
+
+    def submit(self, msg: Dict[str, Any], received_at: Optional[float] = None) -> str:
+        """
+        Queue a message. `received_at` defaults to the Date header, or now.
+        Returns its priority class.
+        """
+        cls, score = self.scorer.score(msg)
+        received = received_at if received_at is not None else _received_at(msg)
+        deadline = received + self.slas[cls]
+        with self._cond:
+            heapq.heappush(
+                self._heap,
+                (PRIORITY_CLASSES.index(cls), deadline, self._seq, cls, received, msg)
+            )
+            self._seq += 1
+            self._cond.notify()
+        logger.debug("Queued message %s as %s (score %d)", msg.get("uid"), cls, score)
+        return cls
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def run(self, handler: Callable[[Dict[str, Any]], Any], workers: int = 1) -> None:
+        """
+        Process everything queued with `workers` threads and return once
+        the queue is empty. Handler errors are logged, not raised.
+        """
+        threads = [
+            threading.Thread(target=self._work, args=(handler,), name=f"priority-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-class time-to-reply percentiles (seconds) and SLA misses.
+        """
+        out = {}
+        for cls in PRIORITY_CLASSES:
+            hist = metrics.histogram(f"priority.{cls}.time_to_reply")
+            if hist is None:
+                continue
+            out[cls] = dict(hist.summary(), sla_misses=int(metrics.counter(f"priority.{cls}.sla_missed")))
+        return out
+
+    def _next(self) -> Optional[tuple]:
+        """
+        Pop the best queued entry whose class has a free slot. Blocks while
+        work is running but nothing is eligible; returns None when done.
+        """
+        with self._cond:
+            while True:
+                if not self._heap:
+                    if not any(self._running.values()):
+                        return None
+                    self._cond.wait()
+                    continue
+                skipped = []
+                chosen = None
+                while self._heap:
+                    entry = heapq.heappop(self._heap)
+                    if self._running[entry[3]] < self.concurrency[entry[3]]:
+                        chosen = entry
+                        break
+                    skipped.append(entry)
+                for entry in skipped:
+                    heapq.heappush(self._heap, entry)
+                if chosen is not None:
+                    self._running[chosen[3]] += 1
+                    return chosen
+                self._cond.wait()
+
+    def _work(self, handler: Callable[[Dict[str, Any]], Any]) -> None:
+        while True:
+            entry = self._next()
+            if entry is None:
+                return
+            _, deadline, _, cls, received, msg = entry
+            try:
+                handler(msg)
+            except Exception as e:
+                logger.error("Failed to process message %s: %s", msg.get("uid"), e, exc_info=True)
+            finally:
+                done = time.time()
+                metrics.observe(f"priority.{cls}.time_to_reply", done - received)
+                if done > deadline:
+                    metrics.incr(f"priority.{cls}.sla_missed")
+                with self._cond:
+                    self._running[cls] -= 1
+                    self._cond.notify_all()
+
+
+def _received_at(msg: Dict[str, Any]) -> float:
+    try:
+        return parsedate_to_datetime(msg.get("date")).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
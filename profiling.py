@@ -0,0 +1,134 @@
+# profiling.py
+
+import os
+import sys
+import time
+import random
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import tracing
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SamplingProfiler:
+    """
+    Samples one thread's stack every `interval` seconds from a background
+    thread and counts the stacks, written out in folded format
+    ("outer;inner;leaf count" per line) for flamegraph.pl or speedscope.
+    The profiled thread itself does no extra work.
+    """
+    def __init__(self, thread_id: Optional[int] = None, interval: float = 0.005):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def write(self, path: str) -> str:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.folded())
+        return path
+
+
+class ProfileSwitch:
+    """
+    Fraction of emails to profile, changeable while the assistant runs.
+
+    The rate is read from `control_file` (a single number, e.g. "0.05")
+    and re-read whenever the file changes, so profiling is switched on or
+    off by editing or deleting it. Without the file, `default` applies.
+    """
+    def __init__(
+        self,
+        control_file: Optional[str] = None,
+        default: Optional[float] = None,
+        output_dir: str = "profiles",
+        rng: Optional[random.Random] = None
+    ):
+        """
+        :param control_file: Defaults to $PROFILE_CONTROL or profiles/rate.
+        :param default: Defaults to $PROFILE_RATE or 0 (off).
+        """
+        self.control_file = control_file or os.environ.get("PROFILE_CONTROL", "profiles/rate")
+        self.default = default if default is not None else float(os.environ.get("PROFILE_RATE", "0"))
+        self.output_dir = output_dir
+        self.rng = rng or random.Random()
+        self._mtime: Optional[float] = None
+        self._rate = self.default
+
+    @property
+    def rate(self) -> float:
+        try:
+            mtime = os.stat(self.control_file).st_mtime
+        except OSError:
+            self._mtime, self._rate = None, self.default
+            return self._rate
+        if mtime != self._mtime:
+            self._mtime = mtime
+            try:
+                with open(self.control_file, encoding="utf-8") as f:
+                    self._rate = min(max(float(f.read().strip() or 0), 0.0), 1.0)
+            except ValueError:
+                logger.warning("Ignoring unreadable profile rate in %s", self.control_file)
+                self._rate = self.default
+            logger.info("Profiling %.1f%% of emails", self._rate * 100)
+        return self._rate
+
+    def sampled(self) -> bool:
+        rate = self.rate
+        return rate > 0 and self.rng.random() < rate
+
+    @contextmanager
+    def maybe_profile(self, name: Optional[str] = None) -> Iterator[Optional[str]]:
+        """
+        Profile the block if this email is sampled. Yields the path the
+        folded stacks will be written to (named after the current trace,
+        which also records it as `profile.path`), or None.
+        """
+        if not self.sampled():
+            yield None
+            return
+        span = tracing.current_span()
+        name = name or (span.trace_id if span else f"{time.time_ns():x}")
+        path = os.path.join(self.output_dir, f"{name}.folded")
+        tracing.set_attributes(**{"profile.path": path})
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            yield path
+        finally:
+            profiler.stop()
+            profiler.write(path)
+            metrics.incr("profiling.sampled")
@@ -0,0 +1,105 @@
+# prompts.py
+#
+# Prompt templates for the LLM stages. Each prompt is a static, versioned
+# system prefix plus a per-email user suffix: everything that never changes
+# between calls lives in the system prompt and all variable data goes last.
+# Bump the version whenever a prefix changes so cached-token metrics can be
+# compared per version.
+#
+# OpenAI only caches prompts of at least 1024 tokens. Both system prompts
+# are around 260 tokens, and a typical parse or reply call stays well
+# under the threshold, so cached_tokens will normally be 0: the layout is
+# there so caching engages if the prefixes grow (few-shot examples, a
+# JSON schema), not because it saves anything today. Padding the prefix
+# just to reach the threshold would cost more than caching saves.
+
+from typing import Any, Dict, List
+
+PARSER_PROMPT_VERSION = "parser-v2"
+REPLY_PROMPT_VERSION = "reply-v2"
+
+PARSER_SYSTEM_PROMPT = (
+    "You are an assistant that reads a tenant's email and returns ONLY a JSON object "
+    "with these fields:\n"
+    "  • tenant_name (string)\n"
+    "  • address (string or null)\n"
+    "  • request_type (one of maintenance, payment, lease, general)\n"
+    "  • summary (first line of the tenant's ask)\n"
+    "  • full_body (full email text)\n\n"
+    "When deciding request_type (based **solely** on the **body**):\n"
+    "  1. If the tenant explicitly *withholds* payment until a repair/maintenance issue is fixed → \"maintenance\"\n"
+    "  2. Else if they ask about rent, balances, due dates, etc. → \"payment\"\n"
+    "  3. Else if they ask about lease terms → \"lease\"\n"
+    "  4. Else if they ask about repairs, maintenance, or facility issues → \"maintenance\"\n"
+    "  5. Otherwise → \"general\"\n\n"
+    "The user message contains the email headers (From, Subject) followed by the body.\n"
+    "Respond with *only* valid JSON—nothing else."
+)
+
+REPLY_SYSTEM_PROMPT = (
+    "You are a professional property manager assistant. "
+    "Given a tenant's parsed request, context (account balances, lease dates, maintenance history) and the ticket id raised for the request, "
+    "draft a polite, clear, and concise email response. "
+    "Always:\n"
+    "  • Greet the tenant by their name.\n"
+    "  • Acknowledge their specific ask (from summary).\n"
+    "  • Reference any relevant context (e.g., rent balance, lease end date, past tickets).\n"
+    "  • Explain next steps (e.g., we will schedule maintenance, or here is how to pay due rent).\n"
+    "  • State that a ticket with ticket id has been raised for their reference.\n"
+    "  • Sign off with Domos Property Management Team.\n\n"
+    "The user message contains the tenant's account context, the parsed request, "
+    "the ticket id and the tenant's full message, in that order.\n"
+    "Respond *only* with the email body (no extra JSON or markup)."
+)
+
+
+def parser_user_prompt(msg: Dict[str, str]) -> str:
+    """
+    Variable suffix for the parse call: just the email itself.
+    """
+    return (
+        f"Email headers:\n"
+        f"From: {msg['sender']}\n"
+        f"Subject: {msg['subject']}\n\n"
+        f"Body:\n{msg['body']}"
+    )
+
+
+def reply_user_prompt(
+    parsed: Dict[str, str],
+    context: Dict[str, Any],
+    ticket_id: str,
+    body: str,
+    history: List[Dict[str, Any]]
+) -> str:
+    """
+    Variable suffix for the reply call, ordered from the data that
+    changes least between a tenant's emails (account context) to the
+    data that changes every time (ticket id and message).
+    """
+    lines = [
+        "Context:",
+        f"  Rent Balance: {context['rent_balance']}",
+        f"  Lease Ends: {context['lease_end_date']}",
+        "  Maintenance History:",
+    ]
+    for ticket in history:
+        lines.append(
+            f"    - {ticket['date']}: {ticket['issue']} "
+            f"({ticket['status']}, id {ticket['id']})"
+        )
+    lines += [
+        "",
+        "Parsed Request:",
+        f"  Tenant: {parsed['tenant_name']}",
+        f"  Address: {parsed['address']}",
+        f"  Type: {parsed['request_type']}",
+        f"  Summary: {parsed['summary']}",
+        "",
+        "Ticket Id:",
+        f"{ticket_id}",
+        "",
+        "Full Message:",
+        body,
+    ]
+    return "\n".join(lines)
@@ -0,0 +1,23 @@
+# records.py
+
+from dataclasses import fields, is_dataclass
+from typing import Any, Dict, Tuple
+
+
+_FIELD_NAMES: Dict[type, Tuple[str, ...]] = {}
+
+
+def as_dict(record: Any) -> Dict[str, Any]:
+    """
+    Shallow dict of a flat dataclass such as rule_parser.ParsedEmail.
+
+    Cheaper than dataclasses.asdict(), which deep-copies every value;
+    field names are looked up once per type.
+    """
+    cls = type(record)
+    names = _FIELD_NAMES.get(cls)
+    if names is None:
+        if not is_dataclass(record):
+            raise TypeError(f"as_dict() expects a dataclass, got {cls.__name__}")
+        names = _FIELD_NAMES[cls] = tuple(f.name for f in fields(record))
+    return {name: getattr(record, name) for name in names}
@@ -0,0 +1,488 @@
+# replay.py
+
+import sys
+import gzip
+import time
+import base64
+import difflib
+import hashlib
+import logging
+import smtplib
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import tracing
+import serialization
+from inbox import parse_message
+from metrics import Histogram, metrics
+
+logger = logging.getLogger(__name__)
+
+CORPUS_VERSION = 1
+
+# Email whose pipeline run makes the current model calls
+_email: ContextVar[Optional[str]] = ContextVar("replay_email", default=None)
+
+
+def email_key(msg: Dict[str, Any]) -> str:
+    return msg.get("message_id") or str(msg.get("uid"))
+
+
+@contextmanager
+def email_scope(key: Optional[str]) -> Iterator[None]:
+    """
+    Attribute model calls made in the block to the email `key`.
+    """
+    token = _email.set(key)
+    try:
+        yield
+    finally:
+        _email.reset(token)
+
+
+def request_key(request: Dict[str, Any]) -> str:
+    """
+    Digest of what determines a chat completion: model, messages,
+    sampling options and streaming, but not the timeout.
+    """
+    relevant = {k: v for k, v in request.items() if k not in ("timeout", "stream_options")}
+    return hashlib.sha256(serialization.dumps_bytes(relevant, compact=True)).hexdigest()
+
+
+def _stage() -> str:
+    # The traced pipeline stage making the call ("parser.parse", "reply.generate")
+    span = tracing.current_span()
+    return span.name if span is not None else ""
+
+
+def _usage(usage: Any) -> Optional[Dict[str, int]]:
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+    }
+
+
+class Recorder:
+    """
+    Writes a replay corpus: the raw RFC822 messages fetched by
+    InboxConnector, every chat completion request with its response (or
+    error) and every SMTP transaction, with their latencies and offsets
+    from the start of the recording. The corpus is gzip-compressed JSON
+    lines, one record per event.
+
+    Model calls are attributed to the email being processed (see
+    email_scope()) and to the traced stage making them, so a replay can
+    still find the recorded response when a prompt has changed.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._start = time.monotonic()
+        self._calls: Dict[tuple, int] = defaultdict(int)
+        self._write({"kind": "corpus", "version": CORPUS_VERSION,
+                     "created": datetime.now(timezone.utc).isoformat()})
+
+    def message(self, fields: Dict[str, Any], raw: bytes) -> None:
+        self._write({"kind": "message", "email": email_key(fields), "uid": fields["uid"],
+                     "raw": base64.b64encode(raw).decode("ascii")})
+
+    def smtp(self, msg: Any, recipients: List[str], error: Optional[BaseException], latency: float) -> None:
+        self._write({
+            "kind": "smtp",
+            "to": list(recipients),
+            "subject": msg["Subject"],
+            "body": msg.get_content(),
+            "error": None if error is None else _smtp_error(error),
+            "latency": latency,
+        })
+
+    def wrap_openai(self, completions: Any = None) -> None:
+        """
+        Record every call of `completions.create` (default: the openai
+        module's client).
+        """
+        if completions is None:
+            import openai
+            completions = openai.chat.completions
+        completions.create = self.recording(completions.create)
+
+    def recording(self, create: Callable[..., Any]) -> Callable[..., Any]:
+        def recorded(**request):
+            email, stage = _email.get(), _stage()
+            with self._lock:
+                call = self._calls[(email, stage)]
+                self._calls[(email, stage)] += 1
+            entry = {"kind": "llm", "email": email, "stage": stage, "call": call,
+                     "key": request_key(request), "request": {k: v for k, v in request.items() if k != "timeout"}}
+            start = time.perf_counter()
+            try:
+                resp = create(**request)
+            except Exception as e:
+                self._write({**entry, "error": type(e).__name__, "latency": time.perf_counter() - start})
+                raise
+            if request.get("stream"):
+                return _RecordingStream(resp, lambda response, first: self._write(
+                    {**entry, "response": response, "first_token": first, "latency": time.perf_counter() - start}
+                ), start)
+            self._write({**entry, "latency": time.perf_counter() - start, "response": {
+                "content": resp.choices[0].message.content, "usage": _usage(getattr(resp, "usage", None)),
+            }})
+            return resp
+        return recorded
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            record["t"] = time.monotonic() - self._start
+            self._file.write(serialization.dumps(record, compact=True) + "\n")
+
+
+def _smtp_error(error: BaseException) -> Dict[str, Any]:
+    reply = getattr(error, "smtp_error", None)
+    if isinstance(reply, bytes):
+        reply = reply.decode("utf-8", errors="replace")
+    return {"code": getattr(error, "smtp_code", None), "message": reply or str(error)}
+
+
+class _RecordingStream:
+    """Passes a completion stream through, recording it when exhausted."""
+    def __init__(self, stream: Any, done: Callable[[Dict[str, Any], Optional[float]], None], start: float):
+        self._stream = stream
+        self._done = done
+        self._start = start
+
+    def __iter__(self):
+        parts, usage, first = [], None, None
+        for chunk in self._stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                if first is None:
+                    first = time.perf_counter() - self._start
+                parts.append(chunk.choices[0].delta.content)
+            usage = getattr(chunk, "usage", None) or usage
+            yield chunk
+        self._done({"content": "".join(parts), "usage": _usage(usage)}, first)
+
+    def close(self) -> None:
+        close = getattr(self._stream, "close", None)
+        if close is not None:
+            close()
+
+
+class Corpus:
+    """
+    A recorded corpus loaded for replay.
+    """
+    def __init__(self, records: List[Dict[str, Any]]):
+        self.messages = [r for r in records if r["kind"] == "message"]
+        self.llm = [r for r in records if r["kind"] == "llm"]
+        self.smtp = [r for r in records if r["kind"] == "smtp"]
+
+    @classmethod
+    def load(cls, path: str) -> "Corpus":
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            records = [serialization.loads(line) for line in f if line.strip()]
+        if not records or records[0].get("kind") != "corpus":
+            raise ValueError(f"{path} is not a replay corpus")
+        if records[0]["version"] != CORPUS_VERSION:
+            raise ValueError(f"{path} has corpus version {records[0]['version']}, expected {CORPUS_VERSION}")
+        return cls(records[1:])
+
+    def emails(self) -> List[Dict[str, Any]]:
+        """
+        Recorded messages parsed as InboxConnector would, in arrival
+        order, each with its offset "t".
+        """
+        return [
+            {**parse_message(r["uid"], base64.b64decode(r["raw"])), "t": r["t"]}
+            for r in self.messages
+        ]
+
+
+class ReplayMiss(KeyError):
+    """No recorded response matches a request."""
+
+
+class _Wait:
+    def __init__(self, speed: Optional[float]):
+        self.speed = speed
+
+    def __call__(self, seconds: Optional[float]) -> None:
+        if self.speed and seconds:
+            time.sleep(seconds / self.speed)
+
+
+class ReplayLLM:
+    """
+    Stands in for `chat.completions.create`, answering from a corpus.
+
+    A request is answered with the recorded response to the identical
+    request, else with the response recorded for the same email, stage
+    and call number (so a changed prompt still gets a realistic answer).
+    Recorded errors are raised again. Hits are counted as
+    replay.llm.exact and replay.llm.matched, misses as replay.llm.missed.
+    """
+    def __init__(self, corpus: Corpus, speed: Optional[float] = None, fallback: Optional[Callable[..., Any]] = None):
+        """
+        :param speed: 1.0 replays recorded latencies, 10.0 ten times faster;
+                      None answers at once.
+        :param fallback: Called for requests without a recorded response
+                         (e.g. the real client); default raises ReplayMiss.
+        """
+        self.wait = _Wait(speed)
+        self.fallback = fallback
+        self._lock = threading.Lock()
+        self._by_key: Dict[str, deque] = defaultdict(deque)
+        self._by_call: Dict[tuple, Dict[str, Any]] = {}
+        for record in corpus.llm:
+            self._by_key[record["key"]].append(record)
+            self._by_call[(record["email"], record["stage"], record["call"])] = record
+        self._calls: Dict[tuple, int] = defaultdict(int)
+
+    def create(self, **request):
+        email, stage = _email.get(), _stage()
+        with self._lock:
+            call = self._calls[(email, stage)]
+            self._calls[(email, stage)] += 1
+            same = self._by_key.get(request_key(request))
+            exact = bool(same)
+            record = same.popleft() if exact else self._by_call.get((email, stage, call))
+        if record is None:
+            metrics.incr("replay.llm.missed")
+            if self.fallback is not None:
+                return self.fallback(**request)
+            raise ReplayMiss(f"No recorded response for {stage or 'call'} {call} of {email}")
+        metrics.incr("replay.llm.exact" if exact else "replay.llm.matched")
+
+        if "error" in record:
+            self.wait(record["latency"])
+            raise _openai_error(record["error"])
+        response = record["response"]
+        if request.get("stream"):
+            return self._stream(response, record.get("first_token"), record["latency"])
+        self.wait(record["latency"])
+        return _completion(response)
+
+    def _stream(self, response: Dict[str, Any], first_token: Optional[float], latency: float):
+        first_token = first_token or 0.0
+        self.wait(first_token)
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=response["content"]))], usage=None)
+        self.wait(latency - first_token)
+        yield SimpleNamespace(choices=[], usage=_usage_namespace(response["usage"]))
+
+
+def _usage_namespace(usage: Optional[Dict[str, int]]) -> Optional[SimpleNamespace]:
+    if usage is None:
+        return None
+    return SimpleNamespace(
+        prompt_tokens=usage["prompt_tokens"],
+        completion_tokens=usage["completion_tokens"],
+        prompt_tokens_details=SimpleNamespace(cached_tokens=usage["cached_tokens"]),
+    )
+
+
+def _completion(response: Dict[str, Any]) -> SimpleNamespace:
+    message = SimpleNamespace(content=response["content"])
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=_usage_namespace(response["usage"]))
+
+
+def _openai_error(name: str) -> Exception:
+    import openai
+    if name == "APITimeoutError":
+        return openai.APITimeoutError(request=None)
+    return openai.APIConnectionError(message=f"Replayed {name}", request=None)
+
+
+class ReplaySMTP:
+    """
+    Stands in for an SMTP session, answering each message with the
+    outcome recorded for the same recipients and subject (in order), or
+    accepting it if none was recorded.
+    """
+    def __init__(self, corpus: Corpus, speed: Optional[float] = None):
+        self.wait = _Wait(speed)
+        self._lock = threading.Lock()
+        self._outcomes: Dict[tuple, deque] = defaultdict(deque)
+        for record in corpus.smtp:
+            self._outcomes[(tuple(record["to"]), record["subject"])].append(record)
+        self.sent: List[Dict[str, Any]] = []
+
+    def connect(self) -> "ReplaySMTP":
+        return self
+
+    def send_message(self, msg, from_addr=None, to_addrs=None) -> dict:
+        with self._lock:
+            outcomes = self._outcomes.get((tuple(to_addrs), msg["Subject"]))
+            record = outcomes.popleft() if outcomes else None
+        metrics.incr("replay.smtp.replayed" if record else "replay.smtp.missed")
+        if record is not None:
+            self.wait(record["latency"])
+            if record["error"] is not None:
+                raise smtplib.SMTPResponseException(record["error"]["code"] or 451, record["error"]["message"])
+        with self._lock:
+            self.sent.append({"to": list(to_addrs), "subject": msg["Subject"], "body": msg.get_content()})
+        return {}
+
+    def quit(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class ReplayRunner:
+    """
+    Feeds a corpus through LLMEmailParser, ContextLoader, ReplyGenerator
+    and EmailSender with recorded model and SMTP responses.
+
+    Emails arrive at their recorded offsets divided by `speed` (None: all
+    at once) and are processed one at a time. run() returns the outputs
+    per email and a report of latency, throughput and replay hit rates;
+    diff_outputs() compares the outputs of two runs.
+    """
+    def __init__(self, corpus: Corpus, parser=None, generator=None, sender=None, seed: int = 42):
+        """
+        :param parser: LLMEmailParser to evaluate (default: LLMEmailParser()).
+        :param generator: ReplyGenerator to evaluate (default: ReplyGenerator()).
+        :param sender: EmailSender whose connections are replaced by
+                       ReplaySMTP (default: a single-attempt sender).
+        :param seed: ContextLoader seed, the same for every run.
+        """
+        from parser import LLMEmailParser
+        from reply_generator import ReplyGenerator
+        from sender import EmailSender
+        self.corpus = corpus
+        self.parser = parser or LLMEmailParser()
+        self.generator = generator or ReplyGenerator()
+        self.sender = sender or EmailSender("replay", 0, "replay@localhost", "", max_retries=1)
+        self.seed = seed
+
+    def run(self, speed: Optional[float] = None, fallback: Optional[Callable[..., Any]] = None) -> Dict[str, Any]:
+        import openai
+        from context_loader import ContextLoader
+
+        metrics.reset()
+        llm = ReplayLLM(self.corpus, speed, fallback)
+        smtp = ReplaySMTP(self.corpus, speed)
+        loader = ContextLoader(seed=self.seed)
+        completions = openai.chat.completions
+        original_create, original_connect = completions.create, self.sender._connect
+        completions.create, self.sender._connect = llm.create, smtp.connect
+
+        emails = self.corpus.emails()
+        latency = Histogram()
+        outputs = []
+        start = time.perf_counter()
+        try:
+            for msg in emails:
+                arrival = start + (msg["t"] - emails[0]["t"]) / speed if speed else start
+                delay = arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                outputs.append(self._process(msg, loader))
+                latency.observe(time.perf_counter() - arrival)
+        finally:
+            completions.create, self.sender._connect = original_create, original_connect
+        elapsed = time.perf_counter() - start
+
+        report = {
+            "emails": len(emails),
+            "seconds": elapsed,
+            "throughput": len(emails) / elapsed if elapsed else 0.0,
+            "latency": latency.summary(),
+            "llm": {k: metrics.counter(f"replay.llm.{k}") for k in ("exact", "matched", "missed")},
+            "smtp": {k: metrics.counter(f"replay.smtp.{k}") for k in ("replayed", "missed")},
+        }
+        return {"report": report, "outputs": outputs}
+
+    def _process(self, msg: Dict[str, Any], loader) -> Dict[str, Any]:
+        key = email_key(msg)
+        # Stable per email, so reply prompts are comparable between runs
+        ticket_id = hashlib.sha1(key.encode("utf-8")).hexdigest()[:10]
+        output = {"email": key, "parsed": None, "reply": None, "sent": False, "error": None}
+        with email_scope(key), tracing.span("email.handle"):
+            try:
+                parsed = self.parser.parse(msg)
+                output["parsed"] = {k: parsed.get(k) for k in ("tenant_name", "address", "request_type", "summary")}
+                context = loader.load(parsed["tenant_name"], parsed["address"])
+                output["reply"] = self.generator.generate(parsed, context, ticket_id)
+                output["sent"] = self.sender.send_email([msg["sender"]], f"Re: {msg['subject']}", output["reply"])
+            except Exception as e:
+                output["error"] = f"{type(e).__name__}: {e}"
+                logger.warning("Replay of %s failed: %s", key, output["error"])
+        return output
+
+
+def diff_outputs(baseline: List[Dict[str, Any]], current: List[Dict[str, Any]], examples: int = 5) -> Dict[str, Any]:
+    """
+    How the outputs of two runs differ: per parsed field, in reply text
+    (with the mean similarity of changed replies), in delivery and in
+    errors, plus unified diffs of the first few changed replies.
+    """
+    before = {o["email"]: o for o in baseline}
+    fields: Dict[str, int] = defaultdict(int)
+    changed_replies, similarity, diffs = 0, [], []
+    sent = errors = compared = 0
+    for new in current:
+        old = before.get(new["email"])
+        if old is None:
+            continue
+        compared += 1
+        for field in set(old["parsed"] or {}) | set(new["parsed"] or {}):
+            if (old["parsed"] or {}).get(field) != (new["parsed"] or {}).get(field):
+                fields[field] += 1
+        sent += old["sent"] != new["sent"]
+        errors += old["error"] != new["error"]
+        if old["reply"] != new["reply"]:
+            changed_replies += 1
+            a, b = old["reply"] or "", new["reply"] or ""
+            similarity.append(difflib.SequenceMatcher(None, a, b).ratio())
+            if len(diffs) < examples:
+                diffs.append("\n".join(difflib.unified_diff(
+                    a.splitlines(), b.splitlines(), f"{new['email']} (baseline)", new["email"], lineterm=""
+                )))
+    return {
+        "compared": compared,
+        "only_in_one": len(before) + len(current) - 2 * compared,
+        "parsed_changed": dict(fields),
+        "replies_changed": changed_replies,
+        "reply_similarity": sum(similarity) / len(similarity) if similarity else 1.0,
+        "sent_changed": sent,
+        "errors_changed": errors,
+        "diffs": diffs,
+    }
+
+
+if __name__ == "__main__":
+    # python replay.py <corpus.jsonl.gz> [speed, 0 = no waits] [outputs.json] [baseline outputs.json]
+    logging.basicConfig(level=logging.WARNING)
+    corpus = Corpus.load(sys.argv[1])
+    speed = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    result = ReplayRunner(corpus).run(speed=speed or None)
+    report = result["report"]
+    print(f"{report['emails']} emails in {report['seconds']:.2f}s ({report['throughput']:.1f}/s), "
+          f"latency p50 {report['latency']['p50'] or 0:.3f}s p99 {report['latency']['p99'] or 0:.3f}s")
+    print(f"LLM responses: {report['llm']}, SMTP: {report['smtp']}")
+    if len(sys.argv) > 3:
+        with open(sys.argv[3], "wb") as f:
+            f.write(serialization.dumps_bytes(result["outputs"]))
+    if len(sys.argv) > 4:
+        with open(sys.argv[4], "rb") as f:
+            diff = diff_outputs(serialization.loads(f.read()), result["outputs"])
+        print(f"Compared {diff['compared']} emails: parsed fields changed {diff['parsed_changed']}, "
+              f"{diff['replies_changed']} replies changed (similarity {diff['reply_similarity']:.2f}), "
+              f"{diff['sent_changed']} deliveries and {diff['errors_changed']} errors changed")
+        for text in diff["diffs"]:
+            print(text)
@@ -1,74 +1,208 @@
 # reply_generator.py
 
-import openai
-from typing import Dict
-from dotenv import load_dotenv
-import os
-load_dotenv()
+import time
+import logging
+import itertools
+from contextlib import contextmanager
+import tracing
+import deadlines
+from typing import Dict, Iterator, List, Optional
+from token_budget import TokenBudget
+from prompts import REPLY_SYSTEM_PROMPT, REPLY_PROMPT_VERSION, reply_user_prompt
+from metrics import metrics, record_llm_usage
+from hedging import HedgedCaller, hedged
+from circuit_breaker import CircuitBreaker, guarded
+from config import configure_openai, lazy_import
 
-openai.api_key = os.environ.get("OPEN_AI_KEY")
+# Deferred until the first model call; see config.lazy_import()
+openai = lazy_import("openai")
+
+logger = logging.getLogger(__name__)
 
 class ReplyGenerator:
-    def __init__(self, model: str = "gpt-4o-mini"):
+    def __init__(
+        self,
+        model: str = "gpt-4o-mini",
+        budget: Optional[TokenBudget] = None,
+        hedger: Optional[HedgedCaller] = None,
+        timeout: Optional[float] = None,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        """
+        :param model: OpenAI chat model used to draft replies.
+        :param budget: Token budget for the prompt; defaults to TokenBudget(model=model).
+        :param hedger: Optional hedging.HedgedCaller for slow completions;
+                       streams are hedged on time to first token.
+        :param timeout: Seconds allowed per completion request, shortened
+                        to what is left of the email's deadline.
+        :param breaker: Optional circuit_breaker.CircuitBreaker for the LLM
+                        provider; while it is open generate() and stream()
+                        raise circuit_breaker.CircuitOpen without a request.
+        """
         self.model = model
-        self.system_prompt = (
-            "You are a professional property manager assistant. "
-            "Given a tenant's parsed request, context (account balances, lease dates, maintenance history) and the ticket id raised for the request, "
-            "draft a polite, clear, and concise email response. "
-            "Always:\n"
-            "  • Greet the tenant by their name.\n"
-            "  • Acknowledge their specific ask (from summary).\n"
-            "  • Reference any relevant context (e.g., rent balance, lease end date, past tickets).\n"
-            "  • Explain next steps (e.g., we will schedule maintenance, or here is how to pay due rent).\n"
-            "  • State that a ticket with ticket id has been raised for their reference.\n"
-            "  • Sign off with Domos Property Management Team.\n"
-            "Respond *only* with the email body (no extra JSON or markup)."
-        )
+        self.hedger = hedger
+        self.timeout = timeout
+        self.breaker = breaker
+        self.budget = budget or TokenBudget(model=model)
+        self.system_prompt = REPLY_SYSTEM_PROMPT
+        self.prompt_version = REPLY_PROMPT_VERSION
+        configure_openai()
 
-    def generate(self, parsed: Dict[str, str], context: Dict[str, any], ticket_id: str) -> str:
+    @tracing.traced("reply.generate")
+    def generate(
+        self,
+        parsed: Dict[str, str],
+        context: Dict[str, any],
+        ticket_id: str,
+        stream: bool = False
+    ) -> str:
         """
         :param parsed: Output of EmailParser.parse(), with keys like
                        tenant_name, address, request_type, summary, full_body.
         :param context: Output of ContextLoader.load(), with keys rent_balance,
                         lease_end_date, maintenance_history, etc.
+        :param stream: If True, consume the completion as a token stream
+                       (see stream()) instead of waiting for one response.
         :return: The drafted reply as a plain string.
         """
-        # Build a structured user prompt that includes both parsed fields and context.
-        user_prompt = f"""
-Parsed Request:
-  Tenant: {parsed['tenant_name']}
-  Address: {parsed['address']}
-  Type: {parsed['request_type']}
-  Summary: {parsed['summary']}
-
-Ticket Id:
-{ticket_id}
-
-Full Message:
-{parsed['full_body']}
-
-Context:
-  Rent Balance: {context['rent_balance']}
-  Lease Ends: {context['lease_end_date']}
-  Maintenance History:
-"""
-
-        for ticket in context["maintenance_history"]:
-            user_prompt += (
-                f"    - {ticket['date']}: {ticket['issue']} "
-                f"({ticket['status']}, id {ticket['id']})\n"
+        if stream:
+            return "".join(self.stream(parsed, context, ticket_id)).strip()
+
+        messages = self._build_messages(parsed, context, ticket_id)
+        options = self._options()
+        start = time.perf_counter()
+        with self._deadline_errors():
+            resp = guarded(self.breaker, lambda: hedged(self.hedger, "reply", lambda: openai.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.7,
+                max_completion_tokens=500,
+                **options
+            )))
+        usage = record_llm_usage("reply", resp, time.perf_counter() - start)
+        if usage:
+            logger.info(
+                "Reply call for ticket %s: %d prompt tokens, %d cached",
+                ticket_id, usage["prompt_tokens"], usage["cached_tokens"]
             )
 
-        user_prompt += "\nDraft a response email using this information."
+        return resp.choices[0].message.content.strip()
+
+    def stream(self, parsed: Dict[str, str], context: Dict[str, any], ticket_id: str) -> Iterator[str]:
+        """
+        Yield the reply text as it is generated, for callers that can use
+        partial text. The pipeline does not: replies are stored whole in
+        the outbox, whose background sender already overlaps delivery with
+        generation. Time to first token is recorded separately from the
+        total latency.
+        """
+        messages = self._build_messages(parsed, context, ticket_id)
+        options = self._options()
+        start = time.perf_counter()
+        first_token = None
+        last = None
+        if self.breaker is not None:
+            self.breaker.check()
+        # The whole read is one call for the breaker and the deadline: a
+        # stream can time out or drop between chunks as well as on opening
+        with self._deadline_errors():
+            try:
+                _, chunks = hedged(
+                    self.hedger, "reply.stream", lambda: self._open_stream(messages, options), discard=_close_stream
+                )
+                for chunk in chunks:
+                    last = chunk
+                    if not chunk.choices:
+                        # Final usage-only chunk
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        if first_token is None:
+                            first_token = time.perf_counter() - start
+                            metrics.observe("llm.reply.first_token", first_token)
+                        yield delta
+            except BaseException as e:
+                # A caller that stops reading early (GeneratorExit) is not
+                # a provider failure; record() leaves that to is_failure
+                if self.breaker is not None:
+                    self.breaker.record(e)
+                raise
+        if self.breaker is not None:
+            self.breaker.record()
+
+        usage = record_llm_usage("reply", last, time.perf_counter() - start)
+        logger.info(
+            "Streamed reply for ticket %s: first token %.2fs, total %.2fs, %d cached tokens",
+            ticket_id, first_token or 0.0, time.perf_counter() - start,
+            usage.get("cached_tokens", 0)
+        )
 
-        resp = openai.chat.completions.create(
+    def _options(self) -> Dict[str, float]:
+        # Computed once per call, so a hedged duplicate (which runs in a
+        # copy of this context, see hedging.py) gets the same timeout
+        timeout = deadlines.timeout_for(self.timeout)
+        return {} if timeout is None else {"timeout": timeout}
+
+    @staticmethod
+    @contextmanager
+    def _deadline_errors() -> Iterator[None]:
+        """
+        Report a timeout caused by the email's deadline running out as
+        deadlines.DeadlineExceeded, so callers can fall back to a template.
+        """
+        try:
+            yield
+        except openai.APITimeoutError as e:
+            if deadlines.expired():
+                raise deadlines.DeadlineExceeded("reply") from e
+            raise
+
+    def _open_stream(self, messages: List[Dict[str, str]], options: Dict[str, float]):
+        stream = openai.chat.completions.create(
             model=self.model,
-            messages=[
-                {"role": "system",  "content": self.system_prompt},
-                {"role": "user",    "content": user_prompt},
-            ],
+            messages=messages,
             temperature=0.7,
             max_completion_tokens=500,
+            stream=True,
+            stream_options={"include_usage": True},
+            **options
         )
+        chunks = iter(stream)
+        # Waiting for the first chunk here makes a hedged stream race on
+        # time to first token rather than on the response headers
+        first = next(chunks, None)
+        return stream, itertools.chain(() if first is None else (first,), chunks)
 
-        return resp.choices[0].message.content.strip()
+    def _build_messages(
+        self,
+        parsed: Dict[str, str],
+        context: Dict[str, any],
+        ticket_id: str
+    ) -> List[Dict[str, str]]:
+        # Build a structured user prompt that includes both parsed fields and context,
+        # compacting the body and history so the prompt stays under budget.
+        def render(body: str, history: List[Dict[str, any]]) -> str:
+            return reply_user_prompt(parsed, context, ticket_id, body, history)
+
+        user_prompt, prompt_tokens = self.budget.fit(
+            self.system_prompt,
+            parsed["full_body"],
+            context["maintenance_history"],
+            render,
+            query=parsed["summary"],
+        )
+        logger.info(
+            "Reply prompt (%s) for ticket %s: %d tokens (budget %d)",
+            self.prompt_version, ticket_id, prompt_tokens, self.budget.max_prompt_tokens
+        )
+        return [
+            {"role": "system",  "content": self.system_prompt},
+            {"role": "user",    "content": user_prompt},
+        ]
+
+
+def _close_stream(opened) -> None:
+    # The losing stream of a hedged pair: stop reading its response
+    close = getattr(opened[0], "close", None)
+    if close is not None:
+        close()
@@ -0,0 +1,298 @@
+# reply_templates.py
+
+import re
+import logging
+from string import Template
+from typing import Any, Dict, Optional, Tuple
+
+import deadlines
+from metrics import metrics
+from workflow import WorkflowTrigger
+
+logger = logging.getLogger(__name__)
+
+_SIGN_OFF = "\n\nBest regards,\nDomos Property Management Team"
+_TICKET_LINE = "\n\nA ticket with id $ticket_id has been raised for your reference."
+
+
+class TemplateEngine:
+    """
+    Renders routine replies locally from precompiled string templates,
+    keyed by (request_type, action_type).
+    """
+    TEMPLATES: Dict[Tuple[str, str], str] = {
+        ("payment", "payment_reminder"): (
+            "Hi $tenant_name,\n\n"
+            "Thank you for reaching out about your rent. "
+            "Your current balance is $rent_balance. "
+            "You can pay through the tenant portal, or reply to this email "
+            "if you would like to arrange a payment plan."
+            + _TICKET_LINE + _SIGN_OFF
+        ),
+        ("lease", "lease_info_request"): (
+            "Hi $tenant_name,\n\n"
+            "Thank you for your question about your lease. "
+            "Your current lease ends on $lease_end_date. "
+            "If you would like to discuss renewal options, just reply to this email "
+            "and we will get back to you with the details."
+            + _TICKET_LINE + _SIGN_OFF
+        ),
+        ("maintenance", "maintenance_ticket"): (
+            "Hi $tenant_name,\n\n"
+            "Thank you for letting us know: \"$summary\". "
+            "We have logged this as a maintenance request and our team will "
+            "contact you shortly to schedule a visit."
+            + _TICKET_LINE + _SIGN_OFF
+        ),
+    }
+
+    STATUS_TEMPLATE = (
+        "Hi $tenant_name,\n\n"
+        "Thanks for following up on ticket $status_ticket_id ($status_summary). "
+        "It was raised on $status_created and its current status is: $status. "
+        "We will let you know as soon as there is any change."
+        + _TICKET_LINE + _SIGN_OFF
+    )
+    # $tenant_name and $ticket_id are filled in per tenant by IncidentReplier
+    INCIDENT_TEMPLATE = (
+        "Hi $$tenant_name,\n\n"
+        "Thank you for your report. We are aware of the $issue issue affecting "
+        "$building and are treating it as a building-wide incident. Our team is "
+        "already working on it and we will send an update as soon as it is resolved."
+        + _TICKET_LINE.replace("$", "$$") + _SIGN_OFF
+    )
+    # Fallback when there is no time left for a model call
+    ACK_TEMPLATE = (
+        "Hi $tenant_name,\n\n"
+        "Thank you for your email. We have received your message about \"$summary\" "
+        "and a member of our team will get back to you shortly."
+        + _TICKET_LINE + _SIGN_OFF
+    )
+    STATUS_LABELS = {
+        "pending": "pending, waiting to be picked up by our team",
+        "open": "open",
+        "in_progress": "in progress",
+        "resolved": "resolved",
+    }
+
+    def __init__(self, templates: Optional[Dict[Tuple[str, str], str]] = None):
+        source = templates if templates is not None else self.TEMPLATES
+        self._templates = {key: Template(text) for key, text in source.items()}
+        self._status_template = Template(self.STATUS_TEMPLATE)
+        self._incident_template = Template(self.INCIDENT_TEMPLATE)
+        self._ack_template = Template(self.ACK_TEMPLATE)
+
+    def has_template(self, request_type: str, action_type: str) -> bool:
+        return (request_type, action_type) in self._templates
+
+    def render(
+        self,
+        parsed: Dict[str, Any],
+        context: Dict[str, Any],
+        ticket_id: str,
+        action_type: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        :return: The rendered reply, or None if no template matches.
+        """
+        request_type = parsed.get("request_type", "general")
+        action_type = action_type or WorkflowTrigger.action_type_for(request_type)
+        template = self._templates.get((request_type, action_type))
+        if template is None:
+            return None
+        return template.safe_substitute(
+            tenant_name=parsed.get("tenant_name") or "there",
+            summary=parsed.get("summary", ""),
+            address=parsed.get("address") or "",
+            rent_balance=context.get("rent_balance", ""),
+            lease_end_date=context.get("lease_end_date", ""),
+            ticket_id=ticket_id,
+        )
+
+    def render_status(self, parsed: Dict[str, Any], item: Dict[str, Any], ticket_id: str) -> str:
+        """
+        Render a status update for an existing action item.
+        """
+        status = item.get("status") or "pending"
+        return self._status_template.safe_substitute(
+            tenant_name=parsed.get("tenant_name") or "there",
+            status_ticket_id=item["id"],
+            status_summary=item.get("summary") or item.get("action_type", ""),
+            status_created=(item.get("created_at") or "")[:10],
+            status=self.STATUS_LABELS.get(status, status),
+            ticket_id=ticket_id,
+        )
+
+    def render_ack(self, parsed: Dict[str, Any], ticket_id: str) -> str:
+        """
+        Render a plain acknowledgement, for any request type.
+        """
+        return self._ack_template.safe_substitute(
+            tenant_name=parsed.get("tenant_name") or "there",
+            summary=parsed.get("summary") or "your request",
+            ticket_id=ticket_id,
+        )
+
+    def incident_template(self, issue: str, building: str) -> str:
+        """
+        Incident reply with $tenant_name and $ticket_id still unfilled.
+        """
+        return self._incident_template.substitute(
+            issue=issue,
+            building=building.replace("$", "$$"),
+        )
+
+
+class TemplatePolicy:
+    """
+    Decides whether a templated reply is good enough for a request.
+
+    Only short, single-topic questions are templated; anything that
+    reads like a dispute, an emergency or a negotiation goes to the LLM.
+    """
+    _ROUTINE = {
+        "payment": re.compile(r"\b(balance|how much|owe|due|rent amount|monthly rent|pay)\b"),
+        "lease": re.compile(r"\b(lease (end|expire)|when does my lease|end date|expir)"),
+        "maintenance": re.compile(r"\b(leak|clog|broken|repair|fix|not working|lock|toilet|sink|heater)"),
+    }
+    _ESCALATE = re.compile(
+        r"\b(dispute\w*|wrong|refund\w*|charged twice|waive\w*|lawyer|legal|complain\w*|"
+        r"won't send|will not send|not going to send|withh(o|e)ld\w*|"
+        r"renew\w*|terminat\w*|break my lease|sublet\w*|"
+        r"emergency|urgent\w*|flood\w*|fire|smoke|smoking|gas|sparks?|sparking|no heat|ceiling)\b",
+    )
+    _STATUS_QUERY = re.compile(r"\b(update|status|progress|any news|follow(ing)? up|still waiting)\b")
+
+    def __init__(self, max_body_words: int = 80):
+        """
+        :param max_body_words: Longer messages always go to the LLM.
+        """
+        self.max_body_words = max_body_words
+
+    def use_template(self, parsed: Dict[str, Any], context: Dict[str, Any]) -> bool:
+        body = (parsed.get("full_body") or "").lower()
+        routine = self._ROUTINE.get(parsed.get("request_type"))
+        if routine is None or not body:
+            return False
+        if len(body.split()) > self.max_body_words:
+            return False
+        if self._ESCALATE.search(body):
+            return False
+        return bool(routine.search(body))
+
+    def is_status_query(self, parsed: Dict[str, Any]) -> bool:
+        body = (parsed.get("full_body") or "").lower()
+        if len(body.split()) > self.max_body_words or self._ESCALATE.search(body):
+            # A follow-up that reports something new or urgent needs a real reply
+            return False
+        return bool(self._STATUS_QUERY.search(body))
+
+
+class ReplyRouter:
+    """
+    Serves replies from templates when the policy allows and falls back
+    to the ReplyGenerator otherwise.
+
+    When the email's deadline (see deadlines.py) leaves too little time
+    for a model call, or runs out during one, the reply degrades to the
+    request's template regardless of the policy, or to an acknowledgement.
+    """
+    def __init__(
+        self,
+        generator,
+        engine: Optional[TemplateEngine] = None,
+        policy: Optional[TemplatePolicy] = None,
+        index=None,
+        incidents=None,
+        min_llm_seconds: float = 5.0
+    ):
+        """
+        :param generator: A ReplyGenerator (anything with generate()).
+        :param index: Optional ActionItemIndex used to answer ticket status
+                      questions without a model call.
+        :param incidents: Optional IncidentReplier; requests linked to a
+                          building-wide incident share one reply.
+        :param min_llm_seconds: Degrade instead of calling the model with
+                                less than this left of the deadline.
+        """
+        self.generator = generator
+        self.engine = engine or TemplateEngine()
+        self.policy = policy or TemplatePolicy()
+        self.index = index
+        self.incidents = incidents
+        self.min_llm_seconds = min_llm_seconds
+
+    def reply(
+        self,
+        parsed: Dict[str, Any],
+        context: Dict[str, Any],
+        ticket_id: str,
+        action_type: Optional[str] = None,
+        stream: bool = False
+    ) -> str:
+        status_reply = self._status_reply(parsed, ticket_id)
+        if status_reply is not None:
+            metrics.incr("reply.template")
+            logger.info("Served ticket status reply for ticket %s", ticket_id)
+            return status_reply
+
+        if self.incidents is not None:
+            reply = self.incidents.reply(parsed, ticket_id)
+            if reply is not None:
+                metrics.incr("reply.incident")
+                logger.info("Served incident reply for ticket %s", ticket_id)
+                return reply
+
+        if self.policy.use_template(parsed, context):
+            reply = self.engine.render(parsed, context, ticket_id, action_type)
+            if reply is not None:
+                metrics.incr("reply.template")
+                logger.info("Served templated reply for ticket %s", ticket_id)
+                return reply
+
+        if not deadlines.has_time("reply", self.min_llm_seconds):
+            return self._degraded_reply(parsed, context, ticket_id, action_type)
+        try:
+            reply = self.generator.generate(parsed, context, ticket_id, stream=stream)
+        except deadlines.DeadlineExceeded:
+            return self._degraded_reply(parsed, context, ticket_id, action_type)
+        metrics.incr("reply.llm")
+        return reply
+
+    def _degraded_reply(
+        self,
+        parsed: Dict[str, Any],
+        context: Dict[str, Any],
+        ticket_id: str,
+        action_type: Optional[str]
+    ) -> str:
+        reply = self.engine.render(parsed, context, ticket_id, action_type)
+        metrics.incr("reply.degraded")
+        logger.warning("Out of time for ticket %s, sending a %s reply", ticket_id,
+                       "templated" if reply is not None else "acknowledgement")
+        return reply if reply is not None else self.engine.render_ack(parsed, ticket_id)
+
+    def _status_reply(self, parsed: Dict[str, Any], ticket_id: str) -> Optional[str]:
+        if self.index is None or not self.policy.is_status_query(parsed):
+            return None
+        text = f"{parsed.get('subject') or ''} {parsed.get('full_body') or ''}"
+        tenant = (parsed.get("tenant_name") or "").casefold()
+        for referenced in self.index.find_ticket_ids(text):
+            item = self.index.get(referenced)
+            # Only disclose tickets raised for the same tenant
+            if referenced != ticket_id and (item.get("tenant_name") or "").casefold() == tenant:
+                return self.engine.render_status(parsed, item, ticket_id)
+        return None
+
+    @staticmethod
+    def template_fraction() -> float:
+        """
+        Fraction of replies served without a model call in this process.
+        Incident replies count, except the one per incident whose text
+        the model wrote.
+        """
+        local = metrics.counter("reply.template") + metrics.counter("reply.degraded") \
+            + metrics.counter("reply.incident")
+        total = local + metrics.counter("reply.llm")
+        templated = local - metrics.counter("incidents.replies_generated")
+        return templated / total if total else 0.0
@@ -3,9 +3,10 @@
 import re
 from dataclasses import dataclass
 from email.utils import parseaddr
-from typing import Optional, Dict
+from typing import Optional, Dict, FrozenSet, Tuple
+from addresses import AddressResolver
 
-@dataclass
+@dataclass(slots=True)
 class ParsedEmail:
     uid: str
     tenant_name: str
@@ -15,9 +16,12 @@ class ParsedEmail:
     date: str
     summary: str
     full_body: str
+    address_key: Optional[str] = None
 
 class EmailParser:
-    def __init__(self):
+    def __init__(self, resolver: Optional[AddressResolver] = None):
+        # Optional property registry lookup for full, canonical addresses
+        self.resolver = resolver
         # Precompile regexes and keyword sets once
         self._apt_regex = re.compile(r'(?:Apartment|Apt|Unit)\s*#?\s*(\w+)', re.IGNORECASE)
         self._kw = {
@@ -33,8 +37,8 @@ class EmailParser:
         }
 
     def parse(self, msg: Dict[str, str]) -> ParsedEmail:
-        tenant_name = self._parse_name(msg["sender"])
-        address   = self._parse_address(msg["body"])
+        tenant_name = self.parse_name(msg["sender"])
+        address, address_key = self._parse_address(msg["body"])
         request_type= self._classify_request(msg["body"])
         summary     = self._extract_summary(msg["body"])
 
@@ -46,22 +50,37 @@ class EmailParser:
             subject     = msg.get("subject", ""),
             date        = msg.get("date", ""),
             summary     = summary,
-            full_body   = msg.get("body", "")
+            full_body   = msg.get("body", ""),
+            address_key = address_key
         )
 
-    def _parse_name(self, raw_from: str) -> str:
+    @property
+    def keywords(self) -> Dict[str, FrozenSet[str]]:
+        """
+        Keywords per request type, in the order categories are tried.
+        """
+        return {category: frozenset(kws) for category, kws in self._kw.items()}
+
+    def parse_name(self, raw_from: str) -> str:
         """
         Extract display name or fallback to local-part of email.
         """
         name, email_addr = parseaddr(raw_from)
         return name or email_addr.split("@")[0]
 
-    def _parse_address(self, body: str) -> Optional[str]:
+    def _parse_address(self, body: str) -> Tuple[Optional[str], Optional[str]]:
         """
-        Look for "Apartment/Unit #X" patterns in the body.
+        Look for a registry address in the body, else for
+        "Apartment/Unit #X" patterns.
+
+        :return: (address, registry key or None)
         """
+        if self.resolver is not None:
+            found = self.resolver.find(body)
+            if found is not None:
+                return found.address, found.key
         m = self._apt_regex.search(body)
-        return m.group(1) if m else None
+        return (m.group(1) if m else None), None
 
     def _classify_request(self, body: str) -> str:
         """
@@ -1,10 +1,16 @@
 # sender.py
 
+import ssl
 import smtplib
-from logger import logger
+import logging
 import time
+import tracing
+import deadlines
 from email.message import EmailMessage
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
+from circuit_breaker import CircuitBreaker, CircuitOpen
+
+logger = logging.getLogger(__name__)
 
 
 class EmailSender:
@@ -19,7 +25,13 @@ class EmailSender:
         username: str,
         password: str,
         max_retries: int = 3,
-        retry_delay: float = 2.0
+        retry_delay: float = 2.0,
+        use_ssl: bool = True,
+        ssl_context: Optional[ssl.SSLContext] = None,
+        allow_plaintext: bool = False,
+        timeout: float = 30.0,
+        breaker: Optional[CircuitBreaker] = None,
+        recorder=None
     ):
         """
         :param smtp_host: e.g. "smtp.gmail.com"
@@ -27,6 +39,17 @@ class EmailSender:
         :param username: SMTP login (also used as default From address)
         :param password: SMTP password or app-specific token
         :param use_ssl:  If True, uses SMTP_SSL; otherwise, uses STARTTLS.
+        :param ssl_context: Optional context, e.g. one trusting a test certificate.
+        :param allow_plaintext: With use_ssl=False, log in and send without
+                                TLS when the server does not offer STARTTLS,
+                                instead of refusing. Only for local test servers.
+        :param timeout: SMTP socket timeout in seconds, shortened to the
+                        current email's deadline (see deadlines.py).
+        :param breaker: Optional circuit_breaker.CircuitBreaker for the relay;
+                        while it is open sends fail at once, without
+                        connecting or sleeping between retries.
+        :param recorder: Optional replay.Recorder; every SMTP transaction
+                         (message, outcome, latency) is added to its corpus.
         """
         self.smtp_host = smtp_host
         self.smtp_port = smtp_port
@@ -34,7 +57,34 @@ class EmailSender:
         self.password = password
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        self.use_ssl = use_ssl
+        self.ssl_context = ssl_context
+        self.allow_plaintext = allow_plaintext
+        self.timeout = timeout
+        self.breaker = breaker
+        self.recorder = recorder
+
+    def _connect(self) -> smtplib.SMTP:
+        timeout = deadlines.timeout_for(self.timeout)
+        if self.use_ssl:
+            kwargs = {"context": self.ssl_context} if self.ssl_context else {}
+            smtp = smtplib.SMTP_SSL(self.smtp_host, self.smtp_port, timeout=timeout, **kwargs)
+        else:
+            smtp = smtplib.SMTP(self.smtp_host, self.smtp_port, timeout=timeout)
+            smtp.ehlo()
+            if smtp.has_extn("starttls"):
+                smtp.starttls(context=self.ssl_context)
+                smtp.ehlo()
+            elif not self.allow_plaintext:
+                # Never send the password over an unencrypted connection
+                smtp.close()
+                raise smtplib.SMTPNotSupportedError(
+                    f"{self.smtp_host} does not offer STARTTLS; pass allow_plaintext=True to send without TLS"
+                )
+        smtp.login(self.username, self.password)
+        return smtp
 
+    @tracing.traced("smtp.send")
     def send_email(
         self,
         to: List[str],
@@ -42,7 +92,143 @@ class EmailSender:
         body: str,
         from_addr: Optional[str] = None,
         cc: Optional[List[str]] = None
-    ) -> None:
+    ) -> bool:
+        """
+        Send a plain-text email.
+
+        Retries in place with exponential backoff. The pipeline sends
+        through outbox.Outbox instead, which retries in the background.
+
+        :return: True if the email was sent, False if every attempt failed.
+        """
+        msg, recipients = self._build_message(to, subject, body, from_addr, cc)
+        attempts = self.max_retries
+
+        for attempt in range(1, attempts + 1):
+            error = self._attempt(msg, recipients, attempt, attempts)
+            if error is None:
+                return True
+            if not self.available():
+                # Retrying into an open circuit would only sleep
+                break
+
+            # if not last attempt, wait before retrying
+            if attempt < attempts:
+                backoff = self.retry_delay * (2 ** (attempt - 1))
+                logger.info("Waiting %.1f seconds before retrying...", backoff)
+                time.sleep(backoff)
+
+        # All retries failed, or the circuit opened
+        logger.error(
+            "Giving up on email to %s after %d of %d attempts.",
+            recipients, attempt, attempts
+        )
+        return False
+
+    def available(self) -> bool:
+        """
+        False while the relay's circuit is open.
+        """
+        return self.breaker is None or self.breaker.available()
+
+    def deliver(self, entry: Dict[str, Any]) -> bool:
+        """
+        Make one attempt for a queued outbox entry.
+        """
+        msg, recipients = self._build_message(
+            entry["to"], entry["subject"], entry["body"], entry.get("from_addr"), entry.get("cc"),
+            entry.get("message_id")
+        )
+        return self._attempt(msg, recipients, entry["attempts"] + 1) is None
+
+    def deliver_batch(self, entries: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """
+        Send several queued entries over one SMTP connection, reconnecting
+        after a failure. Returns None per delivered entry, else the error text.
+
+        Stops at the first entry the circuit breaker rejects: the result
+        list then only covers the entries before it, and the rest were not
+        attempted.
+        """
+        results: List[Optional[str]] = []
+        smtp = None
+        for entry in entries:
+            try:
+                self._check_circuit()
+            except CircuitOpen as e:
+                logger.warning("Stopping batch after %d/%d emails: %s", len(results), len(entries), e)
+                break
+            msg, recipients = self._build_message(
+                entry["to"], entry["subject"], entry["body"], entry.get("from_addr"), entry.get("cc"),
+                entry.get("message_id")
+            )
+            span = tracing.tracer.start("smtp.send", entry.get("traceparent"), batched=True)
+            try:
+                if smtp is None:
+                    smtp = self._connect()
+                self._send(smtp, msg, recipients)
+                self._record(None)
+                results.append(None)
+            except Exception as e:
+                self._record(e)
+                span.error = str(e)
+                logger.warning(
+                    "Attempt %d failed to send email to %s: %s",
+                    entry.get("attempts", 0) + 1, recipients, e
+                )
+                results.append(str(e))
+                smtp = self._discard(smtp)
+            finally:
+                tracing.tracer.end(span)
+        if smtp is not None:
+            try:
+                smtp.quit()
+            except Exception as e:
+                logger.debug("Ignoring error on SMTP quit: %s", e)
+        logger.info(
+            "Sent %d/%d emails over one connection",
+            results.count(None), len(results)
+        )
+        return results
+
+    def _send(self, smtp: smtplib.SMTP, msg: EmailMessage, recipients: List[str]) -> None:
+        if self.recorder is None:
+            smtp.send_message(msg, from_addr=msg["From"], to_addrs=recipients)
+            return
+        start = time.perf_counter()
+        try:
+            smtp.send_message(msg, from_addr=msg["From"], to_addrs=recipients)
+        except Exception as e:
+            self.recorder.smtp(msg, recipients, e, time.perf_counter() - start)
+            raise
+        self.recorder.smtp(msg, recipients, None, time.perf_counter() - start)
+
+    def _check_circuit(self) -> None:
+        if self.breaker is not None:
+            self.breaker.check()
+
+    def _record(self, error: Optional[BaseException]) -> None:
+        # Rejections by the breaker itself are not outcomes
+        if self.breaker is not None and not isinstance(error, CircuitOpen):
+            self.breaker.record(error)
+
+    def _discard(self, smtp) -> None:
+        if smtp is not None:
+            try:
+                smtp.close()
+            except Exception:
+                pass
+        return None
+
+    def _build_message(
+        self,
+        to: List[str],
+        subject: str,
+        body: str,
+        from_addr: Optional[str],
+        cc: Optional[List[str]],
+        message_id: Optional[str] = None
+    ) -> Tuple[EmailMessage, List[str]]:
         msg = EmailMessage()
         msg.set_content(body)
         msg["Subject"] = subject
@@ -50,42 +236,56 @@ class EmailSender:
         msg["To"]      = ", ".join(to)
         if cc:
             msg["Cc"] = ", ".join(cc)
+        if message_id:
+            # Stable Message-ID so a resend of the same reply can be deduplicated
+            domain = (self.username or "").rpartition("@")[2] or "localhost"
+            msg["Message-ID"] = f"<{message_id[:32]}@{domain}>"
 
         # Full list of recipients for send_message()
         recipients = to + (cc if cc else [])
-        for attempt in range(1, self.max_retries + 1):
-            try:
-                smtp = smtplib.SMTP_SSL(self.smtp_host, self.smtp_port)
-                smtp.login(self.username, self.password)
-                smtp.send_message(msg, from_addr=msg["From"], to_addrs=recipients)
-                smtp.quit()
-                
-                logger.info(
-                        "Email sent to %s (attempt %d)",
-                        recipients, attempt
-                    )
-                return
-            except smtplib.SMTPException as e:
-                logger.warning(
-                    "Attempt %d/%d failed to send email to %s: %s",
-                    attempt, self.max_retries, recipients, e
-                )
-            except Exception as e:
-                logger.error(
-                    "Unexpected error on attempt %d sending to %s: %s",
-                    attempt, recipients, e, exc_info=True
-                )
+        return msg, recipients
 
-            # if not last attempt, wait before retrying
-            if attempt < self.max_retries:
-                backoff = self.retry_delay * (2 ** (attempt - 1))
-                logger.info("Waiting %.1f seconds before retrying...", backoff)
-                time.sleep(backoff)
-
-        # All retries failed
-        logger.error(
-            "All %d attempts to send email to %s have failed.",
-            self.max_retries, recipients
-        )
+    def _attempt(
+        self,
+        msg: EmailMessage,
+        recipients: List[str],
+        attempt: int,
+        attempts: Optional[int] = None
+    ) -> Optional[str]:
+        """
+        Try to send once. Returns None on success, otherwise the error text.
 
+        :param attempts: Attempts this call is one of, for the log; None
+                         when the caller (the outbox) decides on retries.
+        """
+        label = f"{attempt}/{attempts}" if attempts else str(attempt)
+        try:
+            self._check_circuit()
+        except CircuitOpen as e:
+            logger.warning("Not sending email to %s: %s", recipients, e)
+            return str(e)
+        try:
+            smtp = self._connect()
+            self._send(smtp, msg, recipients)
+            smtp.quit()
+            self._record(None)
 
+            logger.info(
+                    "Email sent to %s (attempt %d)",
+                    recipients, attempt
+                )
+            return None
+        except smtplib.SMTPException as e:
+            self._record(e)
+            logger.warning(
+                "Attempt %s failed to send email to %s: %s",
+                label, recipients, e
+            )
+            return str(e)
+        except Exception as e:
+            self._record(e)
+            logger.error(
+                "Unexpected error on attempt %d sending to %s: %s",
+                attempt, recipients, e, exc_info=True
+            )
+            return str(e)
@@ -0,0 +1,34 @@
+# serialization.py
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can
+# keep catching the stdlib exception whichever backend is active.
+JSONDecodeError = json.JSONDecodeError
+
+
+def dumps_bytes(obj: Any, compact: bool = False) -> bytes:
+    """
+    Serialise `obj` to UTF-8 JSON bytes, indented by 2 unless `compact`.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=0 if compact else orjson.OPT_INDENT_2)
+    if compact:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+
+
+def dumps(obj: Any, compact: bool = False) -> str:
+    return dumps_bytes(obj, compact).decode("utf-8")
+
+
+def loads(data: str | bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
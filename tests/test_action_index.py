@@ -0,0 +1,124 @@
+# tests/test_action_index.py
+
+import json
+
+import pytest
+
+from action_index import ActionItemIndex
+from reply_templates import ReplyRouter
+
+
+def make_item(item_id, tenant="Alice", assignee="Bob", status="pending", created="2025-07-15T10:00:00+00:00Z"):
+    return {
+        "id": item_id,
+        "created_at": created,
+        "action_type": "maintenance_ticket",
+        "tenant_name": tenant,
+        "address": "1 Main St",
+        "subject": None,
+        "summary": "Sink leaking",
+        "request_type": "maintenance",
+        "context": {},
+        "status": status,
+        "asignee": assignee,
+    }
+
+
+def write(directory, item):
+    (directory / f"{item['id']}.json").write_text(json.dumps(item))
+
+
+@pytest.fixture
+def store(tmp_path):
+    write(tmp_path, make_item("aaaaaaaaa1", created="2025-07-14T09:00:00+00:00Z"))
+    write(tmp_path, make_item("aaaaaaaaa2", tenant="Carol", status="resolved", created="2025-07-15T09:00:00+00:00Z"))
+    write(tmp_path, make_item("aaaaaaaaa3", assignee="Dan", created="2025-07-16T09:00:00+00:00Z"))
+    return tmp_path
+
+
+def test_loads_and_indexes_store(store):
+    index = ActionItemIndex(str(store))
+    assert len(index) == 3
+    assert index.get("aaaaaaaaa2")["tenant_name"] == "Carol"
+    assert [i["id"] for i in index.by_tenant(" alice ")] == ["aaaaaaaaa3", "aaaaaaaaa1"]
+    assert [i["id"] for i in index.by_assignee("dan")] == ["aaaaaaaaa3"]
+    assert [i["id"] for i in index.by_status("resolved")] == ["aaaaaaaaa2"]
+
+
+def test_date_range_and_pagination(store):
+    index = ActionItemIndex(str(store))
+    assert [i["id"] for i in index.in_range("2025-07-15", "2025-07-16")] == ["aaaaaaaaa2"]
+
+    first = index.page(limit=2)
+    assert [i["id"] for i in first["items"]] == ["aaaaaaaaa3", "aaaaaaaaa2"]
+    assert first["total"] == 3 and first["next_offset"] == 2
+    second = index.page(offset=2, limit=2)
+    assert [i["id"] for i in second["items"]] == ["aaaaaaaaa1"]
+    assert second["next_offset"] is None
+
+    filtered = index.page(tenant_name="Alice", status="pending", start="2025-07-15")
+    assert [i["id"] for i in filtered["items"]] == ["aaaaaaaaa3"]
+
+
+def test_incremental_updates(store):
+    index = ActionItemIndex(str(store))
+    index.add(make_item("aaaaaaaaa1", status="resolved", created="2025-07-14T09:00:00+00:00Z"))
+    assert [i["id"] for i in index.by_status("resolved")] == ["aaaaaaaaa2", "aaaaaaaaa1"]
+    assert len(index.in_range()) == 3
+
+    write(store, make_item("bbbbbbbbb1", tenant="Erin"))
+    assert index.refresh() == 1
+    assert index.by_tenant("erin")[0]["id"] == "bbbbbbbbb1"
+    assert index.refresh() == 0
+
+
+def test_add_after_in_place_update_drops_stale_entries(store):
+    index = ActionItemIndex(str(store))
+    item = index.get("aaaaaaaaa1")
+    item["status"] = "resolved"
+    item["asignee"] = "Dan"
+    index.add(item)
+    assert [i["id"] for i in index.by_status("pending")] == ["aaaaaaaaa3"]
+    assert [i["id"] for i in index.by_assignee("bob")] == ["aaaaaaaaa2"]
+    assert [i["id"] for i in index.by_assignee("dan")] == ["aaaaaaaaa3", "aaaaaaaaa1"]
+    assert len(index.in_range()) == 3
+
+
+def test_find_ticket_ids_only_returns_known(store):
+    index = ActionItemIndex(str(store))
+    assert index.find_ticket_ids("About aaaaaaaaa3 and 0123456789") == ["aaaaaaaaa3"]
+
+
+def test_router_answers_status_queries_from_index(store):
+    class NoLLM:
+        def generate(self, *args, **kwargs):
+            raise AssertionError("status replies must not call the model")
+
+    router = ReplyRouter(NoLLM(), index=ActionItemIndex(str(store)))
+    parsed = {
+        "tenant_name": "Alice",
+        "address": None,
+        "request_type": "maintenance",
+        "summary": "Any update?",
+        "full_body": "Any update on ticket aaaaaaaaa1?",
+    }
+    reply = router.reply(parsed, {}, "ccccccccc1")
+    assert "aaaaaaaaa1" in reply
+    assert "pending" in reply
+    assert "ccccccccc1" in reply
+
+
+def test_router_sends_urgent_follow_ups_to_the_model(store):
+    class LLM:
+        def generate(self, parsed, context, ticket_id, **kwargs):
+            return f"Sending someone now, ticket {ticket_id}"
+
+    router = ReplyRouter(LLM(), index=ActionItemIndex(str(store)))
+    parsed = {
+        "tenant_name": "Alice",
+        "address": None,
+        "request_type": "maintenance",
+        "summary": "Any update?",
+        "full_body": "Any update on my ticket aaaaaaaaa1? Water is now pouring through the ceiling",
+    }
+    assert router.reply(parsed, {}, "ccccccccc1") == "Sending someone now, ticket ccccccccc1"
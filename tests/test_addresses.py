@@ -0,0 +1,98 @@
+# tests/test_addresses.py
+
+import json
+
+import pytest
+
+from addresses import AddressResolver, Property, load_registry, normalize_street, parse_unit
+from metrics import metrics
+from rule_parser import EmailParser
+
+PROPERTIES = [
+    Property("holland-100", "100 Holland Ave", ("1F", "2D")),
+    Property("holland-2000", "2000 Holland Avenue", ("1F",)),
+    Property("greenwich-12", "12 Greenwich Avenue"),
+    Property("main-5", "5 North Main Street"),
+]
+
+
+@pytest.fixture
+def resolver():
+    metrics.reset()
+    return AddressResolver(PROPERTIES)
+
+
+def test_normalize_street_and_unit():
+    assert normalize_street("100 Holland Av., Apt #2d") == "100 holland ave"
+    assert normalize_street("5 N. Main St") == normalize_street("5 north main street")
+    assert parse_unit("100 Holland Av Apt 2d") == "2D"
+    assert parse_unit("Unit #12B on the 3rd floor") == "12B"
+    assert parse_unit("100 Holland Ave") is None
+
+
+def test_resolves_llm_free_text(resolver):
+    found = resolver.resolve("100 Holland Av Apt 2d")
+    assert found.property.id == "holland-100"
+    assert found.address == "100 Holland Ave, Apt 2D"
+    assert found.key == "holland-100#2D"
+    # Street name alone is enough when only one building is on it
+    assert resolver.resolve("Greenwich ave").address == "12 Greenwich Avenue"
+
+
+def test_fuzzy_match_tolerates_typos(resolver):
+    found = resolver.resolve("2000 Hollnd Avenue")
+    assert found.property.id == "holland-2000" and found.score < 1
+    assert resolver.resolve("1 Unknown Boulevard") is None
+
+
+def test_house_number_must_agree_and_disambiguate(resolver):
+    assert resolver.resolve("300 Holland Ave") is None
+    assert resolver.resolve("Holland Ave") is None
+    assert metrics.counter("addresses.ambiguous") == 1
+
+
+def test_unknown_unit_is_dropped(resolver):
+    assert resolver.resolve("2000 Holland Ave Apt 9Z").unit is None
+    assert resolver.resolve("12 Greenwich Ave #4").unit == "4"
+
+
+def test_find_in_body(resolver):
+    body = "Hi, I live at 2000 holland av., apartment 1f and the heat is out."
+    assert resolver.find(body).key == "holland-2000#1F"
+    assert resolver.find("The sink on Greenwich Ave is broken").property.id == "greenwich-12"
+    assert resolver.find("Nothing to see here") is None
+
+
+def test_rule_parser_returns_canonical_address(resolver):
+    parser = EmailParser(resolver=resolver)
+    msg = {"uid": "1", "sender": "A <a@b.c>", "body": "Leak in Apt 2D at 100 Holland Avenue"}
+    assert parser.parse(msg).address == "100 Holland Ave, Apt 2D"
+    assert parser.parse(msg).address_key == "holland-100#2D"
+    # Without a registry match it falls back to the unit token
+    assert parser.parse({**msg, "body": "Leak in Apt 7"}).address == "7"
+    assert parser.parse({**msg, "body": "Leak in Apt 7"}).address_key is None
+
+
+def test_llm_parser_records_registry_key(resolver, monkeypatch):
+    import parser as llm
+
+    monkeypatch.setattr(llm.openai, "api_key", "TEST_KEY")
+    monkeypatch.setattr(llm.LLMEmailParser, "llm_parse", lambda self, msg, tier=None: {
+        "tenant_name": "Al", "address": "100 Holland Av Apt 2d", "request_type": "maintenance",
+        "summary": "Leak", "full_body": msg["body"],
+    })
+    monkeypatch.setattr(llm, "validate_email_data", lambda data: None)
+    parsed = llm.LLMEmailParser(model="test", resolver=resolver).parse(
+        {"uid": "1", "sender": "Al <al@x.com>", "body": "Al here, my sink leaks"}
+    )
+    assert parsed["address"] == "100 Holland Ave, Apt 2D"
+    assert parsed["address_key"] == "holland-100#2D"
+
+
+def test_load_registry(tmp_path, monkeypatch):
+    path = tmp_path / "properties.json"
+    path.write_text(json.dumps([{"id": "p1", "address": "1 Main St", "units": ["1a"]}]))
+    monkeypatch.setenv("PROPERTIES_FILE", str(path))
+    assert load_registry() == [Property("p1", "1 Main St", ("1A",))]
+    monkeypatch.delenv("PROPERTIES_FILE")
+    assert load_registry() == []
@@ -0,0 +1,98 @@
+# tests/test_body_extractor.py
+
+from email.message import EmailMessage
+
+from body_extractor import (
+    extract_body,
+    html_to_text,
+    strip_quotes_and_signature,
+)
+
+
+def make_message(plain=None, html=None):
+    msg = EmailMessage()
+    msg["Subject"] = "S"
+    msg["From"] = "t@example.com"
+    if plain is not None:
+        msg.set_content(plain)
+        if html is not None:
+            msg.add_alternative(html, subtype="html")
+    else:
+        msg.set_content(html, subtype="html")
+    return msg
+
+
+def test_prefers_plain_over_html():
+    msg = make_message(plain="Plain text body", html="<p>HTML body</p>")
+    result = extract_body(msg)
+    assert result.text == "Plain text body"
+    assert result.content_type == "text/plain"
+
+
+def test_html_only_falls_back_to_text_conversion():
+    html = (
+        "<html><head><style>p {color: red}</style></head>"
+        "<body><p>My sink is&nbsp;leaking.</p><p>Please help &amp; thanks</p>"
+        "<script>alert(1)</script></body></html>"
+    )
+    result = extract_body(make_message(html=html))
+    assert result.content_type == "text/html"
+    assert "My sink is leaking." in result.text
+    assert "Please help & thanks" in result.text
+    assert "color" not in result.text
+    assert "alert" not in result.text
+
+
+def test_html_to_text_block_tags_become_newlines():
+    assert html_to_text("<div>one</div><div>two<br>three</div>") == "one\ntwo\nthree"
+
+
+def test_strips_quoted_reply_and_signature():
+    body = (
+        "The heater is still broken.\n"
+        "\n"
+        "--\n"
+        "Jane Doe\n"
+        "Apt 4B\n"
+        "\n"
+        "On Mon, Jan 6, 2025 at 9:00 AM Domos <pm@example.com> wrote:\n"
+        "> We have raised ticket abc123.\n"
+    )
+    result = extract_body(make_message(plain=body))
+    assert result.text == "The heater is still broken."
+    assert result.tokens_saved > 0
+
+
+def test_strips_wrapped_on_wrote_header():
+    body = (
+        "Thanks, any update?\n\n"
+        "On Mon, Jan 6, 2025 at 9:00 AM Domos Property <\n"
+        "pm@example.com> wrote:\n"
+        "> Ticket raised.\n"
+    )
+    assert strip_quotes_and_signature(body) == "Thanks, any update?"
+
+
+def test_stripping_never_empties_body():
+    assert strip_quotes_and_signature("> only quoted text") == "> only quoted text"
+
+
+def test_caps_decoded_bytes_per_part():
+    msg = make_message(plain="x" * 10_000)
+    result = extract_body(msg, max_part_bytes=100)
+    assert len(result.text) == 100
+    assert result.truncated is True
+
+
+def test_caps_base64_part_before_decoding():
+    msg = EmailMessage()
+    msg.set_content("é" * 5_000, cte="base64")
+    result = extract_body(msg, max_part_bytes=64)
+    assert result.truncated is True
+    assert 0 < len(result.text.encode("utf-8")) <= 64
+
+
+def test_skips_attachments():
+    msg = make_message(plain="Body")
+    msg.add_attachment("not body", filename="notes.txt")
+    assert extract_body(msg).text == "Body"
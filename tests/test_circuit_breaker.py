@@ -0,0 +1,217 @@
+# tests/test_circuit_breaker.py
+
+import smtplib
+
+import pytest
+
+import parser
+import sender as sender_module
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen, llm_failure, smtp_failure
+from metrics import metrics
+from outbox import Outbox
+from parser import LLMEmailParser
+from sender import EmailSender
+
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def fail():
+    raise ConnectionError("down")
+
+
+def make_breaker(clock, **kwargs):
+    return CircuitBreaker("test", failure_rate=0.5, min_calls=4, window=10, open_seconds=30.0, clock=clock, **kwargs)
+
+
+def test_opens_after_failure_rate_and_fails_fast():
+    breaker = make_breaker(FakeClock())
+    assert breaker.call(lambda: "ok") == "ok"
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+    # 2/3 failed, but fewer than min_calls outcomes
+    assert breaker.state == CLOSED
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    assert breaker.state == OPEN
+
+    calls = []
+    with pytest.raises(CircuitOpen) as exc:
+        breaker.call(lambda: calls.append(1))
+    assert calls == []
+    assert exc.value.retry_after == 30.0
+    assert metrics.counter("breaker.test.opened") == 1
+    assert metrics.counter("breaker.test.rejected") == 1
+
+
+def test_half_open_probe_closes_or_reopens():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    for _ in range(4):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+    clock.now += 30.0
+    assert breaker.state == HALF_OPEN and breaker.available()
+
+    # One probe at a time; a failed probe reopens for another period
+    assert breaker.allow()
+    assert not breaker.available() and not breaker.allow()
+    breaker.record(ConnectionError("still down"))
+    assert breaker.state == OPEN
+    clock.now += 29.0
+    assert not breaker.available()
+
+    clock.now += 1.0
+    assert breaker.call(lambda: "back") == "back"
+    assert breaker.state == CLOSED
+    # The window starts afresh after closing
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    assert breaker.state == CLOSED
+
+
+def test_only_classified_failures_count():
+    breaker = make_breaker(FakeClock(), is_failure=smtp_failure)
+    refused = smtplib.SMTPRecipientsRefused({"x@example.com": (550, b"no such user")})
+    for _ in range(6):
+        breaker.record(refused)
+    assert breaker.state == CLOSED
+    for _ in range(6):
+        breaker.record(smtplib.SMTPServerDisconnected("gone"))
+    assert breaker.state == OPEN
+
+    assert llm_failure(parser.openai.APITimeoutError(request=None))
+    assert not llm_failure(ValueError("bad json"))
+
+
+MSG = {"uid": "3", "sender": "Dana <dana@example.com>", "subject": "Sink",
+       "body": "Hi, the sink in Apt 4B at 12 Oak St is leaking."}
+
+
+def test_parser_uses_rules_while_llm_circuit_is_open(monkeypatch):
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        raise parser.openai.APITimeoutError(request=None)
+
+    monkeypatch.setattr(parser.openai.chat.completions, "create", create)
+    breaker = make_breaker(FakeClock(), is_failure=llm_failure)
+    llm_parser = LLMEmailParser(breaker=breaker)
+    for _ in range(6):
+        parsed = llm_parser.parse(MSG)
+        assert parsed["tenant_name"] == "Dana" and parsed["request_type"] == "maintenance"
+    assert len(calls) == 4
+    assert metrics.counter("cascade.circuit_open") == 2
+    assert metrics.counter("cascade.rules.accepted") == 6
+
+
+def test_sender_skips_backoff_once_circuit_opens(monkeypatch):
+    connects, sleeps = [], []
+
+    class DownSMTP:
+        def __init__(self, host, port, timeout=None):
+            connects.append(host)
+            raise smtplib.SMTPConnectError(421, "unavailable")
+
+    monkeypatch.setattr(smtplib, "SMTP_SSL", DownSMTP)
+    monkeypatch.setattr(sender_module.time, "sleep", sleeps.append)
+    breaker = make_breaker(FakeClock(), is_failure=smtp_failure)
+    email_sender = EmailSender("smtp.test", 465, "me@example.com", "pw", max_retries=3, breaker=breaker)
+
+    assert not email_sender.send_email(["a@example.com"], "Hi", "Body")
+    assert not email_sender.send_email(["b@example.com"], "Hi", "Body")
+    assert len(connects) == 4 and breaker.state == OPEN
+    # The second email stopped retrying as soon as the circuit opened
+    assert len(sleeps) == 2
+
+    assert not email_sender.send_email(["c@example.com"], "Hi", "Body")
+    assert len(connects) == 4 and len(sleeps) == 2
+
+
+def test_outbox_keeps_replies_queued_while_circuit_is_open(tmp_path):
+    box = Outbox(path=str(tmp_path / "outbox.db"))
+    box.enqueue("src-1", "t1", ["a@example.com"], "Re: hi", "Hello")
+
+    class Sender:
+        breaker = make_breaker(FakeClock())
+
+        def deliver_batch(self, entries):
+            return [None for _ in entries]
+
+    sender = Sender()
+    for _ in range(4):
+        sender.breaker.record(ConnectionError("down"))
+    assert box.drain(sender) == 0
+    assert box.stats() == {"pending": 1}
+    sender.breaker._clock.now += 30.0
+    assert box.drain(sender) == 1
+
+
+def test_outbox_outlasts_relay_outage_longer_than_max_attempts(tmp_path, monkeypatch):
+    connects, sent = [], []
+
+    class DownSMTP:
+        def __init__(self, host, port, timeout=None):
+            connects.append(host)
+            raise smtplib.SMTPConnectError(421, "unavailable")
+
+    class UpSMTP:
+        def __init__(self, host, port, timeout=None):
+            pass
+
+        def login(self, user, pw):
+            pass
+
+        def send_message(self, msg, from_addr=None, to_addrs=None):
+            sent.append(to_addrs)
+
+        def quit(self):
+            pass
+
+    monkeypatch.setattr(smtplib, "SMTP_SSL", DownSMTP)
+    clock = FakeClock()
+    breaker = CircuitBreaker("smtp", min_calls=1, open_seconds=30.0, clock=clock, is_failure=smtp_failure)
+    email_sender = EmailSender("smtp.test", 465, "me@example.com", "pw", breaker=breaker)
+    box = Outbox(path=str(tmp_path / "outbox.db"), max_attempts=3, base_delay=0.0)
+    for i in range(3):
+        box.enqueue(f"src-{i}", f"t{i}", [f"{i}@example.com"], "Re: hi", "Hello")
+
+    # One half-open probe per cycle; the replies behind it are not attempted
+    for _ in range(box.max_attempts + 1):
+        assert box.drain(email_sender) == 0
+        clock.now += 30.0
+    assert len(connects) == box.max_attempts + 1
+    assert box.stats() == {"pending": 3}
+
+    monkeypatch.setattr(smtplib, "SMTP_SSL", UpSMTP)
+    assert box.drain(email_sender) == 3
+    assert box.stats() == {"delivered": 3}
+
+
+def test_outbox_defers_replies_until_filled(tmp_path):
+    box = Outbox(path=str(tmp_path / "outbox.db"))
+    draft = {"parsed": {"tenant_name": "Dana"}, "context": {"rent_balance": "$10"}}
+    key = box.enqueue("src-1", "t1", ["a@example.com"], "Re: hi", None, draft=draft)
+    assert box.has_source("src-1")
+    assert box.claim() == []
+
+    [entry] = box.deferred()
+    assert entry["key"] == key and entry["draft"] == draft
+    box.fill(key, "Hello Dana")
+    assert box.deferred() == []
+    [claimed] = box.claim()
+    assert claimed["body"] == "Hello Dana"
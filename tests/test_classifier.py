@@ -0,0 +1,98 @@
+# tests/test_classifier.py
+
+import json
+
+import pytest
+
+import parser
+from classifier import RequestTypeClassifier, message_text, training_data
+from metrics import metrics
+from parser import LLMEmailParser
+
+EXAMPLES = {
+    "maintenance": ["The sink is leaking", "My heater is broken", "Toilet clogged again",
+                    "Door lock is broken", "No hot water in the shower", "Window will not close"],
+    "payment": ["How much rent do I owe", "Can I pay rent late", "Please send the invoice",
+                "My balance looks wrong", "I was charged a late fee", "Set up autopay for rent"],
+    "lease": ["I want to renew my lease", "When does my lease end", "Add a roommate to the lease",
+              "Extend the lease term", "Copy of my lease agreement", "Moving out when the lease ends"],
+}
+
+
+@pytest.fixture
+def model():
+    texts = [t for ts in EXAMPLES.values() for t in ts] * 2
+    labels = [label for label, ts in EXAMPLES.items() for _ in ts] * 2
+    return RequestTypeClassifier(n_features=2 ** 10).fit(texts, labels, epochs=20)
+
+
+def test_batch_probabilities_are_normalised_and_ranked(model):
+    probs = model.predict_proba(["the kitchen sink is leaking", "when does the lease end", "rent invoice"])
+    assert all(abs(sum(p.values()) - 1) < 1e-9 for p in probs)
+    assert [max(p, key=p.get) for p in probs] == ["maintenance", "lease", "payment"]
+    label, confidence = model.predict(["my heater is broken"])[0]
+    assert label == "maintenance" and confidence > 0.5
+
+
+def test_save_and_load_roundtrip(model, tmp_path):
+    path = str(tmp_path / "model.json")
+    model.save(path)
+    loaded = RequestTypeClassifier.load(path)
+    text = ["toilet clogged, please fix"]
+    assert loaded.predict_proba(text) == pytest.approx(model.predict_proba(text))
+    assert loaded.temperature == model.temperature
+
+
+def test_training_data_from_action_items(tmp_path):
+    for i, (label, body) in enumerate([("payment", "Rent?"), ("lease", "Renew")]):
+        item = {"request_type": label, "subject": "Question", "body": body, "summary": "LLM summary",
+                "parsed_by": "small"}
+        (tmp_path / f"{i}.json").write_text(json.dumps(item))
+    (tmp_path / "2.json").write_text(json.dumps({"body": "no label"}))
+    (tmp_path / "3.json").write_text(json.dumps({"request_type": "general", "summary": "no body"}))
+    # Labels from the rule parser, the classifier itself, or of unknown origin
+    for i, parsed_by in enumerate(["rules", "classifier", None], start=4):
+        item = {"request_type": "maintenance", "subject": "Hi", "body": "Fix it", "parsed_by": parsed_by}
+        (tmp_path / f"{i}.json").write_text(json.dumps(item))
+    texts, labels = training_data(str(tmp_path))
+    assert labels == ["payment", "lease"]
+    # The same text the classifier scores at inference
+    assert texts[0] == message_text({"subject": "Question", "body": "Rent?"})
+
+
+def test_rejects_bad_input():
+    with pytest.raises(ValueError):
+        RequestTypeClassifier(n_features=1000)
+    with pytest.raises(ValueError):
+        RequestTypeClassifier().fit(["rent", "more rent"], ["payment", "payment"])
+    with pytest.raises(ValueError):
+        RequestTypeClassifier().predict(["x"])
+
+
+def test_parser_skips_llm_for_confident_predictions(model, monkeypatch):
+    monkeypatch.setattr(parser.openai, "api_key", "TEST_KEY")
+    calls = []
+
+    def fake_llm_parse(self, msg, tier=None):
+        calls.append(msg["uid"])
+        return {"tenant_name": "Bo", "address": None, "request_type": "payment",
+                "summary": "s", "full_body": msg["body"]}
+
+    monkeypatch.setattr(LLMEmailParser, "llm_parse", fake_llm_parse)
+    monkeypatch.setattr(parser, "validate_email_data", lambda data: None)
+    metrics.reset()
+
+    msgs = [
+        {"uid": "1", "sender": "Al <al@x.com>", "subject": "Leak", "body": "The sink is leaking in Apt 3"},
+        {"uid": "2", "sender": "Bo <bo@x.com>", "subject": "Hi", "body": "Quick question"},
+    ]
+    llm_parser = LLMEmailParser(model="test", classifier=model, skip_threshold=0.6)
+    assert llm_parser.preclassify(msgs) == 1
+
+    first = llm_parser.parse(msgs[0])
+    assert first["request_type"] == "maintenance" and first["tenant_name"] == "Al"
+    assert first["parsed_by"] == "classifier"
+    assert llm_parser.parse(msgs[1])["parsed_by"] == llm_parser.tiers[0].name
+    assert calls == ["2"]
+    assert metrics.counter("classifier.llm_skipped") == 1
+    assert metrics.counter("classifier.agree") + metrics.counter("classifier.disagree") == 1
@@ -0,0 +1,45 @@
+# tests/test_config.py
+
+import os
+import subprocess
+import sys
+
+import dotenv
+import pytest
+
+import config
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_load_env_runs_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(dotenv, "load_dotenv", lambda *a, **k: calls.append(1))
+    config.load_env.cache_clear()
+    try:
+        config.load_env()
+        config.load_env()
+    finally:
+        config.load_env.cache_clear()
+    assert calls == [1]
+
+
+def test_lazy_import_returns_loaded_module():
+    assert config.lazy_import("json") is sys.modules["json"]
+
+
+def test_lazy_import_missing_module():
+    with pytest.raises(ModuleNotFoundError):
+        config.lazy_import("no_such_module_here")
+
+
+@pytest.mark.parametrize("modules", ["main", "parser, reply_generator, context_loader, validator"])
+def test_heavy_dependencies_are_not_imported_eagerly(modules):
+    code = (
+        f"import sys, {modules}\n"
+        "heavy = [m for m in ('openai', 'faker', 'jsonschema', 'dotenv') "
+        "if m in sys.modules and not type(sys.modules[m]).__name__ == '_LazyModule']\n"
+        "print(','.join(heavy))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ""
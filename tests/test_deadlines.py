@@ -0,0 +1,162 @@
+# tests/test_deadlines.py
+
+import json
+
+import pytest
+
+import deadlines
+import parser
+import reply_generator
+from deadlines import Deadline, DeadlineExceeded
+from metrics import metrics
+from parser import LLMEmailParser, ModelTier
+from reply_generator import ReplyGenerator
+from reply_templates import ReplyRouter
+
+
+class FakeClock:
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_deadline_timeouts_shrink_with_remaining_budget():
+    clock = FakeClock()
+    deadline = Deadline(10.0, clock=clock)
+    assert deadline.timeout(30.0) == 10.0
+    assert deadline.timeout(2.0) == 2.0
+    clock.now += 9.0
+    assert deadline.timeout(30.0) == pytest.approx(1.0)
+    clock.now += 5.0
+    assert deadline.expired and deadline.remaining() == 0.0
+
+
+def test_module_helpers_without_deadline_keep_caps():
+    assert deadlines.current() is None
+    assert deadlines.timeout_for(30.0) == 30.0
+    assert deadlines.timeout_for(None) is None
+    assert deadlines.has_time("parse", 1e9)
+    deadlines.checkpoint("parse")
+    assert metrics.counter("deadline.parse.missed") == 0
+
+
+def test_scope_sets_current_deadline_and_counts_misses_once():
+    clock = FakeClock()
+    deadline = Deadline(5.0, clock=clock)
+    with deadlines.scope(deadline):
+        assert deadlines.timeout_for(None) == 5.0
+        assert not deadlines.has_time("reply", 6.0)
+        clock.now += 6.0
+        deadlines.checkpoint("parse")
+        deadlines.checkpoint("reply")
+    assert deadlines.current() is None
+    assert metrics.counter("deadline.reply.degraded") == 1
+    assert metrics.counter("deadline.parse.missed") == 1
+    assert metrics.counter("deadline.reply.missed") == 0
+    assert deadline.missed_stage == "parse"
+
+
+MSG = {"uid": "3", "sender": "Dana <dana@example.com>", "subject": "Sink",
+       "body": "Hi, the sink in Apt 4B at 12 Oak St is leaking."}
+GOOD_PARSE = {"tenant_name": "Dana", "address": "12 Oak St Apt 4B", "request_type": "maintenance",
+              "summary": "Leaking sink", "full_body": MSG["body"]}
+
+
+def fake_parse_create(calls):
+    def create(model, **kwargs):
+        calls.append(kwargs.get("timeout"))
+        message = type("Message", (), {"content": json.dumps(GOOD_PARSE)})
+        return type("Resp", (), {"choices": [type("Choice", (), {"message": message})], "usage": None})
+    return create
+
+
+def test_parser_timeout_is_capped_by_deadline(monkeypatch):
+    calls = []
+    monkeypatch.setattr(parser.openai.chat.completions, "create", fake_parse_create(calls))
+    llm_parser = LLMEmailParser(tiers=[ModelTier("cheap", "mini", timeout=10.0)])
+    with deadlines.scope(Deadline(4.0)):
+        assert llm_parser.parse(MSG) == {**GOOD_PARSE, "parsed_by": "cheap", "address_key": None}
+    assert 3.0 < calls[0] <= 4.0
+
+
+def test_parser_uses_rules_when_deadline_is_nearly_spent(monkeypatch):
+    calls = []
+    monkeypatch.setattr(parser.openai.chat.completions, "create", fake_parse_create(calls))
+    clock = FakeClock()
+    deadline = Deadline(10.0, clock=clock)
+    clock.now += 9.0
+    with deadlines.scope(deadline):
+        parsed = LLMEmailParser(min_call_seconds=2.0).parse(MSG)
+    assert calls == []
+    assert parsed["request_type"] == "maintenance"
+    assert metrics.counter("deadline.parse.degraded") == 1
+    assert metrics.counter("cascade.rules.accepted") == 1
+
+
+class FakeGenerator:
+    def __init__(self, error=None):
+        self.calls = 0
+        self.error = error
+
+    def generate(self, parsed, context, ticket_id, stream=False):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return "LLM reply"
+
+
+PARSED = {"tenant_name": "Jane", "address": "1 Main St", "request_type": "general",
+          "summary": "Question about parking", "full_body": "Where can guests park?"}
+CONTEXT = {"rent_balance": "$1,200", "lease_end_date": "2026-01-31", "maintenance_history": []}
+
+
+def test_router_acknowledges_without_model_call_when_out_of_time():
+    generator = FakeGenerator()
+    clock = FakeClock()
+    with deadlines.scope(Deadline(3.0, clock=clock)):
+        reply = ReplyRouter(generator, min_llm_seconds=5.0).reply(PARSED, CONTEXT, "t1")
+    assert generator.calls == 0
+    assert reply.startswith("Hi Jane,") and "Question about parking" in reply and "t1" in reply
+    assert metrics.counter("reply.degraded") == 1
+    assert metrics.counter("deadline.reply.degraded") == 1
+
+
+def test_router_uses_template_when_deadline_expires_during_call():
+    parsed = {**PARSED, "request_type": "payment", "full_body": "I dispute the late fee, it is wrong."}
+    generator = FakeGenerator(error=DeadlineExceeded("reply"))
+    reply = ReplyRouter(generator).reply(parsed, CONTEXT, "t2")
+    assert generator.calls == 1
+    assert "Your current balance is $1,200" in reply
+    assert metrics.counter("reply.degraded") == 1
+    assert metrics.counter("reply.llm") == 0
+
+
+def test_reply_generator_reports_deadline_timeouts(monkeypatch):
+    seen = []
+
+    def create(**kwargs):
+        seen.append(kwargs.get("timeout"))
+        clock.now += 5.0
+        raise reply_generator.openai.APITimeoutError(request=None)
+
+    monkeypatch.setattr(reply_generator.openai.chat.completions, "create", create)
+    clock = FakeClock()
+    generator = ReplyGenerator(timeout=60.0)
+    with deadlines.scope(Deadline(5.0, clock=clock)):
+        with pytest.raises(DeadlineExceeded):
+            generator.generate(PARSED, CONTEXT, "t3")
+    assert seen == [5.0]
+
+    # Without a deadline the timeout is the generator's own error
+    with pytest.raises(reply_generator.openai.APITimeoutError):
+        generator.generate(PARSED, CONTEXT, "t4")
+    assert seen[-1] == 60.0
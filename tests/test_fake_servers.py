@@ -0,0 +1,178 @@
+# tests/test_fake_servers.py
+#
+# InboxConnector and EmailSender against the local fake servers used by
+# the benchmarks, over real sockets.
+
+import imaplib
+import shutil
+import threading
+
+import pytest
+
+from benchmarks.fake_servers import (
+    FakeIMAPServer,
+    FakeSMTPServer,
+    generate_messages,
+    self_signed_contexts,
+)
+from inbox import InboxConnector
+from mailboxes import MailboxAccount, MailboxReader
+from sender import EmailSender
+
+needs_openssl = pytest.mark.skipif(shutil.which("openssl") is None, reason="openssl not installed")
+
+
+@pytest.fixture
+def imap_server():
+    with FakeIMAPServer(messages=generate_messages(5), users={"office": "pw"}) as server:
+        yield server
+
+
+def make_connector(server, **kwargs):
+    return InboxConnector(
+        host=server.host, port=server.port, use_ssl=False,
+        username="office", password="pw", **kwargs
+    )
+
+
+def test_generate_messages_is_reproducible():
+    assert generate_messages(3, seed=1) == generate_messages(3, seed=1)
+    assert generate_messages(3, seed=1) != generate_messages(3, seed=2)
+
+
+def test_fetch_unread_peeks_until_mark_seen(imap_server):
+    connector = make_connector(imap_server)
+    connector.connect()
+    messages = connector.fetch_unread(limit=3, mark_seen=False)
+
+    assert [m["uid"] for m in messages] == ["1", "2", "3"]
+    assert messages[0]["message_id"].endswith("@example.com>")
+    assert "Address:" in messages[0]["body"]
+    assert imap_server.inbox.seen_count() == 0
+
+    for msg in messages:
+        connector.mark_seen(msg["uid"])
+    assert imap_server.inbox.seen_count() == 3
+    assert [m["uid"] for m in connector.fetch_unread(limit=10, mark_seen=True)] == ["4", "5"]
+    assert imap_server.inbox.seen_count() == 5
+    connector.logout()
+
+
+def test_login_is_checked(imap_server):
+    connector = InboxConnector(host=imap_server.host, port=imap_server.port, use_ssl=False,
+                               username="office", password="wrong")
+    with pytest.raises(imaplib.IMAP4.error):
+        connector.connect()
+
+
+def test_uid_commands(imap_server):
+    conn = imaplib.IMAP4(imap_server.host, imap_server.port)
+    conn.login("office", "pw")
+    conn.select("INBOX")
+    status, data = conn.uid("SEARCH", None, "UNSEEN")
+    assert status == "OK" and data[0].split() == [b"1", b"2", b"3", b"4", b"5"]
+
+    status, data = conn.uid("FETCH", "2:3", "(FLAGS BODY.PEEK[])")
+    assert status == "OK"
+    assert [part[0].split()[2] for part in data if isinstance(part, tuple)] == [b"2", b"3"]
+
+    conn.uid("STORE", "4", "+FLAGS", "(\\Seen)")
+    assert conn.uid("SEARCH", None, "SEEN")[1][0] == b"4"
+    conn.logout()
+
+
+def test_idle_reports_new_mail(imap_server):
+    conn = imaplib.IMAP4(imap_server.host, imap_server.port)
+    conn.login("office", "pw")
+    conn.select("INBOX")
+    tag = conn._new_tag()
+    conn.send(tag + b" IDLE\r\n")
+    assert conn.readline().startswith(b"+")
+
+    threading.Timer(0.05, imap_server.inbox.load, [generate_messages(2, seed=9)]).start()
+    assert conn.readline().strip() == b"* 7 EXISTS"
+    conn.send(b"DONE\r\n")
+    assert conn.readline().startswith(tag + b" OK")
+    conn.logout()
+
+
+def test_mailbox_reader_over_fake_server(imap_server):
+    accounts = [
+        MailboxAccount(name=f"p{i}", host=imap_server.host, port=imap_server.port, use_ssl=False,
+                       username="office", password="pw")
+        for i in range(2)
+    ]
+    reader = MailboxReader(accounts, max_connections=2, limit_per_account=2)
+    merged = reader.poll()
+    assert [(m["account"], m["uid"]) for m in merged] == [("p0", "1"), ("p1", "1"), ("p0", "2"), ("p1", "2")]
+    reader.close()
+
+
+def send_three(sender):
+    entries = [
+        {"to": [f"t{i}@example.com"], "subject": f"Re: {i}", "body": "Hello", "attempts": 0, "message_id": f"k{i}"}
+        for i in range(3)
+    ]
+    return sender.deliver_batch(entries)
+
+
+def test_sender_without_tls():
+    with FakeSMTPServer(users={"office@example.com": "pw"}) as server:
+        sender = EmailSender(server.host, server.port, "office@example.com", "pw",
+                             use_ssl=False, allow_plaintext=True)
+        assert send_three(sender) == [None, None, None]
+        assert [m["to"] for m in server.messages] == [["t0@example.com"], ["t1@example.com"], ["t2@example.com"]]
+        assert b"Subject: Re: 1" in server.messages[1]["data"]
+
+
+def test_sender_rejected_login():
+    with FakeSMTPServer(users={"office@example.com": "pw"}) as server:
+        sender = EmailSender(server.host, server.port, "office@example.com", "nope",
+                             use_ssl=False, allow_plaintext=True)
+        assert all(error for error in send_three(sender))
+        assert server.messages == []
+
+
+def test_sender_refuses_plaintext_without_starttls():
+    with FakeSMTPServer(users={"office@example.com": "pw"}) as server:
+        sender = EmailSender(server.host, server.port, "office@example.com", "pw", use_ssl=False)
+        errors = send_three(sender)
+        assert all("STARTTLS" in error for error in errors)
+        assert server.messages == []
+
+
+@needs_openssl
+def test_sender_implicit_tls():
+    server_ctx, client_ctx = self_signed_contexts()
+    with FakeSMTPServer(ssl_context=server_ctx) as server:
+        sender = EmailSender("localhost", server.port, "office@example.com", "pw", ssl_context=client_ctx)
+        assert send_three(sender) == [None, None, None]
+        assert len(server.messages) == 3
+
+
+@needs_openssl
+def test_sender_starttls():
+    server_ctx, client_ctx = self_signed_contexts()
+    with FakeSMTPServer(starttls_context=server_ctx) as server:
+        sender = EmailSender("localhost", server.port, "office@example.com", "pw",
+                             use_ssl=False, ssl_context=client_ctx)
+        assert send_three(sender) == [None, None, None]
+
+
+@needs_openssl
+def test_inbox_over_tls():
+    server_ctx, client_ctx = self_signed_contexts()
+    with FakeIMAPServer(messages=generate_messages(2), ssl_context=server_ctx) as server:
+        connector = InboxConnector(host="localhost", port=server.port, username="u", password="p",
+                                   ssl_context=client_ctx)
+        connector.connect()
+        assert len(connector.fetch_unread(mark_seen=False)) == 2
+        connector.logout()
+
+
+def test_connector_applies_socket_timeout(imap_server):
+    connector = make_connector(imap_server, timeout=5.0)
+    connector.connect()
+    assert len(connector.fetch_unread(limit=2, mark_seen=False)) == 2
+    assert connector.conn.sock.gettimeout() == 5.0
+    connector.logout()
@@ -0,0 +1,84 @@
+# tests/test_hedging.py
+
+import time
+import threading
+
+import pytest
+
+from hedging import HedgedCaller, HedgePolicy, hedged
+from metrics import metrics
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    metrics.reset()
+
+
+def learnt_caller(budget=1.0):
+    policy = HedgePolicy(percentile=90, budget=budget, min_samples=5, min_delay=0.01)
+    for _ in range(10):
+        policy.observe("parse", 0.01)
+    return HedgedCaller(policy, max_workers=4)
+
+
+def slow_then_fast(first_delay=0.5):
+    """fn whose first invocation is slow and later ones are fast."""
+    calls = []
+    lock = threading.Lock()
+
+    def fn():
+        with lock:
+            n = len(calls)
+            calls.append(n)
+        time.sleep(first_delay if n == 0 else 0.01)
+        return f"result {n}"
+    return fn, calls
+
+
+def test_no_hedge_until_latencies_are_learnt():
+    caller = HedgedCaller(HedgePolicy(min_samples=5))
+    fn, calls = slow_then_fast(0.05)
+    assert caller.call("parse", fn) == "result 0"
+    assert calls == [0]
+    assert metrics.counter("hedge.parse.hedged") == 0
+
+
+def test_slow_call_is_hedged_and_backup_wins():
+    caller = learnt_caller()
+    fn, calls = slow_then_fast()
+    discarded = []
+    start = time.perf_counter()
+    assert caller.call("parse", fn, discard=discarded.append) == "result 1"
+    assert time.perf_counter() - start < 0.3
+    assert metrics.counter("hedge.parse.backup_won") == 1
+
+    time.sleep(0.6)  # the abandoned primary finishes and is discarded
+    assert discarded == ["result 0"]
+    assert metrics.histogram("hedge.parse.primary").percentile(100) >= 0.5
+    assert metrics.histogram("hedge.parse.latency").percentile(100) < 0.3
+
+
+def test_budget_caps_hedges():
+    caller = learnt_caller(budget=0.0)
+    fn, calls = slow_then_fast(0.1)
+    assert caller.call("parse", fn) == "result 0"
+    assert calls == [0]
+    assert metrics.counter("hedge.parse.budget_exhausted") == 1
+
+
+def test_failed_primary_falls_back_to_backup():
+    caller = learnt_caller()
+    state = {"n": 0}
+
+    def fn():
+        state["n"] += 1
+        if state["n"] == 1:
+            time.sleep(0.1)
+            raise TimeoutError("slow and failed")
+        time.sleep(0.2)
+        return "ok"
+    assert caller.call("parse", fn) == "ok"
+
+
+def test_hedged_without_caller_calls_directly():
+    assert hedged(None, "parse", lambda: 42) == 42
@@ -18,6 +18,7 @@ class FakeIMAP:
         # Defaults for search/fetch; tests will override as needed
         self._search_result = ("OK", [b""])
         self._fetch_results = {}  # maps uid (bytes) -> (status, data list)
+        self.uidvalidity = b"7"
 
     def login(self, username, password):
         self.logged_in = (username, password)
@@ -26,13 +27,20 @@ class FakeIMAP:
         self.selected_mailbox = mailbox
         return ("OK", [b""])
 
-    def search(self, charset, criteria):
+    def response(self, code):
+        return code, [self.uidvalidity if code == "UIDVALIDITY" else None]
+
+    def uid(self, command, *args):
+        # Only UID commands: sequence numbers change between sessions
+        return getattr(self, f"_uid_{command.lower()}")(*args)
+
+    def _uid_search(self, charset, criteria):
         return self._search_result
 
-    def fetch(self, uid, spec):
+    def _uid_fetch(self, uid, spec):
         return self._fetch_results.get(uid, ("NO", []))
 
-    def store(self, uid, flags, flag):
+    def _uid_store(self, uid, flags, flag):
         self.store_calls.append((uid, flags, flag))
 
     def close(self):
@@ -48,7 +56,7 @@ def fake_imap(monkeypatch):
     Replace imaplib.IMAP4_SSL with our FakeIMAP.
     """
     fake = FakeIMAP("imap.test.com")
-    monkeypatch.setattr(imaplib, "IMAP4_SSL", lambda host: fake)
+    monkeypatch.setattr(imaplib, "IMAP4_SSL", lambda host, timeout=None: fake)
     return fake
 
 
@@ -142,3 +150,34 @@ def test_logout(fake_imap):
     conn.logout()
     assert fake_imap.closed is True
     assert fake_imap.logged_out is True
+
+
+def test_fetch_unread_defers_mark_seen(fake_imap):
+    msg = EmailMessage()
+    msg["Subject"] = "Deferred"
+    msg["From"] = "sender@example.com"
+    msg["Message-ID"] = "<abc@example.com>"
+    msg.set_content("Hello")
+
+    fake_imap._search_result = ("OK", [b"1"])
+    fake_imap._fetch_results = {b"1": ("OK", [(None, msg.as_bytes())])}
+
+    conn = InboxConnector("imap.test.com", "u", "p")
+    conn.connect()
+    msgs = conn.fetch_unread(limit=1, mark_seen=False)
+
+    assert msgs[0]["message_id"] == "<abc@example.com>"
+    assert msgs[0]["uidvalidity"] == "7"
+    assert fake_imap.store_calls == []
+    assert conn.mark_seen(msgs[0]["uid"], msgs[0]["uidvalidity"])
+    assert fake_imap.store_calls == [(b"1", "+FLAGS", "\\Seen")]
+
+
+def test_mark_seen_skips_uids_from_an_older_uidvalidity(fake_imap):
+    conn = InboxConnector("imap.test.com", "u", "p")
+    conn.connect()
+    # The mailbox was recreated after the fetch, so UID 1 may be another message
+    fake_imap.uidvalidity = b"8"
+    conn.connect()
+    assert not conn.mark_seen("1", "7")
+    assert fake_imap.store_calls == []
@@ -0,0 +1,203 @@
+# tests/test_incidents.py
+
+import pytest
+
+from action_index import ActionItemIndex
+from incidents import (
+    IncidentAggregator,
+    IncidentReplier,
+    building_address,
+    building_key,
+    issue_category,
+)
+from metrics import metrics
+from reply_templates import ReplyRouter
+from workflow import WorkflowTrigger
+
+
+class FakeGenerator:
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, parsed, context, ticket_id, stream=False):
+        self.calls += 1
+        return f"Hi {parsed['tenant_name']}, we are on it. Ticket {ticket_id}."
+
+
+def make_parsed(name, address, body, request_type="maintenance"):
+    return {
+        "tenant_name": name,
+        "address": address,
+        "request_type": request_type,
+        "summary": body,
+        "full_body": body,
+    }
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+@pytest.mark.parametrize("address", [
+    "100 Holland Av Apt 2D",
+    "100 Holland Avenue, Unit #3",
+    "100 holland ave #4B",
+    "100 Holland Av., Apt. 7",
+])
+def test_building_key_ignores_unit_and_suffix_spelling(address):
+    assert building_key(address) == "100 holland ave"
+
+
+def test_building_key_prefers_registry_key():
+    assert building_key("2000 Hollnd Av", "holland-2000#1F") == "holland-2000"
+    assert building_key("12 Greenwich Avenue", "greenwich-12") == "greenwich-12"
+
+
+def test_resolved_addresses_link_by_registry_key():
+    aggregator = IncidentAggregator()
+    first = aggregator.attach(
+        {"id": "a"}, {**make_parsed("Ann", "2000 Holland Avenue, Apt 1F", "No heat"), "address_key": "holland-2000#1F"}
+    )
+    # A spelling normalize_street() would not match, resolved to the same property
+    second = aggregator.attach(
+        {"id": "b"}, {**make_parsed("Bob", "2000 Hollnd Av", "No heat"), "address_key": "holland-2000"}
+    )
+    assert second["id"] == first["id"] == "a"
+    assert first["building"] == "holland-2000"
+
+
+def test_building_address_drops_unit():
+    assert building_address("100 Holland Av., Apt. 2D, Springfield") == "100 Holland Av., Springfield"
+
+
+@pytest.mark.parametrize("text,expected", [
+    ("The boiler died, there is no heat", "heating"),
+    ("We have no hot water since this morning", "hot_water"),
+    ("Power is out in the whole building", "power"),
+    ("The elevator is stuck on the 3rd floor", "elevator"),
+    ("My kitchen sink is clogged", None),
+])
+def test_issue_category(text, expected):
+    assert issue_category(text) == expected
+
+
+def test_reports_in_window_link_to_one_incident(tmp_path):
+    workflow = WorkflowTrigger(output_dir=str(tmp_path), incidents=IncidentAggregator())
+    ids = {
+        workflow.process(make_parsed(name, f"100 Holland Av Apt {unit}", "No heat, the boiler is dead"), {})
+        for name, unit in [("Ann", "1A"), ("Bob", "2B"), ("Cat", "3C")]
+    }
+
+    assert len(ids) == 1
+    incident = workflow.incidents.get(ids.pop())
+    assert incident["action_type"] == "incident"
+    assert incident["address"] == "100 Holland Av"
+    assert [r["tenant_name"] for r in incident["linked_requests"]] == ["Ann", "Bob", "Cat"]
+    assert len(list(tmp_path.glob("*.json"))) == 1
+    assert metrics.counter("incidents.linked") == 2
+
+
+def test_other_buildings_issues_and_types_are_not_merged():
+    aggregator = IncidentAggregator()
+    first = aggregator.attach({"id": "a"}, make_parsed("Ann", "100 Holland Av", "No heat"))
+    other_building = aggregator.attach({"id": "b"}, make_parsed("Bob", "5 Main St", "No heat"))
+    other_issue = aggregator.attach({"id": "c"}, make_parsed("Cat", "100 Holland Av", "Power is out"))
+    unit_issue = aggregator.attach({"id": "d"}, make_parsed("Dan", "100 Holland Av", "My sink leaks"))
+    payment = aggregator.attach({"id": "e"}, make_parsed("Eve", "100 Holland Av", "No heat", "payment"))
+
+    assert {first["id"], other_building["id"], other_issue["id"]} == {"a", "b", "c"}
+    assert unit_issue == {"id": "d"}
+    assert payment == {"id": "e"}
+
+
+def test_window_expiry_opens_new_incident():
+    aggregator = IncidentAggregator(window_seconds=60)
+    parsed = make_parsed("Ann", "100 Holland Av", "No heat")
+    first = aggregator.attach({"id": "a"}, parsed, now=0)
+    assert aggregator.attach({"id": "b"}, parsed, now=50)["id"] == first["id"]
+    assert aggregator.attach({"id": "c"}, parsed, now=200)["id"] == "c"
+
+    assert aggregator.expire(now=1000) == 1
+    assert aggregator.get("c") is None
+
+
+def test_restores_open_incident_from_index(tmp_path):
+    index = ActionItemIndex(str(tmp_path))
+    workflow = WorkflowTrigger(output_dir=str(tmp_path), index=index, incidents=IncidentAggregator(index=index))
+    first = workflow.process(make_parsed("Ann", "100 Holland Av Apt 1", "No heat"), {})
+
+    restored = IncidentAggregator(index=ActionItemIndex(str(tmp_path)))
+    item = restored.attach({"id": "b"}, make_parsed("Bob", "100 Holland Av Apt 2", "No heat"))
+    assert item["id"] == first
+
+
+def test_replier_generates_once_and_personalizes():
+    aggregator = IncidentAggregator()
+    generator = FakeGenerator()
+    router = ReplyRouter(generator, incidents=IncidentReplier(aggregator, generator))
+
+    replies = []
+    for item_id, name in [("a", "Ann"), ("b", "Bob"), ("c", "Cat")]:
+        parsed = make_parsed(name, "100 Holland Av", "The boiler is dead, no heat")
+        incident = aggregator.attach({"id": item_id, "address": "100 Holland Av"}, parsed)
+        replies.append(router.reply(parsed, {}, incident["id"]))
+
+    assert generator.calls == 1
+    assert replies == [f"Hi {name}, we are on it. Ticket a." for name in ("Ann", "Bob", "Cat")]
+    assert metrics.counter("reply.incident") == 3
+    # Only the first reply needed the model
+    assert ReplyRouter.template_fraction() == pytest.approx(2 / 3)
+
+
+def test_replier_uses_local_template_without_generator():
+    aggregator = IncidentAggregator()
+    parsed = make_parsed("Ann", "100 Holland Av Apt 2", "No hot water")
+    incident = aggregator.attach({"id": "a", "address": "100 Holland Av Apt 2"}, parsed)
+    reply = IncidentReplier(aggregator).reply(parsed, incident["id"])
+
+    assert reply.startswith("Hi Ann,")
+    assert "hot water issue affecting 100 Holland Av and" in reply
+    assert "id a has been raised" in reply
+
+
+def test_replier_ignores_non_incidents():
+    assert IncidentReplier(IncidentAggregator()).reply(make_parsed("Ann", "x", "y"), "nope") is None
+
+
+def test_incident_keeps_no_reporter_details_and_prompt_has_no_tenant_text():
+    class RecordingGenerator(FakeGenerator):
+        def generate(self, parsed, context, ticket_id, stream=False):
+            self.parsed = parsed
+            return super().generate(parsed, context, ticket_id, stream)
+
+    aggregator = IncidentAggregator()
+    generator = RecordingGenerator()
+    parsed = make_parsed("Ann", "100 Holland Av Apt 2", "No heat and my rent is $900 late")
+    item = {"id": "a", "tenant_name": "Ann", "address": "100 Holland Av Apt 2",
+            "summary": parsed["summary"], "context": {"rent_balance": "$900"}, "status": "pending"}
+    incident = aggregator.attach(item, parsed)
+
+    assert incident["tenant_name"] is None and incident["context"] == {}
+    assert incident["summary"] == "heating issue affecting 100 Holland Av"
+    assert incident["linked_requests"][0]["summary"] == parsed["summary"]
+
+    IncidentReplier(aggregator, generator).reply(parsed, "a")
+    assert "$900" not in generator.parsed["summary"] + generator.parsed["full_body"]
+
+
+def test_incident_reply_without_placeholders_falls_back_to_template():
+    class NamingGenerator:
+        def generate(self, parsed, context, ticket_id, stream=False):
+            return "Hi Ann, we are on it."
+
+    aggregator = IncidentAggregator()
+    replier = IncidentReplier(aggregator, NamingGenerator())
+    for item_id, name in [("a", "Ann"), ("b", "Bob")]:
+        parsed = make_parsed(name, "100 Holland Av", "No hot water")
+        incident = aggregator.attach({"id": item_id, "address": "100 Holland Av"}, parsed)
+        reply = replier.reply(parsed, incident["id"])
+        assert reply.startswith(f"Hi {name},") and "id a has been raised" in reply
+    assert metrics.counter("incidents.replies_rejected") == 1
@@ -0,0 +1,83 @@
+# tests/test_logger.py
+
+import io
+import json
+import logging
+
+import pytest
+
+from logger import SamplingFilter, setup_logging, shutdown_logging
+
+
+@pytest.fixture
+def stream():
+    out = io.StringIO()
+    yield out
+    shutdown_logging()
+
+
+def make_record(msg, level=logging.INFO, created=0.0, name="test"):
+    record = logging.LogRecord(name, level, __file__, 1, msg, ("x",), None)
+    record.created = created
+    return record
+
+
+def test_module_loggers_go_through_queue(stream):
+    setup_logging(level="INFO", json_lines=False, sample=False, stream=stream)
+    logging.getLogger("sender").info("Sent to %s", "a@b.c")
+    logging.getLogger("inbox").debug("hidden")
+    shutdown_logging()
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 1
+    assert lines[0].endswith("INFO sender Sent to a@b.c")
+
+
+def test_json_lines_with_extras_and_exceptions(stream):
+    setup_logging(level="INFO", json_lines=True, sample=False, stream=stream)
+    log = logging.getLogger("outbox")
+    log.info("Outbox batch: %d/%d delivered", 2, 3, extra={"batch": 3, "entries": [1, 2]})
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        log.error("Failed", exc_info=True)
+    shutdown_logging()
+
+    first, second = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert first["msg"] == "Outbox batch: 2/3 delivered"
+    assert first["level"] == "INFO" and first["logger"] == "outbox"
+    assert first["batch"] == 3 and first["entries"] == "[1, 2]"
+    assert "ValueError: boom" in second["exc"]
+
+
+def test_args_are_merged_on_the_calling_thread(stream):
+    setup_logging(level="INFO", json_lines=False, sample=False, stream=stream)
+    items = ["before"]
+    logging.getLogger("t").info("items=%s", items)
+    items.append("after")
+    shutdown_logging()
+    assert "items=['before']" in stream.getvalue()
+
+
+def test_sampling_keeps_burst_then_every_nth():
+    sampler = SamplingFilter(burst=3, every=5, window=60)
+    passed = [sampler.filter(make_record("Retrying %s")) for _ in range(13)]
+    assert passed == [True] * 3 + [False] * 4 + [True] + [False] * 4 + [True]
+
+
+def test_sampling_reports_suppressed_count_and_resets_per_window():
+    sampler = SamplingFilter(burst=1, every=100, window=10)
+    sampler.filter(make_record("m", created=0))
+    for _ in range(4):
+        assert not sampler.filter(make_record("m", created=1))
+    record = make_record("m", created=11)
+    assert sampler.filter(record)
+    assert record.suppressed == 4
+
+
+def test_sampling_never_drops_warnings_or_other_templates():
+    sampler = SamplingFilter(burst=1, every=100, window=60)
+    sampler.filter(make_record("a"))
+    assert not sampler.filter(make_record("a"))
+    assert sampler.filter(make_record("b"))
+    assert sampler.filter(make_record("a", level=logging.WARNING))
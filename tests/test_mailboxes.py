@@ -0,0 +1,179 @@
+# tests/test_mailboxes.py
+
+import json
+import threading
+import time
+
+import pytest
+
+from mailboxes import MailboxAccount, MailboxReader, load_accounts
+from metrics import metrics
+
+
+class FakeConnector:
+    """Stands in for InboxConnector; each instance serves one account."""
+    inboxes = {}
+    failing = set()
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def __init__(self, host, username, password, mailbox="INBOX", **kwargs):
+        self.username = username
+        self.mailbox = mailbox
+        self.conn = None
+        self.seen = []
+        self.logins = 0
+
+    def connect(self):
+        if self.username in FakeConnector.failing:
+            raise OSError("connection refused")
+        self.conn = object()
+        self.logins += 1
+
+    def fetch_unread(self, limit=10, mark_seen=True):
+        with FakeConnector.lock:
+            FakeConnector.active += 1
+            FakeConnector.peak = max(FakeConnector.peak, FakeConnector.active)
+        time.sleep(0.01)
+        with FakeConnector.lock:
+            FakeConnector.active -= 1
+        inbox = FakeConnector.inboxes.get(self.username, [])
+        return [dict(m) for m in inbox if m["uid"] not in self.seen][:limit]
+
+    def mark_seen(self, uid, uidvalidity=None):
+        self.seen.append(uid)
+
+    def logout(self):
+        self.conn = None
+
+
+def make_msg(uid, date="Thu, 17 Jul 2025 12:39:48 +0000"):
+    return {"uid": uid, "sender": "a@b.c", "subject": "s", "date": date, "message_id": None, "body": "b"}
+
+
+def account(name):
+    return MailboxAccount(name=name, host="imap.test", username=name, password="pw")
+
+
+@pytest.fixture(autouse=True)
+def reset_fakes():
+    FakeConnector.inboxes = {}
+    FakeConnector.failing = set()
+    FakeConnector.active = FakeConnector.peak = 0
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def make_reader(names, **kwargs):
+    return MailboxReader([account(n) for n in names], connector_factory=FakeConnector, **kwargs)
+
+
+def test_poll_interleaves_accounts_round_robin():
+    FakeConnector.inboxes = {
+        "busy": [make_msg(str(i)) for i in range(4)],
+        "quiet": [make_msg("q1")],
+        "other": [make_msg("o1"), make_msg("o2")],
+    }
+    reader = make_reader(["busy", "quiet", "other"])
+    merged = reader.poll()
+
+    assert [(m["account"], m["uid"]) for m in merged] == [
+        ("busy", "0"), ("quiet", "q1"), ("other", "o1"),
+        ("busy", "1"), ("other", "o2"),
+        ("busy", "2"), ("busy", "3"),
+    ]
+
+
+def test_poll_rotates_first_account():
+    FakeConnector.inboxes = {"a": [make_msg("1")], "b": [make_msg("2")]}
+    reader = make_reader(["a", "b"])
+    assert [m["account"] for m in reader.poll()] == ["a", "b"]
+    assert [m["account"] for m in reader.poll()] == ["b", "a"]
+
+
+def test_concurrency_and_open_sessions_are_bounded():
+    FakeConnector.inboxes = {str(i): [make_msg("1")] for i in range(6)}
+    reader = make_reader([str(i) for i in range(6)], max_connections=2)
+    assert len(reader.poll()) == 6
+    assert FakeConnector.peak <= 2
+    connected = [s for s in reader._states.values() if s.connector.conn is not None]
+    assert len(connected) == 2
+    reader.close()
+    assert all(s.connector.conn is None for s in reader._states.values())
+
+
+def test_failing_account_backs_off_without_blocking_others():
+    FakeConnector.inboxes = {"ok": [make_msg("1")], "down": [make_msg("2")]}
+    FakeConnector.failing = {"down"}
+    reader = make_reader(["ok", "down"], base_backoff=60)
+
+    assert [m["account"] for m in reader.poll()] == ["ok"]
+    stats = reader.stats()
+    assert stats["down"]["errors"] == 1
+    assert 25 <= stats["down"]["backoff"] <= 60
+
+    # Still backing off: not polled again
+    reader.poll()
+    assert reader.stats()["down"]["errors"] == 1
+
+    FakeConnector.failing = set()
+    merged = reader.poll(now=time.time() + 61)
+    assert sorted(m["account"] for m in merged) == ["down", "ok"]
+    assert reader.stats()["down"]["backoff"] == 0
+
+
+def test_mark_seen_routes_to_account_and_reconnects():
+    FakeConnector.inboxes = {str(i): [make_msg("1")] for i in range(3)}
+    reader = make_reader(["0", "1", "2"], max_connections=1)
+    merged = reader.poll()
+    for msg in merged:
+        reader.mark_seen(msg)
+    assert all(s.connector.seen == ["1"] for s in reader._states.values())
+    assert reader.poll() == []
+
+
+def test_stats_report_throughput_and_lag():
+    FakeConnector.inboxes = {"a": [make_msg("1"), make_msg("2")]}
+    reader = make_reader(["a"])
+    reader.poll()
+    stats = reader.stats()["a"]
+    assert stats["fetched"] == 2
+    assert stats["throughput"] > 0
+    assert stats["lag"] > 0
+    assert metrics.counter("mailbox.a.fetched") == 2
+
+
+def test_source_id_falls_back_to_account_and_uid():
+    FakeConnector.inboxes = {"a": [make_msg("7")]}
+    reader = make_reader(["a"])
+    msg = reader.poll()[0]
+    assert reader.source_id(msg) == "a:INBOX:7"
+    assert reader.source_id(dict(msg, uidvalidity="3")) == "a:INBOX:3.7"
+    assert reader.source_id(dict(msg, message_id="<x@y>")) == "<x@y>"
+
+
+def test_duplicate_account_names_rejected():
+    with pytest.raises(ValueError):
+        make_reader(["a", "a"])
+
+
+def test_load_accounts_from_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOLLAND_PASS", "secret")
+    path = tmp_path / "mailboxes.json"
+    path.write_text(json.dumps([
+        {"name": "holland", "host": "imap.x", "username": "h@x", "password_env": "HOLLAND_PASS"},
+        {"name": "main", "host": "imap.y", "username": "m@y", "password": "pw", "mailbox": "Tenants"},
+    ]))
+    accounts = load_accounts(str(path))
+    assert accounts[0].password == "secret"
+    assert accounts[1].mailbox == "Tenants"
+
+
+def test_load_accounts_defaults_to_gmail(monkeypatch):
+    monkeypatch.delenv("MAILBOXES_FILE", raising=False)
+    monkeypatch.setenv("USERNAME", "me@gmail.com")
+    [acct] = load_accounts()
+    assert acct.host == "imap.gmail.com"
+    assert acct.username == "me@gmail.com"
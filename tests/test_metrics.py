@@ -0,0 +1,42 @@
+# tests/test_metrics.py
+
+import types
+
+from metrics import Metrics, Histogram, metrics, record_llm_usage
+
+
+def test_histogram_percentiles():
+    hist = Histogram()
+    for v in range(1, 101):
+        hist.observe(v)
+    assert hist.percentile(50) == 50
+    assert hist.percentile(99) == 99
+    assert hist.mean == 50.5
+    assert Histogram().percentile(99) is None
+
+
+def test_counters_and_snapshot():
+    m = Metrics()
+    m.incr("a")
+    m.incr("a", 2)
+    m.observe("lat", 0.5)
+    snap = m.snapshot()
+    assert snap["counters"]["a"] == 3
+    assert snap["histograms"]["lat"]["count"] == 1
+
+
+def test_record_llm_usage_tracks_cached_tokens():
+    metrics.reset()
+    usage = types.SimpleNamespace(
+        prompt_tokens=1200,
+        completion_tokens=80,
+        prompt_tokens_details=types.SimpleNamespace(cached_tokens=1024),
+    )
+    recorded = record_llm_usage("parse", types.SimpleNamespace(usage=usage), latency=0.2)
+    assert recorded == {"prompt_tokens": 1200, "completion_tokens": 80, "cached_tokens": 1024}
+    assert metrics.counter("llm.parse.cached_tokens") == 1024
+    assert metrics.histogram("llm.parse.latency").count == 1
+
+
+def test_record_llm_usage_ignores_missing_usage():
+    assert record_llm_usage("reply", types.SimpleNamespace()) == {}
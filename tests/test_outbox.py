@@ -0,0 +1,110 @@
+# tests/test_outbox.py
+
+import time
+
+import pytest
+
+import sender
+from outbox import Outbox
+from sender import EmailSender
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    box = Outbox(path=str(tmp_path / "replies.db"), max_attempts=2, base_delay=0.0)
+    yield box
+    box.close()
+
+
+class FakeSender:
+    def __init__(self, fail=()):
+        self.sent = []
+        self.fail = set(fail)
+
+    def deliver_batch(self, entries):
+        results = []
+        for e in entries:
+            if e["source_id"] in self.fail:
+                results.append("boom")
+            else:
+                self.sent.append(e)
+                results.append(None)
+        return results
+
+
+def enqueue(box, source_id, ticket_id="T1"):
+    return box.enqueue(source_id, ticket_id, ["t@test.com"], "Re: S", "Body")
+
+
+def test_enqueue_is_idempotent_per_source(outbox):
+    key = enqueue(outbox, "<m1@x>", "T1")
+    # Rerun after a crash: same source, new ticket id
+    assert enqueue(outbox, "<m1@x>", "T2") == key
+    assert outbox.has_source("<m1@x>")
+    assert outbox.stats() == {"pending": 1}
+
+
+def test_drain_delivers_once(outbox):
+    enqueue(outbox, "<m1@x>")
+    enqueue(outbox, "<m2@x>")
+    fake = FakeSender()
+    assert outbox.drain(fake) == 2
+    assert outbox.drain(fake) == 0
+    assert len(fake.sent) == 2
+    assert fake.sent[0]["message_id"] == fake.sent[0]["key"]
+    assert outbox.stats() == {"delivered": 2}
+
+
+def test_failed_sends_retry_then_fail(outbox):
+    enqueue(outbox, "<bad@x>")
+    fake = FakeSender(fail={"<bad@x>"})
+    assert outbox.drain(fake) == 0
+    assert outbox.stats() == {"pending": 1}
+    time.sleep(0.01)
+    outbox.drain(fake)
+    assert outbox.stats() == {"failed": 1}
+
+    assert outbox.requeue_failed() == 1
+    assert outbox.drain(FakeSender()) == 1
+
+
+def test_expired_lease_is_reclaimed(outbox):
+    enqueue(outbox, "<m1@x>")
+    assert len(outbox.claim()) == 1
+    # Claimed rows are hidden until their lease runs out
+    assert outbox.claim() == []
+    assert len(outbox.claim(now=time.time() + outbox.lease_seconds + 1)) == 1
+
+
+def test_outbox_survives_reopen(tmp_path):
+    path = str(tmp_path / "replies.db")
+    box = Outbox(path=path)
+    enqueue(box, "<m1@x>")
+    box.close()
+    reopened = Outbox(path=path)
+    assert reopened.has_source("<m1@x>")
+    reopened.close()
+
+
+def test_deliver_batch_reuses_connection_and_sets_message_id(monkeypatch):
+    calls = {"connect": 0, "ids": []}
+
+    class FakeSMTP:
+        def __init__(self, host, port, timeout=None):
+            calls["connect"] += 1
+        def login(self, user, pw):
+            pass
+        def send_message(self, msg, from_addr=None, to_addrs=None):
+            calls["ids"].append(msg["Message-ID"])
+        def quit(self):
+            pass
+
+    monkeypatch.setattr(sender.smtplib, "SMTP_SSL", FakeSMTP)
+    es = EmailSender("smtp.test", 465, "pm@domos.test", "p")
+    entries = [
+        {"to": ["a@test.com"], "subject": "S", "body": "B", "attempts": 0, "message_id": "a" * 64},
+        {"to": ["b@test.com"], "subject": "S", "body": "B", "attempts": 0, "message_id": "b" * 64},
+    ]
+    assert es.deliver_batch(entries) == [None, None]
+    assert calls["connect"] == 1
+    assert calls["ids"] == [f"<{'a' * 32}@domos.test>", f"<{'b' * 32}@domos.test>"]
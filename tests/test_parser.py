@@ -109,7 +109,7 @@ def test_parse_fallback_on_json_error(monkeypatch):
     })
 
     # Should be the asdict of our dummy dataclass
-    assert result == asdict(dummy)
+    assert result == {**asdict(dummy), "parsed_by": "rules"}
 
 def test_parse_fallback_on_validation_error(monkeypatch):
     # LLM returns well-formed JSON that fails schema validation
@@ -144,7 +144,7 @@ def test_parse_fallback_on_validation_error(monkeypatch):
         "body": "irrelevant"
     })
 
-    assert result == asdict(dummy)
+    assert result == {**asdict(dummy), "parsed_by": "rules"}
 
 @pytest.mark.parametrize("body,expected", [
     # withholding until repair
@@ -165,3 +165,81 @@ def test_normalize_request_type(body, expected):
         "request_type": "general"
     }
     assert parser_llm.normalize_request_type(parsed) == expected
+
+
+def make_cascade_create(responses):
+    """create() double answering per model; exceptions are raised."""
+    calls = []
+
+    def create(model, **kwargs):
+        calls.append((model, kwargs.get("timeout")))
+        answer = responses[model]
+        if isinstance(answer, Exception):
+            raise answer
+        resp = make_mock_resp(json.dumps(answer) if isinstance(answer, dict) else answer)
+        resp.usage = types.SimpleNamespace(prompt_tokens=1000, completion_tokens=100, prompt_tokens_details=None)
+        return resp
+    return create, calls
+
+
+CASCADE_MSG = {"uid": "9", "sender": "Dana <dana@example.com>", "subject": "Sink",
+               "body": "Hi, the sink in Apt 4B at 12 Oak St is leaking."}
+GOOD_PARSE = {"tenant_name": "Dana", "address": "12 Oak St Apt 4B", "request_type": "maintenance",
+              "summary": "Leaking sink", "full_body": CASCADE_MSG["body"]}
+TIERS = [
+    parser.ModelTier("cheap", "mini", timeout=2.0, min_confidence=0.8, prompt_cost=0.15, completion_cost=0.6),
+    parser.ModelTier("strong", "big", timeout=20.0, prompt_cost=2.5, completion_cost=10.0),
+]
+
+
+@pytest.fixture
+def fresh_metrics():
+    from metrics import metrics
+    metrics.reset()
+    return metrics
+
+
+def test_cascade_accepts_cheap_tier_when_confident(monkeypatch, fresh_metrics):
+    create, calls = make_cascade_create({"mini": GOOD_PARSE, "big": GOOD_PARSE})
+    monkeypatch.setattr(parser.openai.chat.completions, "create", create)
+
+    parsed = LLMEmailParser(tiers=TIERS).parse(CASCADE_MSG)
+    assert parsed == {**GOOD_PARSE, "parsed_by": "cheap", "address_key": None}
+    assert calls == [("mini", 2.0)]
+
+
+def test_cascade_escalates_on_invalid_or_implausible_output(monkeypatch, fresh_metrics):
+    # Hallucinated tenant and house number: schema-valid but implausible
+    implausible = {**GOOD_PARSE, "tenant_name": "Zed", "address": "99 Oak St"}
+    for cheap_answer, reason in [("not json", "invalid"), (implausible, "low_confidence")]:
+        create, calls = make_cascade_create({"mini": cheap_answer, "big": GOOD_PARSE})
+        monkeypatch.setattr(parser.openai.chat.completions, "create", create)
+        llm_parser = LLMEmailParser(tiers=TIERS)
+        assert llm_parser.parse(CASCADE_MSG) == {**GOOD_PARSE, "parsed_by": "strong", "address_key": None}
+        assert [model for model, _ in calls] == ["mini", "big"]
+        assert fresh_metrics.counter(f"cascade.cheap.{reason}") == 1
+
+    report = llm_parser.cascade_report()
+    assert report["cheap"]["attempts"] == 2 and report["cheap"]["hit_rate"] == 0
+    assert report["strong"]["hit_rate"] == 1
+    assert report["strong"]["cost_usd"] == pytest.approx(2 * (1000 * 2.5 + 100 * 10.0) / 1e6)
+    assert report["cheap"]["latency"]["count"] == 2
+
+
+def test_confidence_ignores_request_type():
+    # request_type is normalized after the checks, so it cannot make a parse implausible
+    llm_parser = LLMEmailParser(tiers=TIERS)
+    assert llm_parser.confidence(GOOD_PARSE, CASCADE_MSG) == 1.0
+    assert llm_parser.confidence({**GOOD_PARSE, "request_type": "lease"}, CASCADE_MSG) == 1.0
+
+
+def test_cascade_falls_back_to_rules_after_timeouts(monkeypatch, fresh_metrics):
+    timeout = parser.openai.APITimeoutError(request=None)
+    create, calls = make_cascade_create({"mini": timeout, "big": timeout})
+    monkeypatch.setattr(parser.openai.chat.completions, "create", create)
+
+    parsed = LLMEmailParser(tiers=TIERS).parse(CASCADE_MSG)
+    assert parsed["tenant_name"] == "Dana" and parsed["request_type"] == "maintenance"
+    assert len(calls) == 2
+    assert fresh_metrics.counter("cascade.strong.error") == 1
+    assert fresh_metrics.counter("cascade.rules.accepted") == 1
@@ -0,0 +1,87 @@
+# tests/test_priority.py
+
+import threading
+import time
+
+import pytest
+
+from metrics import metrics
+from priority import PriorityScheduler, PriorityScorer
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def make_msg(uid, body, sender="Tenant <t@example.com>"):
+    return {"uid": uid, "sender": sender, "subject": "", "date": None, "body": body}
+
+
+@pytest.mark.parametrize("body,expected", [
+    ("Water is leaking through the ceiling!", "urgent"),
+    ("There is no heat in my apartment", "urgent"),
+    ("My sink is clogged", "normal"),
+    ("Can I renew my lease?", "low"),
+    ("What is my rent balance?", "low"),
+    ("The AC stopped working", "normal"),
+    ("Actually, I have a question about my account", "low"),
+])
+def test_scorer_classes(body, expected):
+    assert PriorityScorer().score(make_msg("1", body))[0] == expected
+
+
+def test_open_tickets_raise_priority():
+    class FakeIndex:
+        def by_tenant(self, name):
+            assert name == "Tenant"
+            return [{"status": "open"}, {"status": "pending"}]
+
+    assert PriorityScorer(index=FakeIndex()).score(make_msg("1", "My sink is clogged"))[0] == "high"
+
+
+def test_urgent_processed_before_earlier_routine_mail():
+    sched = PriorityScheduler()
+    for i in range(5):
+        sched.submit(make_msg(f"r{i}", "What is my rent balance?"))
+    sched.submit(make_msg("u", "Water is flooding the kitchen"))
+
+    order = []
+    sched.run(lambda msg: order.append(msg["uid"]), workers=1)
+    assert order[0] == "u"
+    assert order[1:] == [f"r{i}" for i in range(5)]
+
+    report = sched.report()
+    assert report["urgent"]["count"] == 1
+    assert report["low"]["count"] == 5
+    assert report["low"]["sla_misses"] == 0
+
+
+def test_per_class_concurrency_limit():
+    sched = PriorityScheduler(concurrency={"low": 1})
+    for i in range(6):
+        sched.submit(make_msg(str(i), "What is my rent balance?"))
+
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0}
+
+    def handler(msg):
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(0.01)
+        with lock:
+            state["running"] -= 1
+
+    sched.run(handler, workers=4)
+    assert state["peak"] == 1
+    assert sched.pending() == 0
+
+
+def test_sla_miss_recorded():
+    sched = PriorityScheduler(slas={"low": 0.0})
+    sched.submit(make_msg("1", "What is my rent balance?"), received_at=time.time() - 1)
+    sched.run(lambda msg: None)
+    assert sched.report()["low"]["sla_misses"] == 1
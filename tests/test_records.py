@@ -0,0 +1,30 @@
+# tests/test_records.py
+
+from dataclasses import dataclass
+
+import pytest
+
+from records import as_dict
+from rule_parser import EmailParser
+
+
+def test_as_dict_for_plain_and_slotted_dataclasses():
+    @dataclass
+    class Plain:
+        a: int
+        b: str
+
+    assert as_dict(Plain(1, "x")) == {"a": 1, "b": "x"}
+    parsed = EmailParser().parse({"uid": "1", "sender": "Jo <jo@x.com>", "body": "My heater is broken"})
+    assert as_dict(parsed)["request_type"] == "maintenance"
+    with pytest.raises(TypeError):
+        as_dict({"not": "a dataclass"})
+
+
+def test_as_dict_is_shallow():
+    @dataclass
+    class Holder:
+        items: list
+
+    items = [1, 2]
+    assert as_dict(Holder(items))["items"] is items
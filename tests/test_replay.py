@@ -0,0 +1,150 @@
+# tests/test_replay.py
+
+import json
+import smtplib
+import types
+from email.message import EmailMessage
+
+import pytest
+
+import parser
+import tracing
+from context_loader import ContextLoader
+from inbox import parse_message
+from metrics import metrics
+from parser import LLMEmailParser
+from replay import Corpus, Recorder, ReplayRunner, diff_outputs, email_key, email_scope
+from reply_generator import ReplyGenerator
+from sender import EmailSender
+
+
+def make_raw(i, body):
+    msg = EmailMessage()
+    msg["From"] = f"Tenant {i} <t{i}@example.com>"
+    msg["Subject"] = f"Request {i}"
+    msg["Message-ID"] = f"<m{i}@example.com>"
+    msg.set_content(body)
+    return msg.as_bytes()
+
+
+RAWS = [
+    make_raw(1, "Hi, the sink in Apt 4B at 12 Oak St is leaking."),
+    make_raw(2, "How much rent do I owe this month for 3 Elm St?"),
+]
+
+
+def fake_create(**kwargs):
+    usage = types.SimpleNamespace(prompt_tokens=100, completion_tokens=10, prompt_tokens_details=None)
+    if kwargs.get("stream"):
+        words = ["Thanks, ", "we are ", "on it."]
+        chunks = [types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=w))],
+                                        usage=None) for w in words]
+        return iter(chunks + [types.SimpleNamespace(choices=[], usage=usage)])
+    body = kwargs["messages"][1]["content"]
+    answer = {"tenant_name": "Tenant 1" if "sink" in body else "Tenant 2",
+              "address": "12 Oak St Apt 4B" if "sink" in body else "3 Elm St",
+              "request_type": "maintenance" if "sink" in body else "payment",
+              "summary": "Tenant request", "full_body": body}
+    message = types.SimpleNamespace(content=json.dumps(answer))
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=usage)
+
+
+class FakeSMTP:
+    def __init__(self, host, port, timeout=None):
+        pass
+
+    def login(self, user, password):
+        pass
+
+    def send_message(self, msg, from_addr=None, to_addrs=None):
+        if "Request 2" in msg["Subject"]:
+            raise smtplib.SMTPResponseException(452, "mailbox full")
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def corpus_path(tmp_path, monkeypatch):
+    """Record the pipeline handling RAWS, as main does with REPLAY_RECORD."""
+    monkeypatch.setattr(parser.openai.chat.completions, "create", fake_create)
+    monkeypatch.setattr(smtplib, "SMTP_SSL", FakeSMTP)
+    path = str(tmp_path / "corpus.jsonl.gz")
+    recorder = Recorder(path)
+    recorder.wrap_openai(parser.openai.chat.completions)
+    llm_parser, generator, loader = LLMEmailParser(), ReplyGenerator(), ContextLoader(seed=1)
+    sender = EmailSender("smtp.test", 465, "pm@example.com", "pw", max_retries=1, recorder=recorder)
+    for uid, raw in enumerate(RAWS, 1):
+        fields = parse_message(str(uid), raw)
+        recorder.message(fields, raw)
+        with email_scope(email_key(fields)), tracing.span("email.handle"):
+            parsed = llm_parser.parse(fields)
+            context = loader.load(parsed["tenant_name"], parsed["address"])
+            reply = generator.generate(parsed, context, f"ticket{uid}", stream=True)
+            sender.send_email([fields["sender"]], f"Re: {fields['subject']}", reply)
+    recorder.close()
+    return path
+
+
+def test_corpus_holds_messages_model_calls_and_smtp(corpus_path):
+    corpus = Corpus.load(corpus_path)
+    assert [m["email"] for m in corpus.messages] == ["<m1@example.com>", "<m2@example.com>"]
+    assert corpus.emails()[1]["body"].startswith("How much rent")
+    assert [(r["stage"], r["call"]) for r in corpus.llm] == [("parser.parse", 0), ("reply.generate", 0)] * 2
+    assert corpus.llm[1]["response"]["content"] == "Thanks, we are on it."
+    assert [r["error"] for r in corpus.smtp] == [None, {"code": 452, "message": "mailbox full"}]
+
+
+def test_replay_reproduces_outputs_without_the_network(corpus_path, monkeypatch):
+    def offline(**kwargs):
+        raise AssertionError("replay must not call the model")
+
+    monkeypatch.setattr(parser.openai.chat.completions, "create", offline)
+    monkeypatch.setattr(smtplib, "SMTP_SSL", None)
+    runner = ReplayRunner(Corpus.load(corpus_path))
+    first = runner.run()
+    outputs = first["outputs"]
+
+    assert [o["parsed"]["request_type"] for o in outputs] == ["maintenance", "payment"]
+    assert [o["reply"] for o in outputs] == ["Thanks, we are on it."] * 2
+    assert [o["sent"] for o in outputs] == [True, False]
+    report = first["report"]
+    assert report["emails"] == 2 and report["throughput"] > 0 and report["latency"]["count"] == 2
+    # Parse prompts are identical; reply prompts differ in the ticket id
+    # and are matched by email and stage
+    assert report["llm"] == {"exact": 2, "matched": 2, "missed": 0}
+    assert report["smtp"] == {"replayed": 2, "missed": 0}
+
+    second = runner.run(speed=1000.0)
+    diff = diff_outputs(outputs, second["outputs"])
+    assert diff["compared"] == 2 and diff["replies_changed"] == 0 and diff["parsed_changed"] == {}
+    assert parser.openai.chat.completions.create is offline
+
+
+def test_replay_with_changed_prompt_and_diff(corpus_path, monkeypatch):
+    llm_parser = LLMEmailParser()
+    llm_parser.system_prompt += "\nAlways answer in JSON."
+    runner = ReplayRunner(Corpus.load(corpus_path), parser=llm_parser)
+    result = runner.run()
+    assert result["report"]["llm"] == {"exact": 0, "matched": 4, "missed": 0}
+
+    changed = [dict(o) for o in result["outputs"]]
+    changed[0] = {**changed[0], "parsed": {**changed[0]["parsed"], "request_type": "general"},
+                  "reply": "Thanks, we will be in touch."}
+    diff = diff_outputs(result["outputs"], changed)
+    assert diff["parsed_changed"] == {"request_type": 1}
+    assert diff["replies_changed"] == 1 and 0 < diff["reply_similarity"] < 1
+    assert "+Thanks, we will be in touch." in diff["diffs"][0]
+
+
+def test_replay_misses_fall_back_to_rules(tmp_path):
+    path = str(tmp_path / "messages_only.jsonl.gz")
+    recorder = Recorder(path)
+    recorder.message(parse_message("1", RAWS[0]), RAWS[0])
+    recorder.close()
+    metrics.reset()
+    result = ReplayRunner(Corpus.load(path)).run()
+    [output] = result["outputs"]
+    assert output["parsed"]["request_type"] == "maintenance"
+    assert output["reply"] is None and "ReplayMiss" in output["error"]
+    assert result["report"]["llm"]["missed"] == 2
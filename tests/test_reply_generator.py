@@ -1,5 +1,6 @@
 # tests/test_reply_generator.py
 
+import time
 import types
 import pytest
 
@@ -131,3 +132,145 @@ def test_generate_handles_empty_history(monkeypatch):
                   if hasattr(reply_generator.openai.chat.completions.create, "__wrapped__") \
                   else None
     # We won't assert on wrapped; just ensure no exception above.
+
+def test_generate_keeps_prompt_under_budget(monkeypatch):
+    called = {}
+    def fake_create(**kwargs):
+        called.update(kwargs)
+        return make_mock_resp("OK")
+    monkeypatch.setattr(reply_generator.openai.chat.completions, "create", fake_create)
+
+    budget = reply_generator.TokenBudget(max_prompt_tokens=400, max_body_tokens=100, max_history=3)
+    gen = ReplyGenerator(budget=budget)
+    parsed = {
+        "tenant_name": "Foo",
+        "address": None,
+        "request_type": "maintenance",
+        "summary": "Heater broken",
+        "full_body": "My heater is broken. " + "It is very cold in here. " * 200
+    }
+    context = {
+        "rent_balance": "$0",
+        "lease_end_date": "2026-01-01",
+        "maintenance_history": [
+            {"date": f"2025-01-{i:02d}", "issue": "Clogged sink", "status": "resolved", "id": f"H{i}"}
+            for i in range(1, 29)
+        ]
+    }
+    gen.generate(parsed, context, "T-1")
+
+    system, user = (m["content"] for m in called["messages"])
+    assert budget.count(system) + budget.count(user) <= 400
+    assert user.count("    - 2025-") <= 3
+    assert "My heater is broken." in user
+
+def make_stream_chunk(content):
+    delta = types.SimpleNamespace(content=content)
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(delta=delta)], usage=None)
+
+def test_generate_streaming_joins_deltas(monkeypatch):
+    called = {}
+    def fake_create(**kwargs):
+        called.update(kwargs)
+        usage = types.SimpleNamespace(prompt_tokens=10, completion_tokens=3, prompt_tokens_details=None)
+        return iter([
+            make_stream_chunk("Hello "),
+            make_stream_chunk(None),
+            make_stream_chunk("Tenant"),
+            types.SimpleNamespace(choices=[], usage=usage),
+        ])
+    monkeypatch.setattr(reply_generator.openai.chat.completions, "create", fake_create)
+
+    gen = ReplyGenerator()
+    parsed = {
+        "tenant_name": "Foo",
+        "address": None,
+        "request_type": "general",
+        "summary": "Hello?",
+        "full_body": "Just checking in."
+    }
+    context = {"rent_balance": "$0", "lease_end_date": "2026-01-01", "maintenance_history": []}
+
+    assert list(gen.stream(parsed, context, "T-1")) == ["Hello ", "Tenant"]
+    assert gen.generate(parsed, context, "T-1", stream=True) == "Hello Tenant"
+    assert called["stream"] is True
+
+class FakeStream:
+    def __init__(self, chunks, first_delay=0.0):
+        self.chunks = chunks
+        self.first_delay = first_delay
+        self.closed = False
+
+    def __iter__(self):
+        time.sleep(self.first_delay)
+        return iter(self.chunks)
+
+    def close(self):
+        self.closed = True
+
+def test_stream_hedges_on_first_token_and_closes_the_loser(monkeypatch):
+    from hedging import HedgedCaller, HedgePolicy
+    streams = []
+    def fake_create(**kwargs):
+        # The first stream stalls before its first token
+        stream = FakeStream([make_stream_chunk(f"reply {len(streams)}")], 0.5 if not streams else 0.0)
+        streams.append(stream)
+        return stream
+    monkeypatch.setattr(reply_generator.openai.chat.completions, "create", fake_create)
+
+    policy = HedgePolicy(budget=1.0, min_samples=1, min_delay=0.01)
+    policy.observe("reply.stream", 0.01)
+    gen = ReplyGenerator(hedger=HedgedCaller(policy))
+    parsed = {"tenant_name": "Foo", "address": None, "request_type": "general",
+              "summary": "Hello?", "full_body": "Just checking in."}
+    context = {"rent_balance": "$0", "lease_end_date": "2026-01-01", "maintenance_history": []}
+
+    assert gen.generate(parsed, context, "T-1", stream=True) == "reply 1"
+    time.sleep(0.6)
+    assert streams[0].closed and not streams[1].closed
+
+class BrokenStream:
+    """Yields its chunks, then fails mid-stream."""
+    def __init__(self, chunks, error):
+        self.chunks = chunks
+        self.error = error
+
+    def __iter__(self):
+        yield from self.chunks
+        raise self.error
+
+def test_stream_failure_mid_read_counts_against_the_breaker(monkeypatch):
+    from circuit_breaker import CircuitBreaker, CircuitOpen, llm_failure
+    openai = reply_generator.openai
+    error = openai.APIConnectionError(request=None)
+    monkeypatch.setattr(
+        openai.chat.completions, "create",
+        lambda **kwargs: BrokenStream([make_stream_chunk("Hello ")], error)
+    )
+    breaker = CircuitBreaker("llm", min_calls=1, is_failure=llm_failure)
+    gen = ReplyGenerator(breaker=breaker)
+    parsed = {"tenant_name": "Foo", "address": None, "request_type": "general",
+              "summary": "Hello?", "full_body": "Just checking in."}
+    context = {"rent_balance": "$0", "lease_end_date": "2026-01-01", "maintenance_history": []}
+
+    with pytest.raises(openai.APIConnectionError):
+        list(gen.stream(parsed, context, "T-1"))
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpen):
+        next(gen.stream(parsed, context, "T-1"))
+
+def test_stream_timeout_mid_read_reports_the_deadline(monkeypatch):
+    import deadlines
+    openai = reply_generator.openai
+    monkeypatch.setattr(
+        openai.chat.completions, "create",
+        lambda **kwargs: BrokenStream([make_stream_chunk("Hello ")], openai.APITimeoutError(request=None))
+    )
+    monkeypatch.setattr(deadlines, "expired", lambda: True)
+    gen = ReplyGenerator()
+    parsed = {"tenant_name": "Foo", "address": None, "request_type": "general",
+              "summary": "Hello?", "full_body": "Just checking in."}
+    context = {"rent_balance": "$0", "lease_end_date": "2026-01-01", "maintenance_history": []}
+
+    with pytest.raises(deadlines.DeadlineExceeded):
+        gen.generate(parsed, context, "T-1", stream=True)
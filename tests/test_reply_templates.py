@@ -0,0 +1,77 @@
+# tests/test_reply_templates.py
+
+import pytest
+
+from metrics import metrics
+from reply_templates import ReplyRouter, TemplateEngine, TemplatePolicy
+
+
+class FakeGenerator:
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, parsed, context, ticket_id, stream=False):
+        self.calls += 1
+        return "LLM reply"
+
+
+def make_parsed(request_type, body):
+    return {
+        "tenant_name": "Jane",
+        "address": "1 Main St",
+        "request_type": request_type,
+        "summary": body.splitlines()[0],
+        "full_body": body,
+    }
+
+
+CONTEXT = {"rent_balance": "$1,200", "lease_end_date": "2026-01-31", "maintenance_history": []}
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_render_payment_template():
+    reply = TemplateEngine().render(make_parsed("payment", "What is my balance?"), CONTEXT, "abc123")
+    assert reply.startswith("Hi Jane,")
+    assert "$1,200" in reply
+    assert "abc123" in reply
+    assert reply.endswith("Domos Property Management Team")
+
+
+def test_render_returns_none_without_template():
+    assert TemplateEngine().render(make_parsed("general", "Hello"), CONTEXT, "abc") is None
+
+
+@pytest.mark.parametrize("request_type,body,expected", [
+    ("payment", "Hi, what is my current balance?", True),
+    ("lease", "When does my lease end?", True),
+    ("maintenance", "My kitchen sink is clogged.", True),
+    ("payment", "I was charged twice this month, please refund me.", False),
+    ("lease", "Can I renew my lease for two years?", False),
+    ("maintenance", "Water is flooding through the ceiling!", False),
+    ("maintenance", "The oven door gasket is broken.", True),
+    ("maintenance", "The fireplace damper is broken.", True),
+    ("maintenance", "I smell gas near the broken stove.", False),
+    ("general", "Hello there", False),
+    ("payment", "What is my balance? " + "blah " * 100, False),
+])
+def test_policy(request_type, body, expected):
+    assert TemplatePolicy().use_template(make_parsed(request_type, body), CONTEXT) is expected
+
+
+def test_router_counts_template_fraction():
+    gen = FakeGenerator()
+    router = ReplyRouter(gen)
+
+    templated = router.reply(make_parsed("payment", "What is my balance?"), CONTEXT, "T1")
+    llm = router.reply(make_parsed("general", "Can I get a parking spot?"), CONTEXT, "T2")
+
+    assert "T1" in templated
+    assert llm == "LLM reply"
+    assert gen.calls == 1
+    assert ReplyRouter.template_fraction() == 0.5
@@ -17,7 +17,7 @@ def test_send_email_success(monkeypatch):
 
     # Fake SMTP that always succeeds
     class FakeSMTP:
-        def __init__(self, host, port):
+        def __init__(self, host, port, timeout=None):
             assert host == "smtp.test" and port == 465
         def login(self, user, pw):
             calls["login"] += 1
@@ -63,7 +63,7 @@ def test_send_email_retry_on_smtp_exception(monkeypatch):
     call_count = {"i": 0}
 
     class FakeSMTP:
-        def __init__(self, host, port):
+        def __init__(self, host, port, timeout=None):
             pass
         def login(self, user, pw):
             pass
@@ -103,7 +103,7 @@ def test_send_email_all_failures(monkeypatch):
     call_count = {"i": 0}
 
     class FakeSMTPAlwaysFail:
-        def __init__(self, host, port):
+        def __init__(self, host, port, timeout=None):
             pass
         def login(self, user, pw):
             pass
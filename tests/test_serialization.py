@@ -0,0 +1,71 @@
+# tests/test_serialization.py
+
+import json
+import types
+
+import pytest
+from jsonschema import ValidationError
+
+import serialization
+from validator import validate_email_data
+
+
+@pytest.fixture(params=["fast", "stdlib"])
+def backend(request, monkeypatch):
+    if request.param == "stdlib":
+        monkeypatch.setattr(serialization, "orjson", None)
+    elif serialization.orjson is None:
+        pytest.skip("orjson not installed")
+    return request.param
+
+
+def make_valid():
+    return {
+        "tenant_name": "Alice",
+        "address": None,
+        "request_type": "payment",
+        "summary": "When is rent due?",
+        "full_body": "Hi, when is rent due? — Alice",
+    }
+
+
+def test_roundtrip(backend):
+    data = {"id": "abc", "nested": {"list": [1, 2, None]}, "text": "é"}
+    assert serialization.loads(serialization.dumps(data)) == data
+    assert serialization.loads(serialization.dumps_bytes(data, compact=True)) == data
+
+
+def test_indented_vs_compact(backend):
+    data = {"a": 1, "b": [1, 2]}
+    assert serialization.dumps(data, compact=True) == '{"a":1,"b":[1,2]}'
+    assert "\n  " in serialization.dumps(data)
+
+
+def test_decode_error_is_stdlib_error(backend):
+    with pytest.raises(json.JSONDecodeError):
+        serialization.loads("NOT A JSON")
+
+
+def test_validate_accepts_valid():
+    validate_email_data(make_valid())
+
+
+@pytest.mark.parametrize("mutate", [
+    lambda d: d.pop("request_type"),
+    lambda d: d.update(request_type="other"),
+    lambda d: d.update(tenant_name=""),
+    lambda d: d.update(address=5),
+    lambda d: d.update(extra="field"),
+    lambda d: d.update(summary=None),
+])
+def test_validate_rejects_invalid(mutate):
+    data = make_valid()
+    mutate(data)
+    with pytest.raises(ValidationError):
+        validate_email_data(data)
+
+
+def test_validate_rejects_what_jsonschema_alone_would_accept():
+    # jsonschema treats any mapping as an object, the fast check does not
+    with pytest.raises(ValidationError):
+        validate_email_data(types.MappingProxyType(make_valid()))
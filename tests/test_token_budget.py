@@ -0,0 +1,92 @@
+# tests/test_token_budget.py
+
+import pytest
+
+from token_budget import TokenBudget, count_tokens
+
+
+def make_history(n):
+    return [
+        {"id": f"T{i}", "issue": "Clogged sink", "status": "resolved", "date": f"2025-01-{i + 1:02d}"}
+        for i in range(n)
+    ]
+
+
+def test_count_tokens_empty_and_nonempty():
+    assert count_tokens("") == 0
+    assert count_tokens("My sink is leaking.") > 0
+
+
+def test_truncate_fits_budget():
+    budget = TokenBudget()
+    text = "word " * 500
+    cut = budget.truncate(text, 50)
+    assert budget.count(cut) <= 50
+    assert cut.endswith("[...]")
+
+
+def test_compact_text_keeps_opening_and_keyword_sentences():
+    budget = TokenBudget()
+    filler = " ".join(f"Sentence number {i} is about nothing much." for i in range(40))
+    text = "Hello there. " + filler + " The toilet is leaking again."
+    compact = budget.compact_text(text, 30)
+    assert budget.count(compact) <= 30
+    assert compact.startswith("Hello there.")
+    assert "toilet is leaking" in compact
+
+
+def test_select_history_prefers_open_and_relevant():
+    budget = TokenBudget(max_history=2)
+    history = make_history(6) + [
+        {"id": "OPEN", "issue": "Broken heater", "status": "open", "date": "2024-01-01"},
+        {"id": "REL", "issue": "Leaky faucet", "status": "resolved", "date": "2023-01-01"},
+    ]
+    selected = budget.select_history(history, query="The faucet is dripping")
+    assert [t["id"] for t in selected] == ["OPEN", "REL"]
+
+
+def test_fit_drops_history_then_compacts_body():
+    budget = TokenBudget(max_prompt_tokens=120, max_body_tokens=1000, max_history=50)
+
+    def render(body, history):
+        lines = "".join(f"- {t['date']}: {t['issue']} ({t['status']}, id {t['id']})\n" for t in history)
+        return f"Body:\n{body}\nHistory:\n{lines}"
+
+    prompt, total = budget.fit("System prompt.", "Please fix my sink. " * 100, make_history(30), render)
+    assert total <= 120
+    assert total == budget.count("System prompt.") + budget.count(prompt)
+
+
+def test_fit_drops_lowest_ranked_history_and_truncates_body():
+    budget = TokenBudget(max_prompt_tokens=60, max_body_tokens=1000, max_history=50)
+
+    def render(body, history):
+        lines = "".join(f"- {t['date']}: {t['issue']} ({t['status']}, id {t['id']})\n" for t in history)
+        return f"Body:\n{body}\nHistory:\n{lines}"
+
+    history = make_history(3) + [{"id": "OPEN", "issue": "Broken heater", "status": "open", "date": "2020-01-01"}]
+    prompt, total = budget.fit("System prompt.", "Hi.", history, render, query="heater")
+    assert total <= 60
+    assert "id OPEN" in prompt
+
+    # No history left to drop and a body without sentence breaks
+    prompt, total = budget.fit("System prompt.", "word " * 500, [], render)
+    assert total <= 60
+    assert "word" in prompt
+
+
+@pytest.mark.parametrize("max_tokens", range(0, 8))
+def test_truncate_never_exceeds_budget(max_tokens):
+    budget = TokenBudget()
+    cut = budget.truncate("Hi there friend, the sink leaks again", max_tokens)
+    assert budget.count(cut) <= max_tokens
+
+
+@pytest.mark.parametrize("max_prompt_tokens", range(3, 12))
+def test_fit_terminates_when_the_marker_does_not_fit(max_prompt_tokens):
+    budget = TokenBudget(max_prompt_tokens=max_prompt_tokens)
+    prompt, total = budget.fit("Sys.", "Hi there friend", [], lambda b, h: "Body: " + b)
+    assert prompt.startswith("Body: ")
+    if total > max_prompt_tokens:
+        # Only the fixed parts of the prompt are left
+        assert prompt == "Body: "
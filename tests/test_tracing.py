@@ -0,0 +1,145 @@
+# tests/test_tracing.py
+
+import json
+import time
+import random
+import sqlite3
+import threading
+
+import pytest
+
+import tracing
+from outbox import Outbox
+from profiling import ProfileSwitch, SamplingProfiler
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracing.configure(path=str(path))
+    yield path
+    tracing.configure(path=None, endpoint=None)
+
+
+def exported_spans(path):
+    tracing.tracer.flush()
+    spans = []
+    for line in path.read_text().splitlines():
+        for resource in json.loads(line)["resourceSpans"]:
+            for scope in resource["scopeSpans"]:
+                spans.extend(scope["spans"])
+    return {s["name"]: s for s in spans}
+
+
+class Stage:
+    @tracing.traced("stage.run")
+    def run(self, fail=False):
+        tracing.set_attributes(items=2)
+        if fail:
+            raise ValueError("bad input")
+
+
+def test_spans_nest_and_resume_from_traceparent(trace_file):
+    with tracing.span("imap.fetch") as fetch:
+        carried = fetch.traceparent
+    # Later, in another stage, with no current span
+    with tracing.span("email.handle", carried) as handle:
+        Stage().run()
+    assert tracing.current_span() is None
+
+    spans = exported_spans(trace_file)
+    assert handle.trace_id == fetch.trace_id
+    assert spans["email.handle"]["parentSpanId"] == fetch.span_id
+    assert spans["stage.run"]["parentSpanId"] == handle.span_id
+    assert spans["stage.run"]["traceId"] == fetch.trace_id
+    assert "parentSpanId" not in spans["imap.fetch"]
+    assert spans["stage.run"]["attributes"] == [{"key": "items", "value": {"intValue": "2"}}]
+    assert int(spans["stage.run"]["endTimeUnixNano"]) >= int(spans["stage.run"]["startTimeUnixNano"])
+
+
+def test_errors_mark_the_span(trace_file):
+    with pytest.raises(ValueError):
+        Stage().run(fail=True)
+    status = exported_spans(trace_file)["stage.run"]["status"]
+    assert status == {"code": 2, "message": "ValueError: bad input"}
+
+
+def test_export_runs_off_the_calling_thread():
+    class SlowExporter:
+        def __init__(self):
+            self.release = threading.Event()
+            self.exported = []
+
+        def export(self, spans):
+            self.release.wait(5)
+            self.exported.extend(s.name for s in spans)
+
+    exporter = SlowExporter()
+    tracer = tracing.Tracer(exporter, batch_size=1)
+    start = time.perf_counter()
+    for name in ("a", "b"):
+        with tracer.span(name):
+            pass
+    assert time.perf_counter() - start < 1.0
+    assert exporter.exported == []
+
+    exporter.release.set()
+    tracer.flush()
+    assert exporter.exported == ["a", "b"]
+
+
+def test_invalid_traceparent_starts_a_new_trace():
+    with tracing.span("x", "garbage") as span:
+        assert span.parent_id is None and len(span.trace_id) == 32
+
+
+def test_outbox_keeps_traceparent(tmp_path):
+    outbox = Outbox(path=str(tmp_path / "o.db"))
+    outbox.enqueue("s1", "T1", ["a@b.c"], "Re: x", "body", traceparent="00-" + "a" * 32 + "-" + "b" * 16 + "-01")
+    [entry] = outbox.claim()
+    assert entry["traceparent"].startswith("00-aaaa")
+    outbox.close()
+
+
+def test_outbox_adds_column_to_old_databases(tmp_path):
+    path = str(tmp_path / "old.db")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE outbox (key TEXT PRIMARY KEY, source_id TEXT NOT NULL UNIQUE, "
+               "ticket_id TEXT, recipients TEXT NOT NULL, cc TEXT, subject TEXT NOT NULL, "
+               "body TEXT NOT NULL, from_addr TEXT, status TEXT NOT NULL DEFAULT 'pending', "
+               "attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL, "
+               "lease_until REAL, last_error TEXT, created_at REAL NOT NULL, delivered_at REAL)")
+    db.close()
+    outbox = Outbox(path=path)
+    outbox.enqueue("s1", "T1", ["a@b.c"], "Re: x", "body")
+    assert outbox.claim()[0]["traceparent"] is None
+    outbox.close()
+
+
+def test_profile_rate_follows_control_file(tmp_path):
+    control = tmp_path / "rate"
+    switch = ProfileSwitch(control_file=str(control), default=0.0, output_dir=str(tmp_path),
+                           rng=random.Random(1))
+    assert not any(switch.sampled() for _ in range(50))
+
+    control.write_text("1")
+    with tracing.span("email.handle") as span:
+        with switch.maybe_profile() as path:
+            sum(i * i for i in range(200_000))
+    assert path == str(tmp_path / f"{span.trace_id}.folded")
+    assert span.attributes["profile.path"] == path
+
+    control.unlink()
+    assert switch.rate == 0.0
+
+
+def test_sampling_profiler_collects_folded_stacks():
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    deadline = time.monotonic() + 0.1
+    while time.monotonic() < deadline:
+        pass
+    profiler.stop()
+    folded = profiler.folded()
+    assert "test_sampling_profiler_collects_folded_stacks (test_tracing.py:" in folded
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in folded.splitlines())
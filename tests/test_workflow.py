@@ -118,3 +118,23 @@ def test_process_end_to_end(tmp_path):
     content = json.loads(filepath.read_text())
     expected = trigger.create_action_item(parsed, context)
     assert content == expected
+
+def test_process_batched_until_flush(tmp_path):
+    outdir = tmp_path / "batched"
+    trigger = WorkflowTrigger(output_dir=str(outdir), batch_size=10)
+
+    returned_id = trigger.process(make_sample_parsed(), make_sample_context())
+    assert returned_id == "TESTID1234"
+    assert not (outdir / "TESTID1234.json").exists()
+
+    assert trigger.flush() == [str(outdir / "TESTID1234.json")]
+    content = json.loads((outdir / "TESTID1234.json").read_text())
+    assert content["summary"] == "The kitchen faucet is leaking"
+
+def test_action_item_keeps_raw_subject_and_body():
+    trigger = WorkflowTrigger(output_dir="test_action_items_directory")
+    msg = {"uid": "1", "subject": "Kitchen", "body": "Hi, the kitchen faucet drips all night."}
+    item = trigger.create_action_item(make_sample_parsed(), make_sample_context(), msg)
+    assert item["subject"] == "Kitchen"
+    assert item["body"] == msg["body"]
+    assert item["summary"] == "The kitchen faucet is leaking"
@@ -0,0 +1,210 @@
+# token_budget.py
+
+import re
+import logging
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+# Words that make a sentence worth keeping when a body is summarised
+_KEYWORDS = {
+    "leak", "leaking", "repair", "broken", "fix", "clog", "clogged", "lock",
+    "heat", "heater", "heating", "toilet", "sink", "water", "electric",
+    "rent", "balance", "pay", "payment", "due", "invoice", "late",
+    "lease", "renew", "agreement", "extend", "move", "ticket", "urgent",
+}
+_OPEN_STATUSES = ("open", "in_progress")
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: Optional[str]):
+    # Imported on first use: tiktoken is optional and slow to load
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("o200k_base")
+    except Exception:
+        try:
+            return tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            # No cached BPE file and no network
+            logger.warning("tiktoken unavailable, using heuristic token counts: %s", e)
+            return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Count tokens with tiktoken when installed, otherwise estimate them
+    from word pieces (long words count as one token per 4 characters).
+    """
+    if not text:
+        return 0
+    enc = _encoding(model)
+    if enc is not None:
+        return len(enc.encode(text))
+    return sum((len(w) + 3) // 4 for w in _WORD_RE.findall(text))
+
+
+class TokenBudget:
+    """
+    Keeps reply prompts under a token budget by compacting the tenant's
+    message and selecting the most relevant maintenance history.
+    """
+    def __init__(
+        self,
+        max_prompt_tokens: int = 1500,
+        max_body_tokens: int = 600,
+        max_history: int = 5,
+        model: Optional[str] = None
+    ):
+        """
+        :param max_prompt_tokens: Budget for system + user prompt combined.
+        :param max_body_tokens: Budget for the tenant's message on its own.
+        :param max_history: Max maintenance history entries kept.
+        :param model: Model name used to pick the tiktoken encoding.
+        """
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_body_tokens = max_body_tokens
+        self.max_history = max_history
+        self.model = model
+
+    def count(self, text: str) -> int:
+        return count_tokens(text, self.model)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """
+        Cut `text` on a word boundary so it fits in `max_tokens`, marking
+        the cut with " [...]" when there is room for it. The result never
+        exceeds `max_tokens`, and is "" when not even one word fits.
+        """
+        if max_tokens <= 0:
+            return ""
+        total = self.count(text)
+        if total <= max_tokens:
+            return text
+        marker = " [...]"
+        limit = max_tokens - self.count(marker)
+        if limit <= 0:
+            marker, limit = "", max_tokens
+        cut = int(len(text) * limit / total)
+        while cut > 0:
+            head = text[:cut].rsplit(None, 1)[0] if " " in text[:cut] else text[:cut]
+            result = head.rstrip() + marker
+            if self.count(head) <= limit and self.count(result) <= max_tokens:
+                return result
+            cut = min(int(cut * 0.9), cut - 1)
+        return ""
+
+    def compact_text(self, text: str, max_tokens: int) -> str:
+        """
+        Extractive summary: keep the opening sentence plus the sentences
+        mentioning request keywords, in original order, until the budget
+        is spent. Falls back to truncation for a single long sentence.
+        """
+        if self.count(text) <= max_tokens:
+            return text
+        sentences = [s.strip() for s in _SENTENCE_RE.split(text) if s and s.strip()]
+        if len(sentences) <= 1:
+            return self.truncate(text, max_tokens)
+
+        def score(i: int, sentence: str) -> tuple:
+            words = set(w.lower() for w in _WORD_RE.findall(sentence))
+            return (i == 0, len(words & _KEYWORDS), -i)
+
+        ranked = sorted(range(len(sentences)), key=lambda i: score(i, sentences[i]), reverse=True)
+        chosen, used = set(), 0
+        for i in ranked:
+            cost = self.count(sentences[i]) + 1
+            if used + cost > max_tokens:
+                continue
+            chosen.add(i)
+            used += cost
+        if not chosen:
+            return self.truncate(text, max_tokens)
+        return " ".join(sentences[i] for i in sorted(chosen))
+
+    def select_history(
+        self,
+        history: List[Dict[str, Any]],
+        query: str = "",
+        max_entries: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Keep the most useful history entries: open tickets first, then
+        entries whose issue shares words with `query`, then the most
+        recent. The selection is returned newest first.
+        """
+        limit = self.max_history if max_entries is None else max_entries
+        if len(history) <= limit:
+            return list(history)
+        rank = self._history_rank(query)
+        selected = sorted(history, key=rank, reverse=True)[:limit]
+        return sorted(selected, key=lambda t: t.get("date", ""), reverse=True)
+
+    @staticmethod
+    def _history_rank(query: str) -> Callable[[Dict[str, Any]], tuple]:
+        query_words = set(w.lower() for w in _WORD_RE.findall(query or ""))
+
+        def rank(ticket: Dict[str, Any]) -> tuple:
+            issue_words = set(w.lower() for w in _WORD_RE.findall(ticket.get("issue", "")))
+            return (
+                ticket.get("status") in _OPEN_STATUSES,
+                len(issue_words & query_words),
+                ticket.get("date", ""),
+            )
+        return rank
+
+    def fit(
+        self,
+        system_prompt: str,
+        body: str,
+        history: List[Dict[str, Any]],
+        render: Callable[[str, List[Dict[str, Any]]], str],
+        query: str = ""
+    ) -> tuple[str, int]:
+        """
+        Render the user prompt with `render(body, history)` so that the
+        system prompt plus user prompt stay under `max_prompt_tokens`.
+
+        History entries are dropped first, lowest ranked (see
+        select_history()) first, then the body is compacted and finally
+        truncated. Returns the user prompt and the total prompt tokens;
+        the total only exceeds the budget if the prompt without any body
+        or history already does.
+        """
+        fixed = self.count(system_prompt)
+        body = self.compact_text(body, self.max_body_tokens)
+        history = self.select_history(history, query)
+        rank = self._history_rank(query)
+        prompt = render(body, history)
+        total = fixed + self.count(prompt)
+
+        while total > self.max_prompt_tokens and history:
+            dropped = min(history, key=rank)
+            history = [t for t in history if t is not dropped]
+            prompt = render(body, history)
+            total = fixed + self.count(prompt)
+
+        if total > self.max_prompt_tokens:
+            overflow = total - self.max_prompt_tokens
+            body = self.compact_text(body, max(self.count(body) - overflow, 0))
+            prompt = render(body, history)
+            total = fixed + self.count(prompt)
+
+        while total > self.max_prompt_tokens and body:
+            overflow = total - self.max_prompt_tokens
+            shorter = self.truncate(body, self.count(body) - overflow)
+            if self.count(shorter) >= self.count(body):
+                # Cannot shrink any further; give up rather than spin
+                break
+            body = shorter
+            prompt = render(body, history)
+            total = fixed + self.count(prompt)
+
+        return prompt, total
@@ -0,0 +1,295 @@
+# tracing.py
+
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import secrets
+import threading
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "domos-assistant"
+
+# OTLP enums
+_KIND_INTERNAL = 1
+_STATUS_OK = 1
+_STATUS_ERROR = 2
+
+
+class Span:
+    """
+    One timed operation. Spans of the same email share a trace_id and
+    nest through parent_id.
+    """
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns",
+                 "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+
+    @property
+    def traceparent(self) -> str:
+        """W3C traceparent header value, to carry this span across stages."""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    @property
+    def duration(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": _KIND_INTERNAL,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": _STATUS_ERROR, "message": self.error} if self.error else {"code": _STATUS_OK},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def otlp_request(spans: List[Span]) -> Dict[str, Any]:
+    """
+    An OTLP/JSON ExportTraceServiceRequest for `spans`.
+    """
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+            "scopeSpans": [{
+                "scope": {"name": "tracing"},
+                "spans": [s.to_otlp() for s in spans],
+            }],
+        }]
+    }
+
+
+class FileExporter:
+    """
+    Appends one OTLP/JSON export request per line, the format read by the
+    OpenTelemetry Collector's otlpjsonfile receiver.
+    """
+    def __init__(self, path: str = "traces/traces.jsonl"):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]) -> None:
+        line = json.dumps(otlp_request(spans), separators=(",", ":"))
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class HTTPExporter:
+    """
+    Posts OTLP/JSON to a collector, e.g. http://localhost:4318/v1/traces.
+    Export errors are logged and the spans dropped.
+    """
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def export(self, spans: List[Span]) -> None:
+        import urllib.request  # only needed with a collector; keeps startup light
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(otlp_request(spans)).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout):
+                pass
+        except OSError as e:
+            logger.warning("Dropped %d spans, collector unreachable: %s", len(spans), e)
+
+
+_current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """
+    Creates spans, tracks the current one per thread/context and hands
+    finished spans to the exporter in batches. Without an exporter spans
+    are still created (so trace ids flow through the pipeline) but dropped.
+
+    Batches are exported on a background thread, like log records (see
+    logger.py), so a slow collector never holds up an email. If more
+    than `max_queued_batches` are waiting, new batches are dropped.
+    """
+    def __init__(self, exporter=None, batch_size: int = 64, max_queued_batches: int = 16):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self._finished: List[Span] = []
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[List[Span]]" = queue.Queue(maxsize=max_queued_batches)
+        self._thread: Optional[threading.Thread] = None
+
+    @contextmanager
+    def span(self, name: str, traceparent: Optional[str] = None, **attributes: Any) -> Iterator[Span]:
+        """
+        Run the block in a new span, a child of the current span, of
+        `traceparent` if given, or else the root of a new trace.
+        """
+        span = self.start(name, traceparent, **attributes)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current.reset(token)
+            self.end(span)
+
+    def start(self, name: str, traceparent: Optional[str] = None, **attributes: Any) -> Span:
+        """
+        Start a span without making it current; finish it with end().
+        """
+        parent = _parse_traceparent(traceparent) if traceparent else None
+        if parent is None:
+            current = _current.get()
+            parent = (current.trace_id, current.span_id) if current else (secrets.token_hex(16), None)
+        span = Span(name, parent[0], parent[1])
+        span.attributes.update(attributes)
+        return span
+
+    def end(self, span: Span) -> None:
+        span.end_ns = time.time_ns()
+        if self.exporter is None:
+            return
+        with self._lock:
+            self._finished.append(span)
+            if len(self._finished) < self.batch_size:
+                return
+            batch, self._finished = self._finished, []
+        self._submit(batch)
+
+    def flush(self) -> None:
+        """
+        Export the spans finished so far and wait until every queued
+        batch has been exported.
+        """
+        with self._lock:
+            batch, self._finished = self._finished, []
+        if batch:
+            self._submit(batch, block=True)
+        if self._thread is not None:
+            self._queue.join()
+
+    def _submit(self, batch: List[Span], block: bool = False) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+        try:
+            self._queue.put(batch, block=block)
+        except queue.Full:
+            logger.warning("Dropped %d spans, export queue full", len(batch))
+
+    def _run(self) -> None:
+        while True:
+            batch = self._queue.get()
+            try:
+                self._export(batch)
+            finally:
+                self._queue.task_done()
+
+    def _export(self, batch: List[Span]) -> None:
+        exporter = self.exporter
+        if exporter is None:
+            return
+        try:
+            exporter.export(batch)
+        except Exception as e:
+            logger.warning("Failed to export %d spans: %s", len(batch), e)
+
+
+def _parse_traceparent(value: str):
+    parts = value.split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2]
+
+
+tracer = Tracer()
+atexit.register(lambda: tracer.flush())
+
+
+def configure(path: Optional[str] = None, endpoint: Optional[str] = None) -> Tracer:
+    """
+    Export spans to an OTLP/JSON lines file or a collector endpoint.
+    Defaults to $TRACE_FILE / $OTLP_ENDPOINT; with neither, spans are dropped.
+    """
+    tracer.flush()
+    path = path or os.environ.get("TRACE_FILE")
+    endpoint = endpoint or os.environ.get("OTLP_ENDPOINT")
+    if endpoint:
+        tracer.exporter = HTTPExporter(endpoint)
+    elif path:
+        tracer.exporter = FileExporter(path)
+    else:
+        tracer.exporter = None
+    return tracer
+
+
+def span(name: str, traceparent: Optional[str] = None, **attributes: Any):
+    return tracer.span(name, traceparent, **attributes)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def set_attributes(**attributes: Any) -> None:
+    """
+    Add attributes to the current span, if any.
+    """
+    current = _current.get()
+    if current is not None:
+        current.attributes.update(attributes)
+
+
+def traced(name: str) -> Callable:
+    """
+    Decorator running the function in a span called `name`.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,6 +1,6 @@
 # validation.py
 
-from jsonschema import validate
+from functools import lru_cache
 
 EMAIL_SCHEMA = {
     "type": "object",
@@ -16,8 +16,47 @@ EMAIL_SCHEMA = {
     "additionalProperties": False
 }
 
+_REQUIRED = frozenset(EMAIL_SCHEMA["required"])
+_REQUEST_TYPES = frozenset(EMAIL_SCHEMA["properties"]["request_type"]["enum"])
+
+
+@lru_cache(maxsize=None)
+def _validator():
+    # Built once, and only when invalid data needs a detailed error;
+    # jsonschema.validate() re-checks the schema and builds a new
+    # validator on every call.
+    from jsonschema import Draft202012Validator
+    return Draft202012Validator(EMAIL_SCHEMA)
+
+
+def _is_valid(data) -> bool:
+    """
+    Precompiled equivalent of EMAIL_SCHEMA for the common (valid) case.
+    """
+    return (
+        isinstance(data, dict)
+        and data.keys() == _REQUIRED
+        and isinstance(data["tenant_name"], str) and len(data["tenant_name"]) >= 1
+        and (data["address"] is None or isinstance(data["address"], str))
+        and isinstance(data["request_type"], str) and data["request_type"] in _REQUEST_TYPES
+        and isinstance(data["summary"], str) and len(data["summary"]) >= 1
+        and isinstance(data["full_body"], str) and len(data["full_body"]) >= 1
+    )
+
+
 def validate_email_data(data: dict) -> None:
     """
     Raises ValidationError if `data` doesn't match EMAIL_SCHEMA.
+
+    Valid data is accepted by a hand-compiled check; only invalid data
+    goes through the jsonschema validator to build a detailed error.
+    Data the hand-compiled check rejects is never accepted, even where
+    jsonschema is more lenient (e.g. a mapping that is not a dict).
     """
-    validate(instance=data, schema=EMAIL_SCHEMA)
+    if _is_valid(data):
+        return
+    from jsonschema.exceptions import ValidationError, best_match
+    error = best_match(_validator().iter_errors(data))
+    if error is None:
+        error = ValidationError(f"{type(data).__name__} does not match the email schema")
+    raise error
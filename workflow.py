@@ -1,10 +1,11 @@
 # workflow.py
 
 import os
-import json
 from nanoid import generate
 from datetime import datetime, timezone
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+import tracing
+from action_writer import BatchedActionWriter, atomic_write_json
 
 class WorkflowTrigger:
     """
@@ -18,17 +19,56 @@ class WorkflowTrigger:
         "general":     "general_inquiry"
     }
 
-    def __init__(self, output_dir: str = "action_items"):
+    def __init__(
+        self,
+        output_dir: str = "action_items",
+        batch_size: int = 1,
+        fsync: bool = True,
+        compact: bool = False,
+        index=None,
+        incidents=None
+    ):
+        """
+        :param output_dir: Directory holding one <id>.json per action item.
+        :param batch_size: If > 1, process() buffers items and writes them in
+                           group commits; call flush() to commit the rest.
+        :param fsync: Default durability of each group commit.
+        :param compact: Write action items without indentation.
+        :param index: Optional ActionItemIndex kept current with every new item.
+        :param incidents: Optional IncidentAggregator; building-wide issues are
+                          merged into one incident item instead of one ticket each.
+        """
         self.output_dir = output_dir
         os.makedirs(self.output_dir, exist_ok=True)
+        self.compact = compact
+        self.index = index
+        self.incidents = incidents
+        self.writer: Optional[BatchedActionWriter] = None
+        if batch_size > 1:
+            self.writer = BatchedActionWriter(
+                output_dir, batch_size=batch_size, fsync=fsync, compact=compact
+            )
+
+    @classmethod
+    def action_type_for(cls, request_type: str) -> str:
+        """
+        Map a parsed request_type to the action_type of its action item.
+        """
+        return cls._ACTION_MAP.get(request_type, "general_inquiry")
 
     def create_action_item(
         self,
         parsed: Dict[str, Any],
-        context: Dict[str, Any]
+        context: Dict[str, Any],
+        msg: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
+        """
+        :param msg: The fetched message; its raw subject and body are
+                    stored so the request type classifier trains on the
+                    same text it classifies (classifier.message_text()).
+        """
         req_type = parsed.get("request_type", "general")
-        action_type = self._ACTION_MAP.get(req_type, "general_inquiry")
+        action_type = self.action_type_for(req_type)
 
         return {
             "id":    generate('1234567890abcdef', 10),
@@ -36,9 +76,11 @@ class WorkflowTrigger:
             "action_type":  action_type,
             "tenant_name":  parsed.get("tenant_name"),
             "address":    parsed.get("address"),
-            "subject":      parsed.get("subject"),
+            "subject":      msg.get("subject") if msg is not None else parsed.get("subject"),
+            "body":         msg.get("body") if msg is not None else None,
             "summary":      parsed.get("summary"),
             "request_type": req_type,
+            "parsed_by":    parsed.get("parsed_by"),
             "context": {
                 "rent_balance":       context.get("rent_balance"),
                 "lease_end_date":     context.get("lease_end_date"),
@@ -55,18 +97,35 @@ class WorkflowTrigger:
         """
         filename = f"{action_item['id']}.json"
         path = os.path.join(self.output_dir, filename)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(action_item, f, indent=2)
+        atomic_write_json(path, action_item, compact=self.compact)
         return path
 
+    def flush(self, fsync: Optional[bool] = None) -> List[str]:
+        """
+        Commit any action items buffered by process(). Returns their paths.
+        """
+        if self.writer is None:
+            return []
+        return self.writer.flush(fsync)
+
+    @tracing.traced("workflow.process")
     def process(
         self,
         parsed: Dict[str, Any],
-        context: Dict[str, Any]
+        context: Dict[str, Any],
+        msg: Optional[Dict[str, Any]] = None
     ) -> str:
         """
-        End-to-end: create + save an action item, returning its filepath.
+        End-to-end: create + save an action item, returning its id. Requests
+        linked to an incident return the incident's id.
         """
-        item = self.create_action_item(parsed, context)
-        self.save_action_item(item)
+        item = self.create_action_item(parsed, context, msg)
+        if self.incidents is not None:
+            item = self.incidents.attach(item, parsed)
+        if self.writer is not None:
+            self.writer.write(item)
+        else:
+            self.save_action_item(item)
+        if self.index is not None:
+            self.index.add(item)
         return item['id']